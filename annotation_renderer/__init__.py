@@ -0,0 +1,4 @@
+from utils.lazy_import import lazy_exports
+
+__all__ = ["AnnotationRenderer"]
+__getattr__, __dir__ = lazy_exports(__name__, {"AnnotationRenderer": "annotation_renderer.annotation_renderer"})
@@ -0,0 +1,63 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AnnotationRenderer:
+    """
+    Draws every overlay of a frame in one pass.
+
+    Tracker ellipses and the ball control box, the camera movement box and
+    the speed/distance labels are all drawn straight onto the frame, without
+    the per-layer frame copies of the separate ``draw_*`` passes, and the
+    semi-transparent boxes only blend their own region. Frames are rendered
+    on a thread pool (OpenCV drawing releases the GIL) and come out in input
+    order.
+
+    Frames passed to ``render`` are modified in place. ``team_ball_control``
+    is best given as ``PossessionStats``, which can keep growing chunk by
+    chunk between calls.
+    """
+
+    def __init__(self, tracker, tracks, team_ball_control,
+                 camera_movement_estimator=None, camera_movement_per_frame=None,
+                 speed_and_distance_estimator=None, n_threads=None):
+        self.tracker = tracker
+        self.tracks = tracks
+        self.team_ball_control = team_ball_control
+        self.camera_movement_estimator = camera_movement_estimator
+        self.camera_movement_per_frame = camera_movement_per_frame
+        self.speed_and_distance_estimator = speed_and_distance_estimator
+        if n_threads is None:
+            n_threads = min(8, os.cpu_count() or 1)
+        self.n_threads = max(1, n_threads)
+
+    def render_frame(self, frame, frame_num):
+        frame = self.tracker.draw_frame_annotations(
+            frame, frame_num, self.tracks, self.team_ball_control
+        )
+        if self.camera_movement_estimator is not None:
+            frame = self.camera_movement_estimator.draw_frame_camera_movement(
+                frame, frame_num, self.camera_movement_per_frame
+            )
+        if self.speed_and_distance_estimator is not None:
+            frame = self.speed_and_distance_estimator.draw_frame_speed_and_distance(
+                frame, frame_num, self.tracks
+            )
+        return frame
+
+    def render(self, frames, start_frame=0):
+        """Yield the rendered frames in order; at most ``2 * n_threads`` are in flight."""
+        if self.n_threads == 1:
+            for frame_num, frame in enumerate(frames, start=start_frame):
+                yield self.render_frame(frame, frame_num)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.n_threads) as executor:
+            pending = deque()
+            for frame_num, frame in enumerate(frames, start=start_frame):
+                pending.append(executor.submit(self.render_frame, frame, frame_num))
+                if len(pending) >= 2 * self.n_threads:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
@@ -0,0 +1,39 @@
+import itertools
+import json
+import sys
+
+from inference import check_parity
+from utils import iter_video
+
+MODELS = {
+    "detector": ("models/weights/best.pt", None),
+    "pitch_keypoints": ("pos_model/best.pt", "pose"),
+}
+VIDEO_PATH = "inputs/video1.mp4"
+MAX_FRAMES = 64
+
+
+def main():
+    video_path = sys.argv[1] if len(sys.argv) > 1 else VIDEO_PATH
+    frames = list(itertools.islice(iter_video(video_path), MAX_FRAMES))
+    if not frames:
+        print(f"Could not read frames from {video_path}")
+        return
+
+    reports = {}
+    for name, (weights_path, task) in MODELS.items():
+        reports[name] = check_parity(weights_path, frames, backends=("onnx",), task=task)
+        reports[name].update(
+            check_parity(weights_path, frames, backends=("onnx",), int8=True, task=task)
+        )
+        for backend, row in reports[name].items():
+            print(f"{name:>16}  {backend:>10}  " + "  ".join(
+                f"{key}={value:.3f}" for key, value in row.items() if value is not None
+            ))
+
+    with open("backend_parity.json", "w") as f:
+        json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+from utils.lazy_import import lazy_exports
+
+_EXPORTS = {
+    "BatchRunner": "batch_runner.batch_runner",
+    "find_videos": "batch_runner.batch_runner",
+    "result_key": "batch_runner.batch_runner",
+    "is_up_to_date": "batch_runner.batch_runner",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+
+from batch_runner.batch_runner import BatchRunner, find_videos
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m batch_runner",
+        description="Run the pipeline over folders or manifests of videos on a pool of workers.",
+    )
+    parser.add_argument("inputs", nargs="+",
+                        help="video files, directories, or manifests (.txt one path per line, .json list)")
+    parser.add_argument("--output-dir", default="output_videos/batch")
+    parser.add_argument("--recursive", action="store_true", help="also look in subdirectories")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, each with its own models")
+    parser.add_argument("--threads-per-worker", type=int,
+                        help="thread pool size of each worker (default: cores / workers)")
+    parser.add_argument("--force", action="store_true", help="reprocess videos with up-to-date results")
+    parser.add_argument("--dry-run", action="store_true", help="only list what would be processed")
+    parser.add_argument("--summary", help="summary file (default <output-dir>/batch_summary.json)")
+
+    pipeline = parser.add_argument_group("pipeline settings (see run_pipeline)")
+    pipeline.add_argument("--streaming", action="store_true")
+    pipeline.add_argument("--memory-budget-mb", type=int, default=512)
+    pipeline.add_argument("--use-cache", action="store_true")
+    pipeline.add_argument("--detection-stride", type=int, default=1)
+    pipeline.add_argument("--adaptive-stride", action="store_true")
+    pipeline.add_argument("--inference-backend", default="pytorch")
+    pipeline.add_argument("--int8", action="store_true")
+    pipeline.add_argument("--inference-batch-size", default="auto")
+    pipeline.add_argument("--inference-imgsz", type=int)
+    pipeline.add_argument("--ball-detection", choices=("full", "roi"), default="full")
+    pipeline.add_argument("--decoder-backend", choices=("auto", "opencv", "pyav", "ffmpeg"), default="opencv")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    pipeline_kwargs = {
+        "streaming": args.streaming,
+        "memory_budget_mb": args.memory_budget_mb,
+        "use_cache": args.use_cache,
+        "detection_stride": args.detection_stride,
+        "adaptive_stride": args.adaptive_stride,
+        "inference_backend": args.inference_backend,
+        "int8": args.int8,
+        "inference_batch_size": args.inference_batch_size,
+        "inference_imgsz": args.inference_imgsz,
+        "ball_detection": args.ball_detection,
+        "decoder_backend": args.decoder_backend,
+    }
+    runner = BatchRunner(
+        output_dir=args.output_dir,
+        workers=args.workers,
+        force=args.force,
+        threads_per_worker=args.threads_per_worker,
+        **pipeline_kwargs,
+    )
+    videos = find_videos(args.inputs, recursive=args.recursive)
+    if not videos:
+        raise SystemExit("No videos found.")
+
+    if args.dry_run:
+        for entry in runner.plan(videos):
+            state = "error" if entry["error"] else "up to date" if entry["up_to_date"] else "to process"
+            print(f"{state:<11} {entry['frames'] or 0:>8} frames  {entry['input']} -> {entry['output']}")
+        return
+
+    summary = runner.run(videos)
+    summary_path = args.summary or os.path.join(runner.output_dir, "batch_summary.json")
+    os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print()
+    print("status    frames   seconds  frames/s  video")
+    for result in summary["results"]:
+        seconds = f"{result['seconds']:>8.1f}" if result["seconds"] is not None else f"{'-':>8}"
+        fps = f"{result['frames_per_second']:>8.1f}" if result["frames_per_second"] else f"{'-':>8}"
+        print(f"{result['status']:<8} {result['frames'] or 0:>7}  {seconds}  {fps}  {result['input']}")
+    throughput = summary["frames_per_second"] or 0.0
+    print(f"{summary['done']} done, {summary['skipped']} skipped, {summary['failed']} failed; "
+          f"{summary['frames']} frames in {summary['wall_seconds']:.1f} s ({throughput:.1f} frames/s)")
+    print(f"summary written to {summary_path}")
+    if summary["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
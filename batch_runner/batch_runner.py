@@ -0,0 +1,309 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".mpg", ".mpeg")
+
+DONE, SKIPPED, FAILED = "done", "skipped", "failed"
+
+
+def find_videos(inputs, recursive=False):
+    """
+    ``(video_path, root)`` for every video named by ``inputs``: video files,
+    directories (their videos, with ``recursive`` also in subdirectories)
+    and manifests. A manifest is a ``.txt`` file with one path per line
+    (``#`` starts a comment) or a ``.json`` list of paths; relative paths
+    are taken from the manifest's directory, which is also their ``root``,
+    the directory the output layout mirrors. Duplicates are dropped, order
+    is kept.
+    """
+    videos, seen = [], set()
+
+    def add(path, root):
+        path = os.path.abspath(path)
+        if path not in seen:
+            seen.add(path)
+            videos.append((path, os.path.abspath(root)))
+
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = "**/*" if recursive else "*"
+            for path in sorted(Path(item).glob(pattern)):
+                if path.is_file() and path.suffix.lower() in VIDEO_EXTENSIONS:
+                    add(str(path), item)
+        elif item.lower().endswith((".txt", ".json")):
+            base = os.path.dirname(os.path.abspath(item))
+            for path in _read_manifest(item):
+                path = path if os.path.isabs(path) else os.path.join(base, path)
+                add(path, base)
+        else:
+            add(item, os.path.dirname(os.path.abspath(item)))
+    return videos
+
+
+def _read_manifest(path):
+    with open(path) as f:
+        if path.lower().endswith(".json"):
+            return [str(entry) for entry in json.load(f)]
+        lines = (line.split("#", 1)[0].strip() for line in f)
+        return [line for line in lines if line]
+
+
+def output_path_for(video_path, root, output_dir):
+    """``output_dir`` mirrors the video's place under ``root``; always ``.mp4``."""
+    relative = os.path.relpath(video_path, root)
+    if relative.startswith(os.pardir):
+        relative = os.path.basename(video_path)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + ".mp4")
+
+
+def _disambiguate(entries):
+    # Videos from different directories can map to the same output (same
+    # file name given directly, or outside their root); give each of them
+    # a suffix from its input path so no two runs write the same file.
+    by_output = {}
+    for entry in entries:
+        by_output.setdefault(os.path.normcase(entry["output"]), []).append(entry)
+    for group in by_output.values():
+        if len(group) < 2:
+            continue
+        for entry in group:
+            suffix = hashlib.sha256(entry["input"].encode()).hexdigest()[:8]
+            stem, extension = os.path.splitext(entry["output"])
+            entry["output"] = f"{stem}-{suffix}{extension}"
+
+
+def result_key(video_path, model_path, pipeline_kwargs):
+    """Hash of everything a result depends on: the video, the detector weights and the settings."""
+    from utils import hash_file, run_key
+    return run_key(hash_file(video_path), model_path, pipeline_kwargs)
+
+
+def _metadata_path(output_path):
+    return os.path.splitext(output_path)[0] + ".json"
+
+
+def is_up_to_date(output_path, key):
+    """
+    Whether ``output_path`` holds a finished result for ``key``. The run
+    metadata, written last by ``run_pipeline``, records the key.
+    """
+    metadata_path = _metadata_path(output_path)
+    if not (os.path.exists(output_path) and os.path.exists(metadata_path)):
+        return False
+    try:
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return metadata.get("batch", {}).get("key") == key
+
+
+def process_video(input_path, output_path, key, pipeline_kwargs):
+    """Run the pipeline on one video and record ``key`` in its metadata. Runs in a worker."""
+    from main import run_pipeline
+
+    metadata_path = _metadata_path(output_path)
+    # A stale result must not look finished if this run fails.
+    if os.path.exists(metadata_path):
+        os.remove(metadata_path)
+    start = time.perf_counter()
+    # Every run gets its own stubs, so parallel runs do not overwrite each
+    # other's (nor the repository's).
+    with tempfile.TemporaryDirectory(prefix="batch-stubs-") as stub_dir:
+        run_pipeline(
+            input_video_path=input_path,
+            output_video_path=output_path,
+            use_stubs=False,
+            stub_dir=stub_dir,
+            **pipeline_kwargs,
+        )
+    seconds = time.perf_counter() - start
+
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    metadata["batch"] = {"key": key, "input_video": input_path}
+    tmp_path = metadata_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, metadata_path)
+
+    performance = metadata.get("performance", {})
+    frames = performance.get("stages", {}).get("render", {}).get("items", 0)
+    return {
+        "seconds": seconds,
+        "frames": frames,
+        "frames_per_second": frames / seconds if seconds else None,
+        "cpu_seconds": performance.get("cpu_seconds"),
+        "peak_rss_bytes": performance.get("peak_rss_bytes"),
+        "pid": os.getpid(),
+    }
+
+
+class BatchRunner:
+    """
+    Runs ``run_pipeline`` over many videos on a pool of worker processes.
+
+    Each worker imports the pipeline and preloads the models once, then
+    processes videos until the batch is done, so a clip only pays for its
+    own decoding and inference. Videos are handed out longest first (by
+    the container's frame count): a free worker always takes the longest
+    clip left, which keeps the workers busy until the end instead of
+    leaving one long clip to run alone. With ``workers=1`` everything runs
+    in this process.
+
+    A video whose output already records the same input content, detector
+    weights and settings (``result_key``) is skipped unless ``force``.
+    """
+
+    def __init__(self, output_dir="output_videos/batch", workers=1, force=False, preload=True,
+                 threads_per_worker=None, **pipeline_kwargs):
+        if not os.path.isabs(output_dir):
+            output_dir = str(PROJECT_ROOT / output_dir)
+        self.output_dir = output_dir
+        self.workers = max(1, workers)
+        self.force = force
+        self.preload = preload
+        if threads_per_worker is None and self.workers > 1:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // self.workers)
+        self.threads_per_worker = threads_per_worker
+        self.pipeline_kwargs = pipeline_kwargs
+
+    def plan(self, videos):
+        """
+        One entry per ``(video_path, root)``: output path, result key, frame
+        count and whether it is already up to date. Videos that would share
+        an output path get a suffix from their input path (see
+        ``_disambiguate``). Longest videos first.
+        """
+        import main
+        from utils import get_video_properties
+
+        entries = [
+            {"input": video_path, "output": output_path_for(video_path, root, self.output_dir),
+             "frames": None, "error": None}
+            for video_path, root in videos
+        ]
+        _disambiguate(entries)
+        for entry in entries:
+            video_path, output_path = entry["input"], entry["output"]
+            try:
+                entry["frames"] = get_video_properties(video_path)["frame_count"]
+                entry["key"] = result_key(video_path, main.MODEL_PATH, self.pipeline_kwargs)
+            except Exception as e:
+                entry["key"] = None
+                entry["error"] = f"{type(e).__name__}: {e}"
+            entry["up_to_date"] = (
+                not self.force and entry["key"] is not None and is_up_to_date(output_path, entry["key"])
+            )
+        entries.sort(key=lambda entry: entry["frames"] or 0, reverse=True)
+        return entries
+
+    def run(self, videos, log=print):
+        """Process ``videos`` (see ``find_videos``); returns the summary (see ``summary``)."""
+        start = time.perf_counter()
+        entries = self.plan(videos)
+        results = []
+        pending = []
+        for entry in entries:
+            if entry["error"] is not None:
+                results.append(self._result(entry, FAILED, error=entry["error"]))
+                log(f"failed   {entry['input']}: {entry['error']}")
+            elif entry["up_to_date"]:
+                results.append(self._result(entry, SKIPPED))
+                log(f"skipped  {entry['input']} (up to date)")
+            else:
+                pending.append(entry)
+        for entry in pending:
+            os.makedirs(os.path.dirname(entry["output"]), exist_ok=True)
+
+        def finished(entry, stats=None, error=None):
+            result = self._result(entry, FAILED if error else DONE, error=error, stats=stats)
+            results.append(result)
+            if error:
+                log(f"failed   {entry['input']}: {error}")
+            else:
+                log(f"done     {entry['input']} ({result['frames']} frames, "
+                    f"{result['frames_per_second'] or 0:.1f} frames/s)")
+
+        from main import init_worker
+        worker_args = (
+            self.preload, self.threads_per_worker,
+            self.pipeline_kwargs.get("inference_backend", "pytorch"), self.pipeline_kwargs.get("int8", False),
+        )
+        if self.workers == 1 or len(pending) <= 1:
+            if pending:
+                init_worker(*worker_args)
+            for entry in pending:
+                try:
+                    stats = process_video(entry["input"], entry["output"], entry["key"], self.pipeline_kwargs)
+                except Exception as e:
+                    finished(entry, error=f"{type(e).__name__}: {e}")
+                else:
+                    finished(entry, stats)
+        else:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(
+                max_workers=min(self.workers, len(pending)), mp_context=context,
+                initializer=init_worker, initargs=worker_args,
+            ) as executor:
+                # The executor hands tasks out in submission order, longest first.
+                futures = {
+                    executor.submit(process_video, entry["input"], entry["output"], entry["key"],
+                                    self.pipeline_kwargs): entry
+                    for entry in pending
+                }
+                for future in as_completed(futures):
+                    try:
+                        stats = future.result()
+                    except Exception as e:
+                        finished(futures[future], error=f"{type(e).__name__}: {e}")
+                    else:
+                        finished(futures[future], stats)
+
+        return self.summary(results, time.perf_counter() - start)
+
+    @staticmethod
+    def _result(entry, status, error=None, stats=None):
+        result = {
+            "input": entry["input"],
+            "output": entry["output"],
+            "status": status,
+            "error": error,
+            "frames": entry["frames"],
+            "seconds": None,
+            "frames_per_second": None,
+        }
+        if stats is not None:
+            result.update(stats)
+            result["frames"] = stats["frames"] or entry["frames"]
+        return result
+
+    def summary(self, results, wall_seconds):
+        """
+        Per-video results (status, frames, seconds, frames per second) in
+        the order they finished, and the totals: counts per status, frames
+        processed and the batch throughput over its wall time.
+        """
+        processed = [result for result in results if result["status"] == DONE]
+        frames = sum(result["frames"] or 0 for result in processed)
+        return {
+            "output_dir": self.output_dir,
+            "workers": self.workers,
+            "pipeline_kwargs": self.pipeline_kwargs,
+            "wall_seconds": wall_seconds,
+            "videos": len(results),
+            "done": len(processed),
+            "skipped": sum(result["status"] == SKIPPED for result in results),
+            "failed": sum(result["status"] == FAILED for result in results),
+            "frames": frames,
+            "frames_per_second": frames / wall_seconds if processed and wall_seconds else None,
+            "results": results,
+        }
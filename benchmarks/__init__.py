@@ -0,0 +1,14 @@
+from utils.lazy_import import lazy_exports
+
+_EXPORTS = {
+    "SyntheticMatch": "benchmarks.synthetic",
+    "FakeDetector": "benchmarks.fake_models",
+    "FakeKeypointModel": "benchmarks.fake_models",
+    "use_fake_models": "benchmarks.fake_models",
+    "BENCHMARKS": "benchmarks.suite",
+    "run_benchmarks": "benchmarks.suite",
+    "compare": "benchmarks.suite",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+from benchmarks.suite import BENCHMARKS, default_output_path, print_comparison, run_benchmarks
+from benchmarks.synthetic import SyntheticMatch
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark every pipeline stage on a synthetic match with fake models (offline, CPU).",
+    )
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--players", type=int, default=20, help="players of both teams, goalkeepers included")
+    parser.add_argument("--churn", type=float, default=0.01, help="per-frame chance a player's track id changes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), metavar="NAME",
+                        help=f"benchmarks to run (default all): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", help="result file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="RESULT",
+                        help="compare this run with a result file, or two result files without running")
+    parser.add_argument("--keep", action="store_true", help="keep the working directory (clip and outputs)")
+    return parser.parse_args(argv)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare and len(args.compare) == 2:
+        print_comparison(load(args.compare[0]), load(args.compare[1]))
+        return
+    if args.compare and len(args.compare) > 2:
+        raise SystemExit("--compare takes one or two result files")
+
+    match = SyntheticMatch(
+        frames=args.frames, width=args.width, height=args.height,
+        players=args.players, churn=args.churn, seed=args.seed,
+    )
+    workdir = tempfile.mkdtemp(prefix="football-benchmark-")
+    try:
+        result = run_benchmarks(match, workdir, args.only, repeat=args.repeat, warmup=args.warmup)
+    finally:
+        if args.keep:
+            print(f"working directory kept: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or default_output_path(result)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        print_comparison(load(args.compare[0]), result)
+    if result["errors"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import GOALKEEPER_COLORS, REFEREE_COLOR, TEAM_COLORS
+
+# Class ids of the real detector (models/model_artifacts.json).
+NAMES = {0: "ball", 1: "goalkeeper", 2: "player", 3: "referee"}
+SHIRTS = (
+    [(color, 2) for color in TEAM_COLORS]
+    + [(color, 1) for color in GOALKEEPER_COLORS]
+    + [(REFEREE_COLOR, 3)]
+)
+CONFIDENCE = {0: 0.6, 1: 0.85, 2: 0.9, 3: 0.85}
+LETTERBOX_COLOR = 114
+
+
+class _Tensor(np.ndarray):
+    """NumPy array with the bits of the torch tensor API the pipeline calls."""
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.view(np.ndarray)
+
+    def int(self):
+        return self.astype(np.int64)
+
+
+def _tensor(array):
+    return np.asarray(array, dtype=np.float32).view(_Tensor)
+
+
+class _Boxes:
+    def __init__(self, data, orig_shape):
+        self.data = _tensor(data).reshape(-1, 6)
+        self.orig_shape = orig_shape
+        self.id = None
+
+    # Views of ``data``, so boxes mapped back in place (``_unletterbox``)
+    # are seen through every accessor.
+    @property
+    def xyxy(self):
+        return self.data[:, :4]
+
+    @property
+    def conf(self):
+        return self.data[:, 4]
+
+    @property
+    def cls(self):
+        return self.data[:, 5]
+
+    def __len__(self):
+        return len(self.data)
+
+
+class _Keypoints:
+    def __init__(self, xy):
+        self.xy = _tensor(xy)
+
+
+class FakeResults:
+    """Stand-in for an ultralytics ``Results`` of a single image."""
+
+    def __init__(self, image, boxes=None, keypoints=None, names=NAMES):
+        self.orig_img = image
+        self.orig_shape = image.shape[:2]
+        self.names = dict(names)
+        self.boxes = _Boxes(boxes, self.orig_shape) if boxes is not None else None
+        self.keypoints = _Keypoints(keypoints) if keypoints is not None else None
+        self.masks = None
+        self.obb = None
+
+
+class _FakeModel:
+    inference_backend = "fake"
+
+    def __call__(self, source, **kwargs):
+        return self.predict(source, **kwargs)
+
+    def predict(self, source, conf=0.25, imgsz=None, verbose=True, **kwargs):
+        images = [source] if isinstance(source, np.ndarray) and source.ndim == 3 else list(source)
+        return [self.predict_image(np.asarray(image), conf) for image in images]
+
+
+class FakeDetector(_FakeModel):
+    """
+    Deterministic offline replacement for the YOLO detector, made for
+    ``SyntheticMatch`` clips.
+
+    It segments whatever is not pitch green (nor letterbox gray), takes
+    each blob's bounding box and names it by its upper part's color: white
+    is the ball, the team, goalkeeper and referee shirts are their classes.
+    Working from pixels rather than from the ground truth, it behaves like
+    the real model for every caller: letterboxed batches, ball search crops
+    and tiles, occlusions merging players. Same pixels, same boxes.
+    """
+
+    def __init__(self, min_area=6, pad=0.08):
+        self.min_area = min_area
+        self.pad = pad
+        self.names = dict(NAMES)
+        self._shirts = np.array([color for color, _ in SHIRTS], dtype=np.float32)
+        self._shirt_classes = [class_id for _, class_id in SHIRTS]
+
+    def foreground(self, image):
+        image = image.astype(np.int16)
+        blue, green, red = image[..., 0], image[..., 1], image[..., 2]
+        pitch = (green > red + 20) & (green > blue + 20)
+        letterbox = (np.abs(image - LETTERBOX_COLOR) < 8).all(axis=2)
+        mask = (~(pitch | letterbox)).astype(np.uint8)
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+
+    def classify(self, image, labels, label, x, y, w, h):
+        top = max(1, h * 2 // 5)
+        region = image[y:y + top, x:x + w]
+        pixels = region[labels[y:y + top, x:x + w] == label]
+        color = pixels.reshape(-1, 3).mean(axis=0)
+        if color.min() > 180:
+            return 0
+        distances = ((self._shirts - color) ** 2).sum(axis=1)
+        return self._shirt_classes[int(np.argmin(distances))]
+
+    def predict_image(self, image, conf=0.25):
+        height, width = image.shape[:2]
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(self.foreground(image), connectivity=8)
+        rows = []
+        for label in range(1, count):
+            x, y, w, h, area = stats[label]
+            if area < self.min_area:
+                continue
+            class_id = self.classify(image, labels, label, x, y, w, h)
+            confidence = CONFIDENCE[class_id]
+            if confidence < conf:
+                continue
+            # Real detector boxes include a margin of background.
+            pad = 0 if class_id == 0 else round(self.pad * w)
+            rows.append([
+                max(0, x - pad), max(0, y - pad), min(width, x + w + pad), min(height, y + h + pad),
+                confidence, class_id,
+            ])
+        return FakeResults(image, boxes=np.array(rows, dtype=np.float32).reshape(-1, 6))
+
+
+class FakeKeypointModel(_FakeModel):
+    """
+    Stand-in for the pitch keypoint model: always returns the hard-coded
+    pitch corners of ``ViewTransformer`` (given for 1920x1080), scaled to
+    the image.
+    """
+
+    VERTICES = np.array([[110, 1035], [265, 275], [910, 260], [1640, 915]], dtype=np.float32)
+
+    def predict_image(self, image, conf=0.25):
+        height, width = image.shape[:2]
+        keypoints = self.VERTICES * (width / 1920, height / 1080)
+        return FakeResults(image, keypoints=keypoints[None], names={0: "pitch"})
+
+
+@contextmanager
+def use_fake_models(workdir, backend="pytorch", int8=False):
+    """
+    Run the pipeline on the fake models while in the block.
+
+    Placeholder weight files are written to ``workdir`` and ``main`` is
+    pointed at them; the fakes are registered for them (and for the pitch
+    keypoint model's path) in ``inference.registry``, so ``run_pipeline``,
+    ``Tracker`` and ``ViewTransformer`` pick them up without loading
+    anything. Everything is restored afterwards. Yields the detector
+    weights path.
+    """
+    import main
+    from inference import registry
+
+    os.makedirs(workdir, exist_ok=True)
+    detector_path = os.path.join(workdir, "fake_detector.pt")
+    keypoint_path = os.path.join(workdir, "fake_keypoints.pt")
+    for path in (detector_path, keypoint_path):
+        Path(path).write_text("placeholder weights for benchmarks.fake_models\n")
+
+    saved = main.MODEL_PATH, main.KEYPOINT_MODEL_PATH
+    main.MODEL_PATH, main.KEYPOINT_MODEL_PATH = detector_path, keypoint_path
+    registry.register(detector_path, FakeDetector(), backend, int8)
+    registry.register(keypoint_path, FakeKeypointModel(), backend, int8, task="pose")
+    # PitchKeypointDetector looks for its weights relative to the working
+    # directory; only used when they exist there.
+    registry.register("pos_model/best.pt", FakeKeypointModel(), backend, int8, task="pose")
+    try:
+        yield detector_path
+    finally:
+        main.MODEL_PATH, main.KEYPOINT_MODEL_PATH = saved
+        registry.clear()
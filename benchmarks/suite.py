@@ -0,0 +1,429 @@
+import copy
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+from pathlib import Path
+
+from benchmarks.fake_models import use_fake_models
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+
+# Bump when the layout of the result files changes.
+SCHEMA_VERSION = 1
+PACKAGES = ("numpy", "opencv-python-headless", "opencv-python", "supervision", "scikit-learn",
+            "ultralytics", "torch")
+
+
+class BenchmarkContext:
+    """
+    Inputs shared by the benchmarks of one run: the synthetic clip on disk,
+    its decoded frames, its ground-truth tracks and the results of each
+    analysis stage, all built on first use. Benchmarks copy what they
+    modify, so every repeat starts from the same state.
+    """
+
+    def __init__(self, match, workdir, detector_path):
+        self.match = match
+        self.workdir = workdir
+        self.detector_path = detector_path
+        self.num_frames = match.num_frames
+        self._cached = {}
+
+    def _get(self, name, build):
+        if name not in self._cached:
+            self._cached[name] = build()
+        return self._cached[name]
+
+    @property
+    def video_path(self):
+        return self._get("video_path", lambda: self.match.write_video(os.path.join(self.workdir, "match.mp4")))
+
+    @property
+    def frames(self):
+        import utils
+        return self._get("frames", lambda: utils.read_video(self.video_path))
+
+    def copy_frames(self):
+        return [frame.copy() for frame in self.frames]
+
+    @property
+    def tracker(self):
+        import trackers
+        return self._get("tracker", lambda: trackers.Tracker(self.detector_path))
+
+    @property
+    def tracks(self):
+        """Ground-truth tracks as ``get_object_tracks`` returns them."""
+        return self._get("tracks", self.match.tracks)
+
+    def _store(self):
+        import utils
+        tracks = copy.deepcopy(self.tracks)
+        tracks["ball"] = self.tracker.interpolate_ball_positions(tracks["ball"])
+        tracks = utils.TrackStore.from_tracks(tracks)
+        self.tracker.add_position_to_tracks(tracks)
+        return tracks
+
+    @property
+    def store(self):
+        """Tracks after ball interpolation, as the ``TrackStore`` the stages use."""
+        return self._get("store", self._store)
+
+    @property
+    def camera_movement_estimator(self):
+        import camera_movement
+        return self._get(
+            "camera_movement_estimator",
+            lambda: camera_movement.CameraMovementEstimator(self.frames[0]),
+        )
+
+    @property
+    def camera_movement(self):
+        return self._get(
+            "camera_movement",
+            lambda: self.camera_movement_estimator.get_camera_movement(self.frames),
+        )
+
+    def _analysed(self):
+        import player_ball_assigner
+        import speed_and_distance_etimator
+        import team_assignment
+        import viewtransformer
+
+        tracks = copy.deepcopy(self.store)
+        self.camera_movement_estimator.add_adjust_positions_to_tracks(tracks, self.camera_movement)
+        viewtransformer.ViewTransformer(reference_frame=self.frames[0]).add_transformed_position_to_tracks(tracks)
+        speed_estimator = speed_and_distance_etimator.Speed_and_Distance_Estimator(frame_rate=self.match.fps)
+        speed_estimator.add_speed_and_distance_to_tracks(tracks)
+        team_assigner = team_assignment.TeamAssigner()
+        team_assigner.assign_team_color(self.frames[0], tracks["players"][0])
+        team_assigner.assign_teams(tracks, self.frames)
+        player_assigner = player_ball_assigner.PlayerBallAssigner()
+        team_ball_control = player_assigner.assign_ball_possession(tracks)
+        possession_stats = player_ball_assigner.PossessionStats.from_team_ball_control(
+            team_ball_control, player_ball_assigner.get_ball_holders(tracks)
+        )
+        return {
+            "tracks": tracks,
+            "speed_estimator": speed_estimator,
+            "possession_stats": possession_stats,
+        }
+
+    @property
+    def analysed(self):
+        """Tracks and estimators after every analysis stage, for the draw benchmarks."""
+        return self._get("analysed", self._analysed)
+
+
+# Each benchmark sets up from the context and returns the function to time,
+# which processes all ``num_frames`` frames of the clip.
+
+def bench_read(ctx):
+    import utils
+    video_path = ctx.video_path
+    return lambda: utils.read_video(video_path)
+
+
+def bench_read_grayscale(ctx):
+    # Decoding as the camera movement segments do at downscale 0.5.
+    import utils
+    video_path, backend = ctx.video_path, utils.resolve_decoder("auto")
+    width, height = utils.probe_video(video_path)["frame_size"]
+    size = (width // 2, height // 2)
+    return lambda: utils.read_video(video_path, backend, size=size, grayscale=True)
+
+
+def bench_detect_track(ctx):
+    import trackers
+    frames = ctx.frames
+    tracker = trackers.Tracker(ctx.detector_path)
+    return lambda: tracker.get_object_tracks(frames)
+
+
+def bench_track_postprocess(ctx):
+    import utils
+    tracker = ctx.tracker
+    tracks = copy.deepcopy(ctx.tracks)
+
+    def run():
+        ball = tracker.interpolate_ball_positions(tracks["ball"])
+        store = utils.TrackStore.from_tracks(dict(tracks, ball=ball))
+        tracker.add_position_to_tracks(store)
+    return run
+
+
+def bench_camera_movement(ctx):
+    import camera_movement
+    frames = ctx.frames
+    estimator = camera_movement.CameraMovementEstimator(frames[0])
+    tracks = copy.deepcopy(ctx.store)
+
+    def run():
+        movement = estimator.get_camera_movement(frames)
+        estimator.add_adjust_positions_to_tracks(tracks, movement)
+    return run
+
+
+def bench_view_transform(ctx):
+    import viewtransformer
+    tracks = copy.deepcopy(ctx.store)
+    ctx.camera_movement_estimator.add_adjust_positions_to_tracks(tracks, ctx.camera_movement)
+    view_transformer = viewtransformer.ViewTransformer(reference_frame=ctx.frames[0])
+    return lambda: view_transformer.add_transformed_position_to_tracks(tracks)
+
+
+def bench_speed_distance(ctx):
+    import speed_and_distance_etimator
+    tracks = copy.deepcopy(ctx.analysed["tracks"])
+    estimator = speed_and_distance_etimator.Speed_and_Distance_Estimator(frame_rate=ctx.match.fps)
+    return lambda: estimator.add_speed_and_distance_to_tracks(tracks)
+
+
+def bench_team_assignment(ctx):
+    import team_assignment
+    frames = ctx.frames
+    tracks = copy.deepcopy(ctx.store)
+    team_assigner = team_assignment.TeamAssigner()
+
+    def run():
+        team_assigner.assign_team_color(frames[0], tracks["players"][0])
+        team_assigner.assign_teams(tracks, frames)
+    return run
+
+
+def bench_possession(ctx):
+    import player_ball_assigner
+    tracks = copy.deepcopy(ctx.analysed["tracks"])
+    player_assigner = player_ball_assigner.PlayerBallAssigner()
+
+    def run():
+        team_ball_control = player_assigner.assign_ball_possession(tracks)
+        player_ball_assigner.PossessionStats.from_team_ball_control(
+            team_ball_control, player_ball_assigner.get_ball_holders(tracks)
+        )
+    return run
+
+
+def bench_draw_annotations(ctx):
+    frames = ctx.copy_frames()
+    tracker, analysed = ctx.tracker, ctx.analysed
+
+    def run():
+        for frame_num, frame in enumerate(frames):
+            tracker.draw_frame_annotations(frame, frame_num, analysed["tracks"], analysed["possession_stats"])
+    return run
+
+
+def bench_draw_camera_movement(ctx):
+    frames = ctx.copy_frames()
+    estimator, movement = ctx.camera_movement_estimator, ctx.camera_movement
+
+    def run():
+        for frame_num, frame in enumerate(frames):
+            estimator.draw_frame_camera_movement(frame, frame_num, movement)
+    return run
+
+
+def bench_draw_speed_and_distance(ctx):
+    frames = ctx.copy_frames()
+    analysed = ctx.analysed
+
+    def run():
+        for frame_num, frame in enumerate(frames):
+            analysed["speed_estimator"].draw_frame_speed_and_distance(frame, frame_num, analysed["tracks"])
+    return run
+
+
+def bench_render(ctx):
+    import annotation_renderer
+    frames = ctx.copy_frames()
+    analysed = ctx.analysed
+    renderer = annotation_renderer.AnnotationRenderer(
+        ctx.tracker, analysed["tracks"], analysed["possession_stats"],
+        ctx.camera_movement_estimator, ctx.camera_movement, analysed["speed_estimator"],
+    )
+
+    def run():
+        for _ in renderer.render(frames):
+            pass
+    return run
+
+
+def bench_save_video(ctx):
+    import utils
+    frames = ctx.frames
+    output_path = os.path.join(ctx.workdir, "save_video.mp4")
+    return lambda: utils.save_video(frames, output_path, fps=ctx.match.fps)
+
+
+def _bench_pipeline(ctx, streaming):
+    import main
+    video_path = ctx.video_path
+    output_path = os.path.join(ctx.workdir, f"pipeline_{'streaming' if streaming else 'memory'}.mp4")
+    return lambda: main.run_pipeline(
+        video_path, output_path, use_stubs=False, streaming=streaming, stub_dir=ctx.workdir,
+    )
+
+
+def bench_pipeline(ctx):
+    return _bench_pipeline(ctx, streaming=False)
+
+
+def bench_pipeline_streaming(ctx):
+    return _bench_pipeline(ctx, streaming=True)
+
+
+BENCHMARKS = {
+    "read": bench_read,
+    "read_grayscale": bench_read_grayscale,
+    "detect_track": bench_detect_track,
+    "track_postprocess": bench_track_postprocess,
+    "camera_movement": bench_camera_movement,
+    "view_transform": bench_view_transform,
+    "speed_distance": bench_speed_distance,
+    "team_assignment": bench_team_assignment,
+    "possession": bench_possession,
+    "draw_annotations": bench_draw_annotations,
+    "draw_camera_movement": bench_draw_camera_movement,
+    "draw_speed_and_distance": bench_draw_speed_and_distance,
+    "render": bench_render,
+    "save_video": bench_save_video,
+    "pipeline": bench_pipeline,
+    "pipeline_streaming": bench_pipeline_streaming,
+}
+
+
+def git_commit():
+    """Current commit and whether the tree has uncommitted changes."""
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    commit = git("rev-parse", "HEAD")
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return commit, bool(status)
+
+
+def environment():
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            pass
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "packages": versions,
+    }
+
+
+def time_benchmark(benchmark, ctx, repeat=3, warmup=1):
+    """Seconds of ``repeat`` timed runs, each set up afresh; ``warmup`` runs are not kept."""
+    seconds = []
+    for index in range(warmup + repeat):
+        run = benchmark(ctx)
+        start = time.perf_counter()
+        run()
+        if index >= warmup:
+            seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def summarize(seconds, items):
+    median = statistics.median(seconds)
+    return {
+        "seconds": seconds,
+        "min": min(seconds),
+        "median": median,
+        "mean": statistics.fmean(seconds),
+        "stdev": statistics.stdev(seconds) if len(seconds) > 1 else 0.0,
+        "items": items,
+        "items_per_second": items / median if median else None,
+    }
+
+
+def run_benchmarks(match, workdir, names=None, repeat=3, warmup=1, log=print):
+    """
+    Run the benchmarks ``names`` (all of ``BENCHMARKS`` by default) on
+    ``match`` with the fake models, using ``workdir`` for the clip and the
+    outputs. Returns the result document; a benchmark that raises is
+    reported under ``errors`` and the others still run.
+    """
+    names = list(names or BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {unknown}. Available: {list(BENCHMARKS)}")
+
+    commit, dirty = git_commit()
+    result = {
+        "schema": SCHEMA_VERSION,
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "config": match.config(),
+        "repeat": repeat,
+        "warmup": warmup,
+        "benchmarks": {},
+        "errors": {},
+    }
+    with use_fake_models(workdir) as detector_path:
+        ctx = BenchmarkContext(match, workdir, detector_path)
+        for name in names:
+            try:
+                seconds = time_benchmark(BENCHMARKS[name], ctx, repeat, warmup)
+            except Exception as e:
+                result["errors"][name] = f"{type(e).__name__}: {e}"
+                log(f"{name:<24} failed: {result['errors'][name]}")
+                continue
+            summary = summarize(seconds, ctx.num_frames)
+            result["benchmarks"][name] = summary
+            log(f"{name:<24} {summary['median'] * 1000:>10.1f} ms  {summary['items_per_second']:>9.1f} frames/s")
+    return result
+
+
+def default_output_path(result):
+    commit = (result["commit"] or "unknown")[:12]
+    suffix = "-dirty" if result["dirty"] else ""
+    return str(RESULTS_DIR / f"{commit}{suffix}.json")
+
+
+def compare(baseline, current):
+    """
+    Per benchmark, the median seconds of both result documents and their
+    ratio (current / baseline; below 1 is faster). Only benchmarks present
+    in both are compared.
+    """
+    rows = []
+    for name, stats in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            continue
+        ratio = stats["median"] / base["median"] if base["median"] else None
+        rows.append({
+            "benchmark": name,
+            "baseline": base["median"],
+            "current": stats["median"],
+            "ratio": ratio,
+        })
+    return rows
+
+
+def print_comparison(baseline, current, out=sys.stdout):
+    if baseline.get("config") != current.get("config"):
+        print("warning: the runs used different settings; timings are not comparable", file=out)
+    label = lambda result: (result.get("commit") or "unknown")[:12] + ("-dirty" if result.get("dirty") else "")
+    print(f"{'benchmark':<24} {label(baseline):>14} {label(current):>14}   ratio", file=out)
+    for row in compare(baseline, current):
+        ratio = f"{row['ratio']:.2f}x" if row["ratio"] is not None else "n/a"
+        print(f"{row['benchmark']:<24} {row['baseline'] * 1000:>11.1f} ms {row['current'] * 1000:>11.1f} ms"
+              f"   {ratio}", file=out)
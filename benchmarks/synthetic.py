@@ -0,0 +1,225 @@
+import cv2
+import numpy as np
+
+
+# BGR colors of the synthetic match. ``FakeDetector`` classifies what it
+# finds by the nearest shirt color, so they are kept far apart.
+PITCH_COLORS = ((40, 130, 40), (45, 150, 50))
+TEAM_COLORS = ((40, 40, 220), (220, 90, 20))
+GOALKEEPER_COLORS = ((200, 40, 200), (0, 140, 255))
+REFEREE_COLOR = (20, 20, 20)
+SHORTS_COLOR = (60, 60, 60)
+BALL_COLOR = (250, 250, 250)
+
+
+class SyntheticMatch:
+    """
+    Procedurally generated football clip and its ground-truth tracks.
+
+    ``players`` counts both teams with their goalkeepers (one per team from
+    four players on); one referee is always added. The camera follows the
+    ball across a textured pitch wider than the view, so camera movement
+    has something to track. The ball is passed between players and disappears now and
+    then (occlusion) for the interpolation to fill. ``churn`` is the
+    per-frame probability that a player's track id is replaced by a new one
+    in ``tracks()``, as a tracker losing and re-acquiring players would.
+
+    Everything is derived from ``seed``: the same arguments give the same
+    frames and tracks.
+    """
+
+    def __init__(self, frames=250, width=1920, height=1080, players=20, churn=0.01, fps=24,
+                 ball_dropout=0.02, seed=0):
+        self.num_frames = frames
+        self.width = width
+        self.height = height
+        self.num_players = players
+        self.churn = churn
+        self.fps = fps
+        self.ball_dropout = ball_dropout
+        self.seed = seed
+
+        rng = np.random.default_rng(seed)
+        self.box_height = max(12, round(height * 0.07))
+        self.box_width = max(6, round(self.box_height * 0.45))
+        self.ball_radius = max(2, round(height / 200))
+        self.world_width = round(width * 1.5)
+        self._background = self._make_background(rng)
+        self.colors, self.classes = self._make_roster()
+        self.positions = self._simulate_people(rng)
+        self.ball_positions, self.ball_visible = self._simulate_ball(rng)
+        self.camera_x = self._simulate_camera()
+        self._track_ids = self._simulate_track_ids(rng)
+
+    def config(self):
+        return {
+            "frames": self.num_frames,
+            "width": self.width,
+            "height": self.height,
+            "players": self.num_players,
+            "churn": self.churn,
+            "fps": self.fps,
+            "ball_dropout": self.ball_dropout,
+            "seed": self.seed,
+        }
+
+    def _make_background(self, rng):
+        background = np.empty((self.height, self.world_width, 3), dtype=np.uint8)
+        stripe = max(1, self.world_width // 16)
+        for index, x in enumerate(range(0, self.world_width, stripe)):
+            background[:, x:x + stripe] = PITCH_COLORS[index % 2]
+        # Dark patches (worn grass) give optical flow corners to follow.
+        patch = max(2, self.height // 90)
+        for _ in range(self.world_width * self.height // 4000):
+            x = int(rng.integers(0, self.world_width - patch))
+            y = int(rng.integers(0, self.height - patch))
+            background[y:y + patch, x:x + patch] = (20, 75, 20)
+        return background
+
+    def _simulate_camera(self):
+        """Left edge of the view in world pixels; the camera pans after the ball."""
+        camera_x = np.empty(self.num_frames, dtype=int)
+        x = self.ball_positions[0, 0] - self.width / 2
+        for frame_num, (ball_x, _) in enumerate(self.ball_positions):
+            x += (ball_x - self.width / 2 - x) * 0.1
+            x = min(max(x, 0), self.world_width - self.width)
+            camera_x[frame_num] = round(x)
+        return camera_x
+
+    def _make_roster(self):
+        colors, classes = [], []
+        goalkeepers = 2 if self.num_players >= 4 else 0
+        outfield = self.num_players - goalkeepers
+        for index in range(outfield):
+            colors.append(TEAM_COLORS[index % 2])
+            classes.append("player")
+        for index in range(goalkeepers):
+            colors.append(GOALKEEPER_COLORS[index])
+            classes.append("goalkeeper")
+        colors.append(REFEREE_COLOR)
+        classes.append("referee")
+        return colors, classes
+
+    def _simulate_people(self, rng):
+        """Foot positions in world pixels, shape (frames, people, 2)."""
+        people = len(self.classes)
+        low = np.array([self.box_width, self.box_height * 1.5])
+        high = np.array([self.world_width - self.box_width, self.height - 2.0])
+        position = rng.uniform(low, high, (people, 2))
+        velocity = np.zeros((people, 2))
+        positions = np.empty((self.num_frames, people, 2))
+        speed = self.height / 400
+        for frame_num in range(self.num_frames):
+            velocity = 0.9 * velocity + rng.normal(0, speed, (people, 2))
+            position = np.clip(position + velocity, low, high)
+            positions[frame_num] = position
+        return positions
+
+    def _simulate_ball(self, rng):
+        """Ball centers in world pixels and whether the ball is visible."""
+        outfield = [i for i, name in enumerate(self.classes) if name != "referee"]
+        balls = np.empty((self.num_frames, 2))
+        visible = np.ones(self.num_frames, dtype=bool)
+        holder = int(rng.choice(outfield)) if outfield else 0
+        ball = self.positions[0, holder].copy()
+        next_pass = 0
+        hidden_until = -1
+        for frame_num in range(self.num_frames):
+            if frame_num >= next_pass and outfield:
+                holder = int(rng.choice(outfield))
+                next_pass = frame_num + int(rng.integers(self.fps, 3 * self.fps))
+            # The ball sits just in front of its holder's feet.
+            target = self.positions[frame_num, holder] + (self.box_width, -self.ball_radius)
+            ball += (target - ball) * 0.25
+            balls[frame_num] = ball
+            if frame_num > hidden_until and rng.random() < self.ball_dropout:
+                hidden_until = frame_num + int(rng.integers(1, self.fps // 2 + 2))
+            visible[frame_num] = frame_num > hidden_until
+        return balls, visible
+
+    def _simulate_track_ids(self, rng):
+        people = len(self.classes)
+        ids = np.arange(1, people + 1)
+        next_id = people + 1
+        track_ids = np.empty((self.num_frames, people), dtype=np.int64)
+        is_player = np.array([name != "referee" for name in self.classes])
+        for frame_num in range(self.num_frames):
+            lost = is_player & (rng.random(people) < self.churn)
+            for index in np.flatnonzero(lost):
+                ids[index] = next_id
+                next_id += 1
+            track_ids[frame_num] = ids
+        return track_ids
+
+    def _boxes(self, frame_num):
+        """Person boxes in frame pixels, shape (people, 4)."""
+        foot = self.positions[frame_num] - (self.camera_x[frame_num], 0)
+        half_width = self.box_width / 2
+        return np.column_stack([
+            foot[:, 0] - half_width, foot[:, 1] - self.box_height,
+            foot[:, 0] + half_width, foot[:, 1],
+        ])
+
+    def _ball_box(self, frame_num):
+        x, y = self.ball_positions[frame_num] - (self.camera_x[frame_num], 0)
+        r = self.ball_radius
+        return [x - r, y - r, x + r, y + r]
+
+    def frame(self, frame_num):
+        """Render frame ``frame_num`` (BGR, uint8)."""
+        camera_x = self.camera_x[frame_num]
+        frame = self._background[:, camera_x:camera_x + self.width].copy()
+        boxes = np.round(self._boxes(frame_num)).astype(int)
+        # Far players first, so nearer ones overlap them.
+        for index in np.argsort(boxes[:, 3]):
+            x1, y1, x2, y2 = boxes[index]
+            waist = y1 + (y2 - y1) * 11 // 20
+            cv2.rectangle(frame, (x1, y1), (x2 - 1, waist), self.colors[index], cv2.FILLED)
+            cv2.rectangle(frame, (x1, waist), (x2 - 1, y2 - 1), SHORTS_COLOR, cv2.FILLED)
+        if self.ball_visible[frame_num]:
+            x, y = np.round(self.ball_positions[frame_num] - (camera_x, 0)).astype(int)
+            cv2.circle(frame, (int(x), int(y)), self.ball_radius, BALL_COLOR, cv2.FILLED)
+        return frame
+
+    def iter_frames(self):
+        for frame_num in range(self.num_frames):
+            yield self.frame(frame_num)
+
+    def write_video(self, path, fourcc="mp4v"):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), self.fps, (self.width, self.height))
+        if not writer.isOpened():
+            raise IOError(f"Could not open video writer for {path}")
+        try:
+            for frame in self.iter_frames():
+                writer.write(frame)
+        finally:
+            writer.release()
+        return path
+
+    def tracks(self):
+        """
+        Ground-truth ``tracks`` in the structure ``Tracker.get_object_tracks``
+        returns, with goalkeepers as players and ids churned.
+        """
+        tracks = {"players": [], "referees": [], "ball": []}
+        for frame_num in range(self.num_frames):
+            players, referees = {}, {}
+            boxes = self._boxes(frame_num)
+            for index, name in enumerate(self.classes):
+                x1, y1, x2, y2 = boxes[index]
+                # Off-screen people are not detected.
+                if x2 <= 0 or x1 >= self.width:
+                    continue
+                track = {"bbox": [float(x1), float(y1), float(x2), float(y2)]}
+                if name == "referee":
+                    referees[int(self._track_ids[frame_num, index])] = track
+                else:
+                    players[int(self._track_ids[frame_num, index])] = track
+            tracks["players"].append(players)
+            tracks["referees"].append(referees)
+            ball = {}
+            ball_box = self._ball_box(frame_num)
+            if self.ball_visible[frame_num] and 0 < ball_box[2] and ball_box[0] < self.width:
+                ball[1] = {"bbox": [float(v) for v in ball_box]}
+            tracks["ball"].append(ball)
+        return tracks
@@ -1 +1,4 @@
-from camera_movement.camera_movement_estimator import CameraMovementEstimator
\ No newline at end of file
+from utils.lazy_import import lazy_exports
+
+__all__ = ["CameraMovementEstimator"]
+__getattr__, __dir__ = lazy_exports(__name__, {"CameraMovementEstimator": "camera_movement.camera_movement_estimator"})
@@ -1,23 +1,34 @@
 import os
 import pickle
+from concurrent.futures import ProcessPoolExecutor
 import cv2
 import numpy as np
-import os
-from utils import measure_distance
+from utils import TrackStore, get_video_properties, blend_rectangle, iter_video
 
 class CameraMovementEstimator:
-    def __init__(self,frame):
+    def __init__(self,frame, downscale=1.0, frame_size=None):
+        """
+        ``downscale`` < 1 runs feature detection and optical flow on a smaller
+        grayscale image; movements are scaled back to full-resolution pixels.
+        Frames already decoded to that grayscale ``working_size`` are used as
+        they are; pass the video's ``frame_size`` (width, height) when
+        ``frame`` is one of them.
+        """
         self.minimum_distance = 5
+        self.downscale = downscale
+        self.frame_size = tuple(frame_size or (frame.shape[1], frame.shape[0]))
+        width, height = self.frame_size
+        self.working_size = (int(round(width * downscale)), int(round(height * downscale)))
 
         self.lk_params = dict(
             winSize=(15, 15),
             maxLevel=2,
             criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
         )
-        first_frame_grayscale =  cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        first_frame_grayscale = self.to_grey(frame)
         mask_features = np.zeros_like(first_frame_grayscale)
-        mask_features[:,0:20] = 1
-        mask_features[:,900:1050] = 1
+        mask_features[:,0:int(20 * downscale)] = 1
+        mask_features[:,int(900 * downscale):int(1050 * downscale)] = 1
 
         self.features = dict(
             maxCorners = 100,
@@ -26,8 +37,14 @@ class CameraMovementEstimator:
             blockSize = 7,
             mask = mask_features,
         )
+        self.reset_camera_movement()
 
     def add_adjust_positions_to_tracks(self, tracks, camera_movement_per_frame):
+        if isinstance(tracks, TrackStore):
+            camera_movement = np.asarray(camera_movement_per_frame, dtype=np.float32).reshape(-1, 2)
+            tracks.position_adjusted[:] = tracks.position - camera_movement[tracks.frame]
+            return
+
         for object, object_tracks in tracks.items():
             for frame_num, track in enumerate(object_tracks):
                 for track_id, track_info in track.items():
@@ -38,45 +55,115 @@ class CameraMovementEstimator:
                     position_adjusted = (position[0] - camera_movement[0], position[1] - camera_movement[1])
                     tracks[object][frame_num][track_id]['position_adjusted'] = position_adjusted
 
-    def get_camera_movement(self, frames, read_from_stub = False, stub_path = None):
+    def get_camera_movement(self, frames, read_from_stub = False, stub_path = None, on_frames=None):
+        """``on_frames(frames_done)`` is called after every frame; raising from it aborts."""
         if read_from_stub and stub_path is not None and os.path.exists(stub_path):
             with open(stub_path, 'rb') as f:
                 return pickle.load(f)
 
+        self.reset_camera_movement()
+        camera_movement = []
+        for frame in frames:
+            camera_movement.append(self.update_camera_movement(frame))
+            if on_frames is not None:
+                on_frames(len(camera_movement))
 
-        camera_movement  = [[0,0]] * len(frames)
-        old_grey = cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY)
-        old_features = cv2.goodFeaturesToTrack(old_grey, **self.features)
+        if stub_path is not None:
+            with open(stub_path, 'wb') as f:
+                pickle.dump(camera_movement, f)
 
-        for frame_number in range(1,len(frames)):
-            frame_grey = cv2.cvtColor(frames[frame_number], cv2.COLOR_BGR2GRAY)
-            if old_features is None or len(old_features) == 0:
-                old_features = cv2.goodFeaturesToTrack(old_grey, **self.features)
-                if old_features is None:
-                    continue
+        return camera_movement
 
-            new_features, status, _ = cv2.calcOpticalFlowPyrLK(old_grey, frame_grey, old_features, None, **self.lk_params)
-            if new_features is None or status is None:
-                continue
+    def reset_camera_movement(self):
+        self.old_grey = None
+        self.old_features = None
+
+    def to_grey(self, frame):
+        frame_grey = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if (frame_grey.shape[1], frame_grey.shape[0]) != self.working_size:
+            frame_grey = cv2.resize(frame_grey, self.working_size, interpolation=cv2.INTER_AREA)
+        return frame_grey
+
+    def update_camera_movement(self, frame):
+        """
+        Feed the next frame of the video and return its camera movement.
+
+        Optical-flow state is kept between calls so a video can be processed
+        one frame (or chunk) at a time; call ``reset_camera_movement`` first.
+        Frames may be BGR or already grayscale.
+        """
+        frame_grey = self.to_grey(frame)
+        if self.old_grey is None:
+            self.old_grey = frame_grey
+            self.old_features = cv2.goodFeaturesToTrack(frame_grey, **self.features)
+            return [0, 0]
+
+        if self.old_features is None or len(self.old_features) == 0:
+            self.old_features = cv2.goodFeaturesToTrack(self.old_grey, **self.features)
+            if self.old_features is None:
+                return [0, 0]
+
+        new_features, status, _ = cv2.calcOpticalFlowPyrLK(self.old_grey, frame_grey, self.old_features, None, **self.lk_params)
+        if new_features is None or status is None:
+            return [0, 0]
+
+        # Largest feature displacement (first one on ties), in full-res pixels.
+        displacement = (new_features.reshape(-1, 2) - self.old_features.reshape(-1, 2)) / self.downscale
+        distance = np.hypot(displacement[:, 0], displacement[:, 1])
+        largest = int(np.argmax(distance))
+
+        camera_movement = [0, 0]
+        if distance[largest] > self.minimum_distance:
+            camera_movement = [displacement[largest, 0], displacement[largest, 1]]
+            self.old_features = cv2.goodFeaturesToTrack(frame_grey, **self.features)
+
+        self.old_grey = frame_grey.copy()
+        return camera_movement
 
-            max_distance = 0
-            camera_movement_x, camera_movement_y = 0, 0
+    def get_camera_movement_from_video(
+        self,
+        video_path,
+        n_workers=None,
+        segment_length=None,
+        overlap=10,
+        read_from_stub=False,
+        stub_path=None,
+        decoder_backend=None,
+    ):
+        """
+        Estimate camera movement for a video file in parallel.
+
+        The video is split into segments that are decoded and estimated in a
+        process pool. Each worker starts ``overlap`` frames before its segment
+        so the optical-flow state is warmed up by the first frame it reports;
+        the warm-up frames are dropped and the segments are concatenated.
+        Frames are decoded (with ``decoder_backend``, see
+        ``utils.open_decoder``) straight to grayscale at ``working_size``.
+        """
+        if read_from_stub and stub_path is not None and os.path.exists(stub_path):
+            with open(stub_path, 'rb') as f:
+                return pickle.load(f)
 
-            for i, (new,old) in enumerate(zip(new_features, old_features)):
-                new_feature_point = new.ravel()
-                old_feature_point = old.ravel()
+        n_workers = n_workers or os.cpu_count() or 1
+        frame_count = get_video_properties(video_path)['frame_count']
+        if segment_length is None:
+            segment_length = max(1, -(-frame_count // n_workers))
 
-                distance = measure_distance(new_feature_point, old_feature_point)
-                if distance > max_distance:
-                    max_distance = distance
-                    camera_movement_x = new_feature_point[0] - old_feature_point[0]
-                    camera_movement_y = new_feature_point[1] - old_feature_point[1]
+        segments = []
+        for start in range(0, max(frame_count, 1), segment_length):
+            end = start + segment_length if start + segment_length < frame_count else None
+            segments.append((
+                video_path, start, end, overlap, self.downscale, self.frame_size, self.working_size,
+                decoder_backend,
+            ))
 
-            if max_distance > self.minimum_distance:
-                camera_movement[frame_number] = [camera_movement_x, camera_movement_y]
-                old_features = cv2.goodFeaturesToTrack(frame_grey, **self.features)
+        if n_workers <= 1 or len(segments) <= 1:
+            results = [_estimate_segment(segment) for segment in segments]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                results = list(executor.map(_estimate_segment, segments))
 
-            old_grey = frame_grey.copy()
+        camera_movement = [movement for result in results for movement in result]
 
         if stub_path is not None:
             with open(stub_path, 'wb') as f:
@@ -84,23 +171,42 @@ class CameraMovementEstimator:
 
         return camera_movement
 
-    def draw_camera_movement(self, frames, camera_movement_per_frame):
-        output_frames = []
+    def draw_frame_camera_movement(self, frame, frame_number, camera_movement_per_frame):
+        """Draw the camera movement box on ``frame`` in place."""
+        blend_rectangle(frame, (0,0), (500,100), (255,255,255), 0.6)
 
-        for frame_number, frame in enumerate(frames):
-            frame = frame.copy()
+        x_movement, y_movement = camera_movement_per_frame[frame_number]
+        frame = cv2.putText(frame, f'camera movement X:{x_movement:.2f}',
+                            (10,30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,255), 2)
+        frame = cv2.putText(frame, f'camera movement Y:{y_movement:.2f}',
+                            (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        return frame
 
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (0,0), (500,100), (255,255,255), -1)
-            alpha = 0.6
-            cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+    def draw_camera_movement(self, frames, camera_movement_per_frame, start_frame=0):
+        output_frames = []
 
-            x_movement, y_movement = camera_movement_per_frame[frame_number]
-            frame = cv2.putText(frame, f'camera movement X:{x_movement:.2f}',
-                                (10,30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,255), 2)
-            frame = cv2.putText(frame, f'camera movement Y:{y_movement:.2f}',
-                                (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        for frame_number, frame in enumerate(frames, start=start_frame):
+            frame = self.draw_frame_camera_movement(frame.copy(), frame_number, camera_movement_per_frame)
             output_frames.append(frame)
 
         return output_frames
 
+
+
+def _estimate_segment(segment):
+    """Camera movement for frames ``start:end`` of a video (``end`` None = to EOF)."""
+    video_path, start, end, overlap, downscale, frame_size, working_size, decoder_backend = segment
+    warm_up_start = max(0, start - overlap)
+
+    estimator = None
+    movements = []
+    frames = iter_video(
+        video_path, warm_up_start, end, backend=decoder_backend, size=working_size, grayscale=True
+    )
+    for frame_num, frame in enumerate(frames, start=warm_up_start):
+        if estimator is None:
+            estimator = CameraMovementEstimator(frame, downscale=downscale, frame_size=frame_size)
+        movement = estimator.update_camera_movement(frame)
+        if frame_num >= start:
+            movements.append(movement)
+    return movements
@@ -0,0 +1,72 @@
+import json
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+
+# What each stage imports when it first runs. Every statement is timed in a
+# fresh interpreter, so the numbers are cold-start costs.
+TARGETS = [
+    ("main", "import main"),
+    ("utils", "import utils; utils.read_video, utils.TrackStore"),
+    ("tracker", "from trackers import Tracker"),
+    ("team assignment", "from team_assignment import TeamAssigner"),
+    ("camera movement", "from camera_movement import CameraMovementEstimator"),
+    ("view transformer", "from viewtransformer import ViewTransformer"),
+    ("renderer", "from annotation_renderer import AnnotationRenderer"),
+    ("model runtime", "import ultralytics"),
+]
+TOP_MODULES = 8
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile(statement):
+    """
+    Cold import cost of ``statement``: wall seconds of the interpreter,
+    seconds spent importing and the heaviest top-level modules, from
+    ``python -X importtime``.
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    wall_seconds = time.perf_counter() - start
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        # Indentation 1 is a module imported by the statement itself.
+        if match and len(match.group(3)) == 1:
+            modules.append((match.group(4), int(match.group(2)) / 1e6))
+    modules.sort(key=lambda module: module[1], reverse=True)
+    error = result.stderr.strip().splitlines()[-1] if result.returncode else None
+    return {
+        "statement": statement,
+        "wall_seconds": wall_seconds,
+        "import_seconds": sum(seconds for _, seconds in modules),
+        "top_modules": modules[:TOP_MODULES],
+        "error": error,
+    }
+
+
+def main():
+    report = {name: profile(statement) for name, statement in TARGETS}
+
+    print("target            wall s  import s  heaviest imports")
+    for name, row in report.items():
+        heaviest = ", ".join(f"{module} {seconds:.2f}" for module, seconds in row["top_modules"][:3])
+        if row["error"]:
+            heaviest = f"failed: {row['error']}"
+        print(f"{name:<16}  {row['wall_seconds']:>6.2f}  {row['import_seconds']:>8.2f}  {heaviest}")
+
+    with open("import_profile.json", "w") as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+from utils.lazy_import import lazy_exports
+
+_EXPORTS = {
+    "BACKENDS": "inference.backends",
+    "export_model": "inference.backends",
+    "load_model": "inference.backends",
+    "check_parity": "inference.backends",
+    "ModelRegistry": "inference.model_registry",
+    "registry": "inference.model_registry",
+    "get_model": "inference.model_registry",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,170 @@
+import os
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+from utils import match_boxes
+
+
+def _yolo():
+    # Imported on first use: ultralytics pulls in torch, which dominates
+    # the start-up time of anything that imports this module.
+    try:
+        from ultralytics import YOLO  # type: ignore
+    except ImportError:  # pragma: no cover - handled at runtime
+        raise ImportError("ultralytics is required to load models. Install it with `pip install ultralytics`.")
+    return YOLO
+
+
+# "pytorch" loads the .pt weights as trained; the others run an exported copy
+# through ultralytics' ONNX Runtime / OpenVINO predictors, so callers keep the
+# same ``predict`` API and ``Results`` objects.
+BACKENDS = ("pytorch", "onnx", "openvino")
+
+
+def _exported_path(weights_path, backend, int8):
+    weights_path = Path(weights_path)
+    if backend == "onnx":
+        suffix = ".int8.onnx" if int8 else ".onnx"
+        return weights_path.with_name(weights_path.stem + suffix)
+    return weights_path.with_name(weights_path.stem + "_openvino_model")
+
+
+def _is_fresh(exported, weights_path):
+    return exported.exists() and exported.stat().st_mtime >= Path(weights_path).stat().st_mtime
+
+
+def export_model(weights_path, backend="onnx", int8=False, imgsz=640):
+    """
+    Export PyTorch weights for ``backend`` next to the weights file and
+    return the exported path. Exports are reused while newer than the
+    weights.
+
+    ``int8`` applies ONNX Runtime dynamic quantization (weights to INT8, no
+    calibration data needed) to the ONNX export. OpenVINO models are
+    exported in FP32; OpenVINO's own INT8 path needs a calibration set.
+    """
+    if backend not in ("onnx", "openvino"):
+        raise ValueError(f"Cannot export to backend {backend!r}")
+    YOLO = _yolo()
+
+    exported = _exported_path(weights_path, backend, int8)
+    if _is_fresh(exported, weights_path):
+        return str(exported)
+
+    if backend == "openvino":
+        if int8:
+            warnings.warn("INT8 is only supported for the ONNX backend; exporting OpenVINO in FP32")
+        path = YOLO(str(weights_path)).export(format="openvino", imgsz=imgsz, dynamic=True)
+        return str(path)
+
+    onnx_path = _exported_path(weights_path, "onnx", False)
+    if not _is_fresh(onnx_path, weights_path):
+        onnx_path = Path(YOLO(str(weights_path)).export(format="onnx", imgsz=imgsz, dynamic=True))
+    if not int8:
+        return str(onnx_path)
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp_path = exported.with_name(exported.name + ".tmp")
+    quantize_dynamic(str(onnx_path), str(tmp_path), weight_type=QuantType.QUInt8)
+    os.replace(tmp_path, exported)
+    return str(exported)
+
+
+def load_model(weights_path, backend="pytorch", int8=False, imgsz=640, task=None, fallback=True):
+    """
+    Load a YOLO model for inference on ``backend``.
+
+    For ``"onnx"`` and ``"openvino"`` the weights are exported first (see
+    ``export_model``). If the export or the runtime is not available and
+    ``fallback`` is set, a warning is issued and the PyTorch weights are
+    loaded instead. The backend actually used is stored on the returned
+    model as ``inference_backend``.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {BACKENDS}")
+    YOLO = _yolo()
+
+    if backend != "pytorch":
+        try:
+            model = YOLO(export_model(weights_path, backend, int8, imgsz), task=task)
+            model.inference_backend = f"{backend}-int8" if int8 and backend == "onnx" else backend
+            return model
+        except Exception as e:
+            if not fallback:
+                raise
+            warnings.warn(f"Could not use the {backend} backend ({e}); falling back to PyTorch")
+
+    model = YOLO(str(weights_path), task=task)
+    model.inference_backend = "pytorch"
+    return model
+
+
+def _boxes(result):
+    if result.boxes is None:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    return (
+        result.boxes.xyxy.cpu().numpy().reshape(-1, 4),
+        result.boxes.cls.cpu().numpy().astype(np.int64),
+    )
+
+
+def _timed_predict(model, frames, conf, batch_size):
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        results += model.predict(frames[i:i + batch_size], conf=conf, verbose=False)
+    return results, time.perf_counter() - start
+
+
+def check_parity(weights_path, frames, backends=("onnx", "openvino"), int8=False, imgsz=640,
+                 task=None, conf=0.1, iou_threshold=0.5, batch_size=8):
+    """
+    Compare detections of each backend against PyTorch on ``frames``.
+
+    Boxes are matched one-to-one by IoU within each frame. For every backend
+    the report has recall and precision against PyTorch, the mean IoU and
+    class agreement of matched boxes, the mean keypoint distance (pose
+    models), the seconds taken and the speed-up over PyTorch.
+    """
+    reference_model = load_model(weights_path, "pytorch", imgsz=imgsz, task=task)
+    _timed_predict(reference_model, frames[:1], conf, batch_size)  # warm up
+    reference, reference_seconds = _timed_predict(reference_model, frames, conf, batch_size)
+
+    report = {"pytorch": {"seconds": reference_seconds, "speedup": 1.0}}
+    for backend in backends:
+        model = load_model(weights_path, backend, int8=int8, imgsz=imgsz, task=task, fallback=False)
+        _timed_predict(model, frames[:1], conf, batch_size)
+        results, seconds = _timed_predict(model, frames, conf, batch_size)
+
+        matched = reference_count = count = same_class = 0
+        iou_sum = 0.0
+        keypoint_distances = []
+        for expected, actual in zip(reference, results):
+            expected_boxes, expected_classes = _boxes(expected)
+            actual_boxes, actual_classes = _boxes(actual)
+            matches = match_boxes(expected_boxes, actual_boxes, iou_threshold)
+            matched += len(matches)
+            reference_count += len(expected_boxes)
+            count += len(actual_boxes)
+            for i, j, iou in matches:
+                iou_sum += iou
+                same_class += int(expected_classes[i] == actual_classes[j])
+                if getattr(expected, "keypoints", None) is not None and getattr(actual, "keypoints", None) is not None:
+                    expected_points = expected.keypoints.xy[i].cpu().numpy()
+                    actual_points = actual.keypoints.xy[j].cpu().numpy()
+                    keypoint_distances.append(float(np.hypot(*(expected_points - actual_points).T).mean()))
+
+        report[model.inference_backend] = {
+            "recall": matched / reference_count if reference_count else 1.0,
+            "precision": matched / count if count else 1.0,
+            "mean_iou": iou_sum / matched if matched else None,
+            "class_agreement": same_class / matched if matched else None,
+            "mean_keypoint_distance": float(np.mean(keypoint_distances)) if keypoint_distances else None,
+            "seconds": seconds,
+            "speedup": reference_seconds / seconds if seconds else 0.0,
+        }
+    return report
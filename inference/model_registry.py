@@ -0,0 +1,148 @@
+import gc
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from inference.backends import load_model
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models.
+
+    ``get`` loads a model on first use and returns the same object on every
+    later call with the same weights, backend, precision and task (and
+    input size, for exported models, which have a fixed one), so a
+    long-running process (the Streamlit app, a worker of a pool) pays the
+    load and the first-inference warm-up once. Loading is thread-safe: one
+    lock per model, so concurrent callers of the same model wait for a
+    single load while other models load in parallel.
+
+    The models themselves are not safe for concurrent ``predict`` calls;
+    run one pipeline per thread or process at a time.
+
+    For process pools with the ``fork`` start method, ``preload`` the models
+    in the parent before the pool starts: the children inherit them
+    copy-on-write instead of loading their own.
+    """
+
+    def __init__(self):
+        self._reset_locks()
+        self._models = {}
+        self.timings = {}
+        if hasattr(os, "register_at_fork"):
+            # A lock held by another thread at fork time would stay locked
+            # forever in the child.
+            os.register_at_fork(after_in_child=self._reset_locks)
+
+    def _reset_locks(self):
+        self._lock = threading.Lock()
+        self._model_locks = {}
+
+    @staticmethod
+    def key(weights_path, backend="pytorch", int8=False, task=None, imgsz=640):
+        # Exported models have a fixed input size; PyTorch takes any.
+        imgsz = None if backend == "pytorch" else imgsz
+        return (str(Path(weights_path).resolve()), backend, bool(int8), task, imgsz)
+
+    def get(self, weights_path, backend="pytorch", int8=False, task=None, warmup=True, imgsz=640):
+        key = self.key(weights_path, backend, int8, task, imgsz)
+        model = self._models.get(key)
+        if model is not None:
+            self.timings[key]["hits"] += 1
+            return model
+
+        with self._lock:
+            model_lock = self._model_locks.setdefault(key, threading.Lock())
+        with model_lock:
+            model = self._models.get(key)
+            if model is not None:
+                self.timings[key]["hits"] += 1
+                return model
+
+            start = time.perf_counter()
+            model = load_model(weights_path, backend, int8=int8, imgsz=imgsz, task=task)
+            load_seconds = time.perf_counter() - start
+            warmup_seconds = self.warm_up(model, imgsz) if warmup else None
+
+            self.timings[key] = {
+                "weights": key[0],
+                "backend": getattr(model, "inference_backend", backend),
+                "task": task,
+                "load_seconds": load_seconds,
+                "warmup_seconds": warmup_seconds,
+                "pid": os.getpid(),
+                "hits": 0,
+            }
+            self._models[key] = model
+            return model
+
+    def register(self, weights_path, model, backend="pytorch", int8=False, task=None, imgsz=640):
+        """
+        Serve ``model`` for these weights from now on instead of loading
+        them (the benchmarks' fake models, models built elsewhere).
+        """
+        key = self.key(weights_path, backend, int8, task, imgsz)
+        with self._lock:
+            self._models[key] = model
+            self.timings[key] = {
+                "weights": key[0],
+                "backend": getattr(model, "inference_backend", backend),
+                "task": task,
+                "load_seconds": 0.0,
+                "warmup_seconds": None,
+                "pid": os.getpid(),
+                "hits": 0,
+            }
+        return model
+
+    @staticmethod
+    def warm_up(model, imgsz=640):
+        """Run one inference on a blank image; returns the seconds it took."""
+        start = time.perf_counter()
+        model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+        return time.perf_counter() - start
+
+    def preload(self, specs, share_memory=False, freeze=False):
+        """
+        Load (and warm up) every model in ``specs``, a list of ``get``
+        keyword dicts, e.g. before starting a forked worker pool.
+
+        ``share_memory`` moves PyTorch weights into shared memory, so
+        workers started with ``torch.multiprocessing`` (any start method)
+        map the same pages instead of copying them. ``freeze``, for right
+        before forking, then moves the objects loaded so far out of the
+        garbage collector's reach, which would otherwise touch them in the
+        forked children and un-share their pages. Frozen objects are never
+        collected, so leave it off when not forking.
+        """
+        models = [self.get(**spec) for spec in specs]
+        if share_memory:
+            for model in models:
+                module = getattr(model, "model", None)
+                if hasattr(module, "share_memory"):
+                    module.share_memory()
+        if freeze and hasattr(gc, "freeze"):
+            gc.freeze()
+        return models
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self.timings.clear()
+            self._model_locks.clear()
+
+    def stats(self):
+        """Load and warm-up timings of every loaded model."""
+        return [dict(timing) for timing in self.timings.values()]
+
+
+registry = ModelRegistry()
+
+
+def get_model(weights_path, backend="pytorch", int8=False, task=None, warmup=True, imgsz=640):
+    """``load_model`` through the process-wide ``registry``."""
+    return registry.get(weights_path, backend, int8=int8, task=task, warmup=warmup, imgsz=imgsz)
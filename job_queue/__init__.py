@@ -0,0 +1,9 @@
+from utils.lazy_import import lazy_exports
+
+_EXPORTS = {
+    "JobQueue": "job_queue.job_queue",
+    "JobCancelled": "job_queue.job_queue",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
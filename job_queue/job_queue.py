@@ -0,0 +1,333 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# Seconds between progress updates (and cancel checks) sent by a worker.
+PROGRESS_INTERVAL = 0.5
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _run_job(job_id, input_path, output_path, pipeline_kwargs, progress, cancel_requests):
+    """Runs one pipeline in a worker process, publishing its progress."""
+    from main import run_pipeline
+
+    last_update = [0.0]
+
+    def report(stage, frames_done, total_frames):
+        now = time.monotonic()
+        finished_stage = total_frames is not None and frames_done >= total_frames
+        if now - last_update[0] < PROGRESS_INTERVAL and not finished_stage:
+            return
+        last_update[0] = now
+        if cancel_requests.get(job_id):
+            raise JobCancelled(job_id)
+        progress[job_id] = {"stage": stage, "done": frames_done, "total": total_frames}
+
+    # Cancelled while waiting in the pool's call queue.
+    if cancel_requests.get(job_id):
+        raise JobCancelled(job_id)
+    progress[job_id] = {"stage": "starting", "done": 0, "total": None}
+    return run_pipeline(
+        input_video_path=input_path,
+        output_video_path=output_path,
+        use_stubs=False,
+        progress_callback=report,
+        **pipeline_kwargs,
+    )
+
+
+class JobQueue:
+    """
+    Runs ``run_pipeline`` jobs in the background on a process pool.
+
+    At most ``max_workers`` pipelines run at once; more jobs wait in the
+    queue. Each worker preloads the models once (``preload``) and keeps
+    them for every job it runs. A job's id is the hash of the input video's
+    content, the pipeline settings and the detector weights, and its result
+    is kept in ``jobs_dir`` under that id: submitting a clip that is queued,
+    running or already done returns the existing job instead of running it
+    again.
+
+    ``status`` is meant to be polled; it reports the stage and the frames
+    done out of the total. ``cancel`` drops a queued job, or stops a running
+    one at its next progress update.
+
+    A worker that dies (killed for memory, a crash in native code) fails
+    the jobs of its pool, and the pool is replaced for the next ones.
+    Finished results are evicted least recently used first once
+    ``jobs_dir`` holds more than ``max_bytes``.
+    """
+
+    def __init__(self, max_workers=1, jobs_dir="jobs", preload=True, model_path=None,
+                 max_bytes=10 * 1024 ** 3):
+        if not os.path.isabs(jobs_dir):
+            jobs_dir = str(PROJECT_ROOT / jobs_dir)
+        self.jobs_dir = jobs_dir
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self.model_path = model_path or str(PROJECT_ROOT / "models/weights/best.pt")
+        self.max_workers = max_workers
+        self.max_bytes = max_bytes
+        self.preload = preload
+
+        self._manager = None
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._start_pool()
+
+    def _start_pool(self):
+        # "spawn" because the app that owns the queue runs threads, which
+        # do not survive a fork cleanly.
+        from main import init_worker
+        context = multiprocessing.get_context("spawn")
+        old_manager = self._manager
+        self._manager = context.Manager()
+        self._progress = self._manager.dict()
+        self._cancel_requests = self._manager.dict()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=context,
+            initializer=init_worker, initargs=(self.preload,),
+        )
+        if old_manager is not None:
+            try:
+                old_manager.shutdown()
+            except Exception:
+                pass
+
+    def _restart_pool(self, broken_executor):
+        """Replace ``broken_executor`` unless that already happened. Call with the lock held."""
+        if self._executor is not broken_executor:
+            return
+        broken_executor.shutdown(wait=False)
+        self._start_pool()
+
+    def job_id(self, content_hash, pipeline_kwargs):
+        from utils import run_key
+        return run_key(content_hash, self.model_path, pipeline_kwargs)[:32]
+
+    def output_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.mp4")
+
+    def _is_complete(self, job_id):
+        # run_pipeline writes the metadata file last, once the video is done.
+        return os.path.exists(os.path.join(self.jobs_dir, f"{job_id}.json"))
+
+    def submit(self, input_path, **pipeline_kwargs):
+        """Queue ``input_path`` for processing; returns the job id."""
+        from utils import hash_file
+        job_id = self.job_id(hash_file(input_path), pipeline_kwargs)
+        return self._submit(job_id, input_path, pipeline_kwargs, remove_input=False)
+
+    def submit_upload(self, data, suffix=".mp4", **pipeline_kwargs):
+        """
+        Queue uploaded video bytes. The bytes are hashed before anything is
+        written, so a duplicate upload costs no disk or processing.
+        """
+        job_id = self.job_id(hashlib.sha256(data).hexdigest(), pipeline_kwargs)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            active = job is not None and job["state"] in (QUEUED, RUNNING)
+        if active or self._is_complete(job_id):
+            return self._submit(job_id, None, pipeline_kwargs, remove_input=False)
+        input_path = os.path.join(self.jobs_dir, f"{job_id}.input{suffix}")
+        with open(input_path, "wb") as f:
+            f.write(data)
+        return self._submit(job_id, input_path, pipeline_kwargs, remove_input=True)
+
+    def _submit(self, job_id, input_path, pipeline_kwargs, remove_input):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job["state"] in (QUEUED, RUNNING):
+                return job_id
+            now = time.time()
+            if self._is_complete(job_id):
+                self._touch(job_id)
+                if job is None or job["state"] != DONE:
+                    self._jobs[job_id] = {
+                        "id": job_id, "state": DONE, "output": self.output_path(job_id),
+                        "error": None, "submitted_at": now, "finished_at": now, "cached": True,
+                        "future": None,
+                    }
+                if remove_input and input_path and os.path.exists(input_path):
+                    os.remove(input_path)
+                return job_id
+            if input_path is None:
+                # A duplicate whose original finished without a result
+                # while this one was being submitted; nothing to run.
+                return job_id
+
+            self._cancel_requests.pop(job_id, None)
+            self._progress.pop(job_id, None)
+            job = {
+                "id": job_id, "state": QUEUED, "output": self.output_path(job_id), "error": None,
+                "submitted_at": now, "finished_at": None, "cached": False,
+            }
+            try:
+                job["future"] = self._submit_to_pool(job_id, input_path, job["output"], pipeline_kwargs)
+            except BrokenProcessPool:
+                self._restart_pool(self._executor)
+                job["future"] = self._submit_to_pool(job_id, input_path, job["output"], pipeline_kwargs)
+            job["executor"] = self._executor
+            self._jobs[job_id] = job
+        job["future"].add_done_callback(
+            lambda future: self._finish(job_id, future, input_path if remove_input else None)
+        )
+        return job_id
+
+    def _submit_to_pool(self, job_id, input_path, output_path, pipeline_kwargs):
+        return self._executor.submit(
+            _run_job, job_id, input_path, output_path, pipeline_kwargs,
+            self._progress, self._cancel_requests,
+        )
+
+    def _finish(self, job_id, future, input_path):
+        broken = False
+        try:
+            future.result()
+            state, error = DONE, None
+        except (CancelledError, JobCancelled):
+            state, error = CANCELLED, None
+        except BrokenProcessPool:
+            state, error, broken = FAILED, "The worker process running the job died.", True
+        except Exception as e:
+            state, error = FAILED, f"{type(e).__name__}: {e}"
+
+        if state != DONE:
+            # Drop partial output so it is never mistaken for a result.
+            for suffix in (".mp4", ".json"):
+                path = os.path.join(self.jobs_dir, f"{job_id}{suffix}")
+                if os.path.exists(path):
+                    os.remove(path)
+        if input_path and os.path.exists(input_path):
+            os.remove(input_path)
+        with self._lock:
+            job = self._jobs[job_id]
+            job["state"], job["error"], job["finished_at"] = state, error, time.time()
+            if broken:
+                self._restart_pool(job["executor"])
+            progress, cancel_requests = self._progress, self._cancel_requests
+        try:
+            cancel_requests.pop(job_id, None)
+            progress.pop(job_id, None)
+        except Exception:
+            # The manager of a replaced pool may be gone already.
+            pass
+        if state == DONE:
+            self.evict()
+
+    def _job_files(self, job_id):
+        return [
+            os.path.join(self.jobs_dir, name) for name in os.listdir(self.jobs_dir)
+            if name.split(".", 1)[0] == job_id
+        ]
+
+    def _touch(self, job_id):
+        try:
+            os.utime(self.output_path(job_id))
+        except OSError:
+            pass
+
+    def evict(self):
+        """
+        Remove finished results, least recently used first (by the output's
+        mtime, bumped when a submission reuses it), until ``jobs_dir`` holds
+        at most ``max_bytes``. Queued and running jobs are never touched.
+        """
+        with self._lock:
+            active = {job_id for job_id, job in self._jobs.items() if job["state"] in (QUEUED, RUNNING)}
+        sizes, total = {}, 0
+        for name in os.listdir(self.jobs_dir):
+            try:
+                size = os.stat(os.path.join(self.jobs_dir, name)).st_size
+            except OSError:
+                continue
+            total += size
+            job_id = name.split(".", 1)[0]
+            sizes[job_id] = sizes.get(job_id, 0) + size
+
+        finished = []
+        for job_id, size in sizes.items():
+            if job_id in active or not self._is_complete(job_id):
+                continue
+            try:
+                mtime = os.stat(self.output_path(job_id)).st_mtime
+            except OSError:
+                mtime = 0.0
+            finished.append((mtime, size, job_id))
+
+        for _, size, job_id in sorted(finished):
+            if total <= self.max_bytes:
+                break
+            for path in self._job_files(job_id):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None and job["state"] == DONE:
+                    del self._jobs[job_id]
+
+    def status(self, job_id):
+        """
+        The job's ``state`` (queued, running, done, failed or cancelled),
+        current ``stage`` with ``done``/``total`` frames, ``output`` path and
+        ``error``; None for an unknown id.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            status = {key: value for key, value in job.items() if key not in ("future", "executor")}
+            progress_dict = self._progress
+        progress = progress_dict.get(job_id) if status["state"] not in FINISHED_STATES else None
+        if status["state"] == QUEUED and progress is not None:
+            status["state"] = RUNNING
+        status.update(progress or {"stage": None, "done": None, "total": None})
+        status["cancelling"] = bool(self._cancel_requests.get(job_id))
+        return status
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Returns False if it already finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] in FINISHED_STATES:
+                return False
+        if job["future"].cancel():
+            return True
+        self._cancel_requests[job_id] = True
+        return True
+
+    def wait(self, job_id, timeout=None, poll_interval=PROGRESS_INTERVAL):
+        """Block until the job finishes (or ``timeout`` passes); returns its status."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.status(job_id)
+            if status is None or status["state"] in FINISHED_STATES:
+                return status
+            if deadline is not None and time.monotonic() >= deadline:
+                return status
+            time.sleep(poll_interval)
+
+    def jobs(self):
+        return [self.status(job_id) for job_id in list(self._jobs)]
+
+    def shutdown(self, wait=True):
+        for job_id in list(self._jobs):
+            self.cancel(job_id)
+        self._executor.shutdown(wait=wait)
+        self._manager.shutdown()
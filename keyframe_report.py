@@ -0,0 +1,53 @@
+import argparse
+import itertools
+import json
+import os
+
+from trackers import evaluate_detection_stride
+from utils import iter_video
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare detection strides (keyframes only) against detecting every frame.",
+    )
+    parser.add_argument("video", help="clip to evaluate on")
+    parser.add_argument("--weights", required=True, help="detector weights (.pt)")
+    parser.add_argument("--frames", type=int, default=250, help="frames of the clip to use")
+    parser.add_argument("--strides", type=int, nargs="+", default=[2, 3, 5])
+    parser.add_argument("--output", default="keyframe_report.json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    for path in (args.video, args.weights):
+        if not os.path.exists(path):
+            raise SystemExit(f"Not found: {path}")
+    video_path = args.video
+    frames = list(itertools.islice(iter_video(video_path), args.frames))
+    if not frames:
+        raise SystemExit(f"Could not read frames from {video_path}")
+
+    rows = evaluate_detection_stride(
+        args.weights, frames, strides=args.strides, adaptive_strides=(max(args.strides),)
+    )
+    with open(args.output, "w") as f:
+        json.dump(rows, f, indent=2)
+
+    print(f"{len(frames)} frames of {video_path}")
+    print("stride  adaptive  keyframes     fps  speedup  player recall  player IoU  ball recall")
+    for row in rows:
+        players, ball = row["accuracy"]["players"], row["accuracy"]["ball"]
+        # No matched boxes, no IoU.
+        iou = f"{players['mean_iou']:>10.3f}" if players["mean_iou"] is not None else f"{'-':>10}"
+        print(
+            f"{row['stride']:>6}  {str(row['adaptive']):>8}  {row['keyframes']:>9}  {row['fps']:>6.1f}"
+            f"  {row['speedup']:>7.2f}  {players['recall']:>13.3f}  {iou}"
+            f"  {ball['recall']:>11.3f}"
+        )
+    print(f"report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,122 +1,725 @@
-from player_ball_assigner import PlayerBallAssigner
-from utils import read_video, save_video
-from trackers import Tracker
-import cv2
-import numpy as np
-from team_assignment import TeamAssigner
-from camera_movement import CameraMovementEstimator
-from viewtransformer import ViewTransformer
-from speed_and_distance_etimator import Speed_and_Distance_Estimator
+# Stage packages are imported as modules and their classes looked up when a
+# run needs them (the packages import lazily), so ``import main`` stays fast
+# and heavy libraries (torch, supervision, scikit-learn) load only with the
+# stage that uses them.
+import annotation_renderer
+import camera_movement
+import inference
+import player_ball_assigner
+import speed_and_distance_etimator
+import team_assignment
+import trackers
+import utils
+import viewtransformer
 from pathlib import Path
+import contextlib
+import itertools
+import json
 import os
+import pickle
 
 
 # Get project root directory
 PROJECT_ROOT = Path(__file__).resolve().parent
+MODEL_PATH = str(PROJECT_ROOT / 'models/weights/best.pt')
+KEYPOINT_MODEL_PATH = str(PROJECT_ROOT / 'pos_model/best.pt')
 
 
 def run_pipeline(
     input_video_path: str = 'inputs/video1.mp4',
     output_video_path: str = 'output_videos/output_video_final.mp4',
     use_stubs: bool = True,
+    streaming: bool = False,
+    memory_budget_mb: int = 512,
+    camera_movement_workers: int = 1,
+    camera_movement_downscale: float = 1.0,
+    use_cache: bool = False,
+    cache_dir: str = 'cache',
+    detection_stride: int = 1,
+    adaptive_stride: bool = False,
+    inference_backend: str = 'pytorch',
+    int8: bool = False,
+    inference_batch_size='auto',
+    inference_imgsz=None,
+    ball_detection: str = 'full',
+    progress_callback=None,
+    profile_stages=(),
+    trace_memory=False,
+    stub_dir: str = 'stubs',
+    shards: int = 1,
+    shard_overlap: int = 30,
+    decoder_backend: str = 'opencv',
 ):
+    """
+    Run tracking and analytics on a video and write the annotated result.
+
+    With ``streaming=True`` frames are never collected into a list: the video
+    is decoded twice (analysis, then rendering) in chunks sized to fit
+    ``memory_budget_mb``, so peak memory does not grow with video length.
+
+    ``camera_movement_workers > 1`` estimates camera movement in overlapping
+    segments on a process pool; ``camera_movement_downscale`` < 1 runs it on
+    a smaller grayscale image.
+
+    With ``use_cache`` tracking and camera-movement results are stored in
+    ``cache_dir`` keyed by the video content, model weights and stage
+    parameters, so repeat runs on the same clip skip those stages. The
+    path-keyed stubs are not read while the cache is in use.
+
+    ``detection_stride > 1`` runs the detector every ``detection_stride``
+    frames and propagates boxes in between; with ``adaptive_stride`` a
+    keyframe is also taken early when motion is high.
+
+    ``inference_backend`` runs the models on PyTorch, ONNX Runtime
+    (``'onnx'``, optionally ``int8``) or OpenVINO, exporting them on first
+    use and falling back to PyTorch when the runtime is missing.
+    ``inference_batch_size`` is a number or ``'auto'`` (tuned from measured
+    latency), and ``inference_imgsz`` sets the detector input resolution
+    (``None`` keeps the model's). The settings used are written next to the
+    output video as ``<name>.json``. ``ball_detection='roi'`` searches the
+    ball in a full-resolution crop around its expected position (tiled
+    search when lost) instead of taking it from the main detection pass.
+
+    ``progress_callback(stage, frames_done, total_frames)`` is called as
+    the run goes through its stages (``'tracking'``, which includes
+    decoding, ``'camera_movement'``, ``'analysis'``, ``'rendering'``); ``total_frames``
+    is None when the container does not report it. Raising from the
+    callback aborts the run.
+
+    Every stage is timed (wall and CPU time, frames, frames per second,
+    peak memory, see ``utils.RunProfiler``); the report goes into
+    ``<name>.json`` under ``'performance'`` and into ``<name>.prom`` in
+    the Prometheus text format. ``profile_stages`` lists stages to run the
+    sampling profiler on, and ``trace_memory`` adds tracemalloc peaks.
+
+    Stubs are read from and refreshed in ``stub_dir``.
+
+    ``shards > 1`` runs detection, tracking and camera movement on that
+    many time shards of the video in parallel processes, each starting
+    ``shard_overlap`` frames early; track ids are stitched across shards by
+    matching boxes in the overlap (see ``trackers.track_in_shards``). Shards
+    replace ``camera_movement_workers``. The first shard keeps a single
+    pass's track ids; tracks that start later may be numbered differently,
+    so an id-based rule (``TeamAssigner``'s player 91) only holds for
+    players first seen in the first shard.
+
+    ``decoder_backend`` decodes the video with OpenCV, PyAV (``'pyav'``),
+    an ffmpeg process (``'ffmpeg'``) or whichever is best installed
+    (``'auto'``, see ``utils.open_decoder``). The container metadata is
+    probed first, so an empty or unreadable video fails before any decoding.
+    """
+    progress = progress_callback or _no_progress
     # Convert relative paths to absolute paths based on project root
     if not os.path.isabs(input_video_path):
         input_video_path = str(PROJECT_ROOT / input_video_path)
     if not os.path.isabs(output_video_path):
         output_video_path = str(PROJECT_ROOT / output_video_path)
+    if not os.path.isabs(stub_dir):
+        stub_dir = str(PROJECT_ROOT / stub_dir)
 
     # Validate input video exists
     if not os.path.exists(input_video_path):
         raise FileNotFoundError(f"Input video not found: {input_video_path}")
+    decoder_backend = utils.resolve_decoder(decoder_backend)
+    video_properties = utils.probe_video(input_video_path, decoder_backend)
+    if not video_properties['has_frames']:
+        raise ValueError(f"No frames could be read from video: {input_video_path}")
 
     # Ensure output directory exists
     output_dir = os.path.dirname(output_video_path)
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir, exist_ok=True)
 
-    video_frames = read_video(input_video_path)
-    if not video_frames or len(video_frames) == 0:
+    cache = None
+    if use_cache:
+        if not os.path.isabs(cache_dir):
+            cache_dir = str(PROJECT_ROOT / cache_dir)
+        cache = utils.ResultCache(cache_dir)
+
+    # Closed however the run ends (errors, cancellation), so no sampler
+    # thread or tracemalloc is left running in a long-lived worker.
+    with utils.RunProfiler(profile_stages, trace_memory=trace_memory) as profiler:
+        run = _run_pipeline_streaming if streaming else _run_pipeline_in_memory
+        return run(
+            input_video_path,
+            output_video_path,
+            use_stubs,
+            stub_dir,
+            cache,
+            memory_budget_mb,
+            camera_movement_workers,
+            camera_movement_downscale,
+            detection_stride,
+            adaptive_stride,
+            inference_backend,
+            int8,
+            inference_batch_size,
+            inference_imgsz,
+            ball_detection,
+            progress,
+            profiler,
+            shards,
+            shard_overlap,
+            decoder_backend,
+            video_properties,
+        )
+
+
+def _run_pipeline_in_memory(
+    input_video_path,
+    output_video_path,
+    use_stubs,
+    stub_dir,
+    cache,
+    memory_budget_mb,
+    camera_movement_workers,
+    camera_movement_downscale,
+    detection_stride,
+    adaptive_stride,
+    inference_backend,
+    int8,
+    inference_batch_size,
+    inference_imgsz,
+    ball_detection,
+    progress,
+    profiler,
+    shards,
+    shard_overlap,
+    decoder_backend,
+    video_properties,
+):
+    # Frames are decoded as detection consumes them (on the detection
+    # pipeline's decode thread, overlapping inference) and kept for the
+    # later stages; whatever detection did not need is decoded after it.
+    video_frames = []
+    source = utils.FrameSource(utils.iter_video(input_video_path, backend=decoder_backend), keep=video_frames)
+    first_frame = source.peek()
+    if first_frame is None:
         raise ValueError(f"No frames could be read from video: {input_video_path}")
+    total_frames = video_properties['frame_count'] or None
+
+    tracker = _load_tracker(
+        detection_stride, adaptive_stride, inference_backend, int8,
+        inference_batch_size, inference_imgsz, ball_detection,
+    )
+    camera_movement_estimator = camera_movement.CameraMovementEstimator(
+        first_frame, downscale=camera_movement_downscale
+    )
+    tracks_key, camera_movement_key = _cache_keys(
+        cache, input_video_path, tracker, camera_movement_estimator, camera_movement_workers,
+        shards, shard_overlap, decoder_backend,
+    )
+
+    progress('tracking', 0, total_frames)
+    tracks = camera_movement_per_frame = None
+    if shards > 1:
+        tracks, camera_movement_per_frame = _track_in_shards(
+            input_video_path, tracker, use_stubs, stub_dir, cache, tracks_key, camera_movement_key,
+            shards, shard_overlap, memory_budget_mb, camera_movement_downscale,
+            decoder_backend, total_frames, progress, profiler,
+        )
+    with _detect_and_track(profiler, tracker, source) as stage:
+        if tracks is None and cache is not None:
+            tracks = cache.get_tracks(tracks_key)
+        if tracks is None:
+            stub_path = os.path.join(stub_dir, 'track_stubs.pkl')
+            tracks = tracker.get_object_tracks(
+                source,
+                read_from_stub=use_stubs and cache is None,
+                stub_path=stub_path,
+                on_frames=lambda frames_done: progress('tracking', frames_done, total_frames),
+            )
+            if cache is not None:
+                cache.put_tracks(tracks_key, tracks)
+        stage.items = len(tracks['ball'])
+    for _ in source:
+        pass
+    profiler.record('read', source.seconds, source.cpu_seconds, source.count)
+    num_frames = len(video_frames)
+    progress('tracking', num_frames, num_frames)
+    with profiler.stage('ball_interpolation', num_frames):
+        tracks['ball'] = tracker.interpolate_ball_positions(tracks['ball'])
+        tracks = utils.TrackStore.from_tracks(tracks)
+        tracker.add_position_to_tracks(tracks)
+
+    progress('camera_movement', 0, num_frames)
+    with profiler.stage('camera_movement', num_frames):
+        if camera_movement_per_frame is None and cache is not None:
+            camera_movement_per_frame = cache.get_camera_movement(camera_movement_key)
+        if camera_movement_per_frame is None:
+            camera_movement_stub_path = os.path.join(stub_dir, 'camera_movement.pkl')
+            if camera_movement_workers > 1:
+                camera_movement_per_frame = camera_movement_estimator.get_camera_movement_from_video(
+                    input_video_path,
+                    n_workers=camera_movement_workers,
+                    read_from_stub=use_stubs and cache is None,
+                    stub_path=camera_movement_stub_path,
+                    decoder_backend=decoder_backend,
+                )
+            else:
+                camera_movement_per_frame = camera_movement_estimator.get_camera_movement(
+                    video_frames,
+                    read_from_stub=use_stubs and cache is None,
+                    stub_path=camera_movement_stub_path,
+                    on_frames=lambda frames_done: progress('camera_movement', frames_done, num_frames),
+                )
+            if cache is not None:
+                cache.put_camera_movement(camera_movement_key, camera_movement_per_frame)
+        camera_movement_estimator.add_adjust_positions_to_tracks(
+            tracks, camera_movement_per_frame
+        )
+    progress('camera_movement', num_frames, num_frames)
+
+    with profiler.stage('view_transform', num_frames):
+        view_transformer = viewtransformer.ViewTransformer(
+            reference_frame=video_frames[0], use_keypoint_model=True,
+            inference_backend=inference_backend, int8=int8,
+        )
+        view_transformer.add_transformed_position_to_tracks(tracks)
+
+    with profiler.stage('speed_distance', num_frames):
+        speed_and_distance_estimator = speed_and_distance_etimator.Speed_and_Distance_Estimator(
+            frame_rate=video_properties['fps']
+        )
+        speed_and_distance_estimator.add_speed_and_distance_to_tracks(tracks)
+
+    with profiler.stage('team_assignment', num_frames), team_assignment.TeamAssigner() as team_assigner:
+        team_assigner.assign_team_color(video_frames[0], tracks['players'][0])
+        team_assigner.assign_teams(tracks, video_frames)
+
+    with profiler.stage('possession', num_frames):
+        player_assigner = player_ball_assigner.PlayerBallAssigner()
+        team_ball_control = player_assigner.assign_ball_possession(tracks)
+        possession_stats = player_ball_assigner.PossessionStats.from_team_ball_control(
+            team_ball_control, player_ball_assigner.get_ball_holders(tracks)
+        )
+    progress('analysis', num_frames, num_frames)
+
+    renderer = annotation_renderer.AnnotationRenderer(
+        tracker, tracks, possession_stats,
+        camera_movement_estimator, camera_movement_per_frame,
+        speed_and_distance_estimator,
+    )
+    # Frames are annotated in place; nothing reads the raw frames afterwards.
+    # The render stage includes waiting on the encoder when it falls behind.
+    with utils.VideoWriter(output_video_path, fps=video_properties['fps']) as writer:
+        with profiler.stage('render', num_frames):
+            for frame_num, frame in enumerate(renderer.render(video_frames), start=1):
+                writer.write(frame)
+                progress('rendering', frame_num, num_frames)
+    profiler.record('encode', writer.encode_seconds, writer.encode_cpu_seconds, writer.frames_written)
+
+    _write_run_metadata(output_video_path, input_video_path, video_properties, tracker, profiler)
+    return output_video_path
+
 
-    model_path = str(PROJECT_ROOT / 'models/weights/best.pt')
+def _write_run_metadata(output_video_path, input_video_path, video_properties, tracker, profiler):
+    output_stem = os.path.splitext(output_video_path)[0]
+    profiler.write_prometheus(output_stem + '.prom', labels={'video': os.path.basename(input_video_path)})
+    metadata = {
+        'input_video': input_video_path,
+        'output_video': output_video_path,
+        'fps': video_properties['fps'],
+        'frame_size': video_properties['frame_size'],
+        'decoder': video_properties['backend'],
+        'inference': tracker.inference_metadata(),
+        'models': inference.registry.stats(),
+        'performance': profiler.report(),
+    }
+    with open(output_stem + '.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+
+def preload_models(inference_backend='pytorch', int8=False, share_memory=False, freeze=False):
+    """
+    Load and warm up the detector and pitch keypoint models once for this
+    process, so the first ``run_pipeline`` call only pays for inference.
+    To share the models with forked worker processes, call it with
+    ``freeze=True`` right before forking (see ``ModelRegistry.preload``).
+    Returns the load and warm-up timings.
+    """
+    specs = [dict(weights_path=MODEL_PATH, backend=inference_backend, int8=int8)]
+    if os.path.exists(KEYPOINT_MODEL_PATH):
+        specs.append(dict(weights_path=KEYPOINT_MODEL_PATH, backend=inference_backend, int8=int8,
+                          task='pose'))
+    inference.registry.preload(specs, share_memory=share_memory, freeze=freeze)
+    return inference.registry.stats()
+
+
+def init_worker(preload=True, threads=None, inference_backend='pytorch', int8=False):
+    """
+    Initializer for pipeline worker processes: caps the worker's thread
+    pools at ``threads`` (workers share the machine) and, with ``preload``,
+    loads the models before the first video. A model that fails to load
+    here is left to the first video, which reports the error.
+    """
+    if threads:
+        utils.limit_threads(threads)
+    if preload:
+        try:
+            preload_models(inference_backend, int8)
+        except Exception:
+            pass
+
+
+def _load_tracker(detection_stride=1, adaptive_stride=False, inference_backend='pytorch', int8=False,
+                  batch_size='auto', imgsz=None, ball_detection='full'):
+    model_path = MODEL_PATH
     if not os.path.exists(model_path):
         raise FileNotFoundError(
             f"Model file not found: {model_path}. "
             f"Please ensure the model file is in the repository."
         )
-    tracker = Tracker(model_path)
-    stub_path = str(PROJECT_ROOT / 'stubs/track_stubs.pkl')
-    tracks = tracker.get_object_tracks(
-        video_frames,
-        read_from_stub=use_stubs,
-        stub_path=stub_path,
+    return trackers.Tracker(
+        model_path,
+        detection_stride=detection_stride,
+        adaptive_stride=adaptive_stride,
+        inference_backend=inference_backend,
+        int8=int8,
+        batch_size=batch_size,
+        imgsz=imgsz,
+        ball_detection=ball_detection,
     )
-    tracker.add_position_to_tracks(tracks)
 
-    tracks['ball'] = tracker.interpolate_ball_positions(tracks['ball'])
 
-    camera_movement_estimator = CameraMovementEstimator(video_frames[0])
-    camera_movement_stub_path = str(PROJECT_ROOT / 'stubs/camera_movement.pkl')
-    camera_movement_per_frame = camera_movement_estimator.get_camera_movement(
-        video_frames,
-        read_from_stub=use_stubs,
-        stub_path=camera_movement_stub_path,
+def _cache_keys(cache, input_video_path, tracker, camera_movement_estimator, camera_movement_workers,
+                shards=1, shard_overlap=30, decoder_backend='opencv'):
+    if cache is None:
+        return None, None
+    tracks_params = {'conf': 0.1, 'tracker': 'ByteTrack'}
+    # Decoders can differ by a rounding here and there in the pixels.
+    decoder = decoder_backend if decoder_backend != 'opencv' else None
+    if decoder is not None:
+        tracks_params['decoder'] = decoder
+    if shards > 1:
+        tracks_params['shards'] = shards
+        tracks_params['shard_overlap'] = shard_overlap
+    if tracker.keyframe_detector is not None:
+        tracks_params['detection_stride'] = tracker.keyframe_detector.stride
+        tracks_params['adaptive_stride'] = tracker.keyframe_detector.adaptive
+    if tracker.inference_backend != 'pytorch':
+        tracks_params['inference_backend'] = tracker.inference_backend
+        tracks_params['int8'] = tracker.int8
+    if tracker.imgsz is not None:
+        tracks_params['imgsz'] = tracker.imgsz
+    if tracker.ball_detector is not None:
+        tracks_params['ball_detection'] = 'roi'
+    tracks_key = cache.make_key(
+        'tracks',
+        input_video_path,
+        model_paths=[MODEL_PATH],
+        params=tracks_params,
     )
-    camera_movement_estimator.add_adjust_positions_to_tracks(
-        tracks, camera_movement_per_frame
+    features = {
+        key: value
+        for key, value in camera_movement_estimator.features.items()
+        if key != 'mask'
+    }
+    camera_movement_key = cache.make_key(
+        'camera_movement',
+        input_video_path,
+        params={
+            'downscale': camera_movement_estimator.downscale,
+            'minimum_distance': camera_movement_estimator.minimum_distance,
+            'features': features,
+            'lk_params': camera_movement_estimator.lk_params,
+            'parallel': camera_movement_workers > 1 and shards <= 1,
+            'shards': (shards, shard_overlap) if shards > 1 else None,
+            'decoder': decoder,
+        },
     )
+    return tracks_key, camera_movement_key
 
 
-    view_transformer = ViewTransformer(reference_frame=video_frames[0], use_keypoint_model=True)
-    view_transformer.add_transformed_position_to_tracks(tracks)
+def _track_in_shards(input_video_path, tracker, use_stubs, stub_dir, cache, tracks_key, camera_movement_key,
+                     shards, shard_overlap, memory_budget_mb, camera_movement_downscale,
+                     decoder_backend, total_frames, progress, profiler):
+    """
+    Tracks and camera movement from ``trackers.track_in_shards``, unless the
+    cache (or, with ``use_stubs``, the stubs) already has them. Fresh results
+    refresh the stubs and the cache like the other paths.
+    """
+    stub_path = os.path.join(stub_dir, 'track_stubs.pkl')
+    camera_movement_stub_path = os.path.join(stub_dir, 'camera_movement.pkl')
+    tracks = camera_movement_per_frame = None
+    if cache is not None:
+        tracks = cache.get_tracks(tracks_key)
+        camera_movement_per_frame = cache.get_camera_movement(camera_movement_key)
+    elif use_stubs:
+        if os.path.exists(stub_path):
+            with open(stub_path, 'rb') as f:
+                tracks = pickle.load(f)
+        if os.path.exists(camera_movement_stub_path):
+            with open(camera_movement_stub_path, 'rb') as f:
+                camera_movement_per_frame = pickle.load(f)
+    if tracks is not None and camera_movement_per_frame is not None:
+        return tracks, camera_movement_per_frame
 
-    speed_and_distance_estimator = Speed_and_Distance_Estimator()
-    speed_and_distance_estimator.add_speed_and_distance_to_tracks(tracks)
+    # Wall time of the whole sharded run; the workers' own read, detection
+    # and camera movement times are added to those stages below.
+    with profiler.stage('sharded_tracking') as stage:
+        sharded_tracks, sharded_camera_movement, shard_results = trackers.track_in_shards(
+            input_video_path, tracker.model_path, shards,
+            overlap=shard_overlap,
+            memory_budget_mb=memory_budget_mb,
+            camera_movement_downscale=camera_movement_downscale,
+            on_shard_done=lambda frames_done: progress('tracking', frames_done, total_frames),
+            tracker_kwargs=tracker.settings,
+            decoder_backend=decoder_backend,
+        )
+        stage.items = len(sharded_camera_movement)
+    for result in shard_results:
+        frames = len(result['tracks']['ball'])
+        for name, (wall_seconds, cpu_seconds) in result['timings'].items():
+            profiler.record(name, wall_seconds, cpu_seconds, frames)
 
-    team_assigner = TeamAssigner()
-    team_assigner.assign_team_color(video_frames[0], tracks['players'][0])
-    for frame_number, player_track in enumerate(tracks['players']):
-        for player_id, track in player_track.items():
-            team = team_assigner.get_player_team(
-                video_frames[frame_number], track['bbox'], player_id
-            )
-            tracks['players'][frame_number][player_id]['team'] = team
-            tracks['players'][frame_number][player_id]['team_color'] = (
-                team_assigner.team_colors[team]
-            )
+    if tracks is None:
+        tracks = sharded_tracks
+        _save_stub(tracks, stub_path)
+        if cache is not None:
+            cache.put_tracks(tracks_key, tracks)
+    if camera_movement_per_frame is None:
+        camera_movement_per_frame = sharded_camera_movement
+        _save_stub(camera_movement_per_frame, camera_movement_stub_path)
+        if cache is not None:
+            cache.put_camera_movement(camera_movement_key, camera_movement_per_frame)
+    return tracks, camera_movement_per_frame
 
-    player_assigner = PlayerBallAssigner()
-    team_ball_control = []
-    last_team_with_ball = 0
-    for frame_num, player_track in enumerate(tracks['players']):
-        ball_bbox = tracks['ball'][frame_num][1]['bbox']
-        assigned_player = player_assigner.assign_ball_to_player(
-            player_track, ball_bbox
+
+@contextlib.contextmanager
+def _detect_and_track(profiler, tracker, source):
+    """
+    Record the tracker calls inside as two stages: 'detect' and 'track'
+    (ByteTrack updates, timed by the tracker). Decoding frames pulled from
+    ``source`` is recorded as 'read' by the caller, so its CPU time is left
+    out; when tracking runs on its own thread its wall time overlaps
+    detection and is not taken out of 'detect'.
+    """
+    decode_cpu = source.cpu_seconds
+    tracking_seconds, tracking_cpu_seconds = tracker.tracking_seconds, tracker.tracking_cpu_seconds
+    with profiler.stage('detect') as stage:
+        yield stage
+        tracking_seconds = tracker.tracking_seconds - tracking_seconds
+        tracking_cpu_seconds = tracker.tracking_cpu_seconds - tracking_cpu_seconds
+        stage.exclude(
+            0.0 if tracker.tracking_overlaps else tracking_seconds,
+            tracking_cpu_seconds + source.cpu_seconds - decode_cpu,
         )
+    if tracking_seconds:
+        profiler.record('track', tracking_seconds, tracking_cpu_seconds, stage.items)
 
-        if assigned_player != -1:
-            tracks['players'][frame_num][assigned_player]['has_ball'] = True
-            last_team_with_ball = (
-                tracks['players'][frame_num][assigned_player].get('team', 0) or 0
-            )
 
-        team_ball_control.append(last_team_with_ball)
+def _no_progress(stage, frames_done, total_frames):
+    pass
+
+
+def _save_stub(data, stub_path):
+    with open(stub_path, 'wb') as f:
+        pickle.dump(data, f)
+
 
-    team_ball_control = np.array(team_ball_control)
+def _run_pipeline_streaming(
+    input_video_path,
+    output_video_path,
+    use_stubs,
+    stub_dir,
+    cache,
+    memory_budget_mb,
+    camera_movement_workers,
+    camera_movement_downscale,
+    detection_stride,
+    adaptive_stride,
+    inference_backend,
+    int8,
+    inference_batch_size,
+    inference_imgsz,
+    ball_detection,
+    progress,
+    profiler,
+    shards,
+    shard_overlap,
+    decoder_backend,
+    video_properties,
+):
+    source = utils.FrameSource(utils.iter_video(input_video_path, backend=decoder_backend))
+    first_frame = source.peek()
+    if first_frame is None:
+        raise ValueError(f"No frames could be read from video: {input_video_path}")
+    chunk_size = utils.get_chunk_size(first_frame, memory_budget_mb)
+    total_frames = video_properties['frame_count'] or None
+
+    tracker = _load_tracker(
+        detection_stride, adaptive_stride, inference_backend, int8,
+        inference_batch_size, inference_imgsz, ball_detection,
+    )
+    camera_movement_estimator = camera_movement.CameraMovementEstimator(
+        first_frame, downscale=camera_movement_downscale
+    )
 
-    output_video_frames = tracker.draw_annotations(
-        video_frames, tracks, team_ball_control
+    # Pass 1: detection, tracking and camera movement. Only the per-frame
+    # track dicts and movement vectors are kept, never the frames themselves.
+    stub_path = os.path.join(stub_dir, 'track_stubs.pkl')
+    camera_movement_stub_path = os.path.join(stub_dir, 'camera_movement.pkl')
+    tracks_key, camera_movement_key = _cache_keys(
+        cache, input_video_path, tracker, camera_movement_estimator, camera_movement_workers,
+        shards, shard_overlap, decoder_backend,
     )
-    output_video_frames = camera_movement_estimator.draw_camera_movement(
-        output_video_frames, camera_movement_per_frame
+    tracks = None
+    camera_movement_per_frame = None
+    if cache is not None:
+        tracks = cache.get_tracks(tracks_key)
+        camera_movement_per_frame = cache.get_camera_movement(camera_movement_key)
+    else:
+        if use_stubs and os.path.exists(stub_path):
+            tracks = tracker.get_object_tracks([], read_from_stub=True, stub_path=stub_path)
+        if use_stubs and os.path.exists(camera_movement_stub_path):
+            camera_movement_per_frame = camera_movement_estimator.get_camera_movement(
+                [], read_from_stub=True, stub_path=camera_movement_stub_path
+            )
+    if shards > 1 and (tracks is None or camera_movement_per_frame is None):
+        tracks, camera_movement_per_frame = _track_in_shards(
+            input_video_path, tracker, use_stubs, stub_dir, cache, tracks_key, camera_movement_key,
+            shards, shard_overlap, memory_budget_mb, camera_movement_downscale,
+            decoder_backend, total_frames, progress, profiler,
+        )
+    if camera_movement_per_frame is None and camera_movement_workers > 1:
+        camera_movement_per_frame = camera_movement_estimator.get_camera_movement_from_video(
+            input_video_path,
+            n_workers=camera_movement_workers,
+            stub_path=camera_movement_stub_path,
+            decoder_backend=decoder_backend,
+        )
+        if cache is not None:
+            cache.put_camera_movement(camera_movement_key, camera_movement_per_frame)
+
+    if tracks is None or camera_movement_per_frame is None:
+        detect = tracks is None
+        if detect:
+            tracks = {"players": [], "referees": [], "ball": []}
+        estimate_movement = camera_movement_per_frame is None
+        if estimate_movement:
+            camera_movement_per_frame = []
+            camera_movement_estimator.reset_camera_movement()
+
+        frames_done = 0
+        progress('tracking', frames_done, total_frames)
+        while True:
+            # Each chunk is decoded as detection consumes it, on the
+            # detection pipeline's decode thread, overlapping inference.
+            chunk = source.keep = []
+            frames = itertools.islice(source, chunk_size)
+            if detect:
+                with _detect_and_track(profiler, tracker, source) as stage:
+                    tracker.extend_object_tracks(
+                        tracks, frames,
+                        on_frames=lambda done: progress('tracking', frames_done + done, total_frames),
+                    )
+                    stage.items = len(chunk)
+            else:
+                for _ in frames:
+                    pass
+            if not chunk:
+                break
+            if estimate_movement:
+                with profiler.stage('camera_movement', len(chunk)):
+                    camera_movement_per_frame.extend(
+                        camera_movement_estimator.update_camera_movement(frame)
+                        for frame in chunk
+                    )
+            frames_done += len(chunk)
+            progress('tracking', frames_done, total_frames)
+        profiler.record('read', source.seconds, source.cpu_seconds, source.count)
+
+        # Refresh the stubs exactly like the in-memory path does.
+        if detect:
+            _save_stub(tracks, stub_path)
+            if cache is not None:
+                cache.put_tracks(tracks_key, tracks)
+        if estimate_movement:
+            _save_stub(camera_movement_per_frame, camera_movement_stub_path)
+            if cache is not None:
+                cache.put_camera_movement(camera_movement_key, camera_movement_per_frame)
+
+    # Ball interpolation and the position/speed stages only touch the
+    # (small) track data, so they run on the whole match between passes.
+    num_frames = len(tracks['ball'])
+    with profiler.stage('ball_interpolation', num_frames):
+        tracks['ball'] = tracker.interpolate_ball_positions(tracks['ball'])
+        tracks = utils.TrackStore.from_tracks(tracks)
+        tracker.add_position_to_tracks(tracks)
+    with profiler.stage('camera_movement'):
+        camera_movement_estimator.add_adjust_positions_to_tracks(
+            tracks, camera_movement_per_frame
+        )
+
+    with profiler.stage('view_transform', num_frames):
+        view_transformer = viewtransformer.ViewTransformer(
+            reference_frame=first_frame, use_keypoint_model=True,
+            inference_backend=inference_backend, int8=int8,
+        )
+        view_transformer.add_transformed_position_to_tracks(tracks)
+
+    with profiler.stage('speed_distance', num_frames):
+        speed_and_distance_estimator = speed_and_distance_etimator.Speed_and_Distance_Estimator(
+            frame_rate=video_properties['fps']
+        )
+        speed_and_distance_estimator.add_speed_and_distance_to_tracks(tracks)
+
+    with profiler.stage('team_assignment'):
+        team_assigner = team_assignment.TeamAssigner()
+        team_assigner.assign_team_color(first_frame, tracks['players'][0])
+    player_assigner = player_ball_assigner.PlayerBallAssigner()
+    possession_stats = player_ball_assigner.PossessionStats()
+    progress('analysis', tracks.num_frames, tracks.num_frames)
+    renderer = annotation_renderer.AnnotationRenderer(
+        tracker, tracks, possession_stats,
+        camera_movement_estimator, camera_movement_per_frame,
+        speed_and_distance_estimator,
     )
-    output_video_frames = speed_and_distance_estimator.draw_speed_and_distance(
-        tracks, output_video_frames
+
+    # Pass 2: team assignment, possession and rendering chunk by chunk. Each
+    # rendered frame goes to the background writer, so encoding overlaps with
+    # rendering the rest of the chunk.
+    height, width = first_frame.shape[:2]
+    writer = utils.VideoWriter(
+        output_video_path,
+        fps=video_properties['fps'],
+        frame_size=(width, height),
+        queue_size=chunk_size,
     )
 
-    save_video(output_video_frames, output_video_path)
+    # The team assigner's worker pool (if any) is shut down with the writer.
+    with writer, team_assigner:
+        start_frame = 0
+        frames = utils.iter_video(input_video_path, backend=decoder_backend)
+        chunks = utils.iter_chunks(frames, chunk_size)
+        for chunk in profiler.timed_iter('read', chunks, len):
+            # Tracks and the decoded video can disagree by a frame or two at
+            # the end of some containers; stop at whichever is shorter.
+            chunk = chunk[:max(0, tracks.num_frames - start_frame)]
+            if not chunk:
+                break
+            end_frame = start_frame + len(chunk)
+
+            with profiler.stage('team_assignment', len(chunk)):
+                team_assigner.assign_teams(tracks, chunk, start_frame)
+            with profiler.stage('possession', len(chunk)):
+                team_ball_control = player_assigner.assign_ball_possession(
+                    tracks, start_frame, end_frame, possession_stats.last_team
+                )
+                possession_stats.update(
+                    team_ball_control, player_ball_assigner.get_ball_holders(tracks, start_frame, end_frame)
+                )
+
+            with profiler.stage('render', len(chunk)):
+                for frame in renderer.render(chunk, start_frame):
+                    writer.write(frame)
+
+            start_frame = end_frame
+            progress('rendering', start_frame, tracks.num_frames)
+    profiler.record('encode', writer.encode_seconds, writer.encode_cpu_seconds, writer.frames_written)
 
+    _write_run_metadata(output_video_path, input_video_path, video_properties, tracker, profiler)
     return output_video_path
 
 
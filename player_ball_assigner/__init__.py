@@ -1 +1,10 @@
-from player_ball_assigner.player_ball_assigner import PlayerBallAssigner
\ No newline at end of file
+from utils.lazy_import import lazy_exports
+
+_EXPORTS = {
+    "PlayerBallAssigner": "player_ball_assigner.player_ball_assigner",
+    "PossessionStats": "player_ball_assigner.possession_stats",
+    "get_ball_holders": "player_ball_assigner.possession_stats",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -1,4 +1,14 @@
-from utils.bbox_utils import get_center_of_bbox, measure_distance, is_valid_bbox
+import numpy as np
+
+from utils.bbox_utils import (
+    get_center_of_bbox,
+    measure_distance,
+    is_valid_bbox,
+    get_centers_of_bboxes,
+    measure_distances,
+    valid_bbox_mask,
+)
+from utils.track_store import TrackStore, OBJECT_CLASSES
 
 class PlayerBallAssigner:
     def __init__(self):
@@ -28,3 +38,104 @@ class PlayerBallAssigner:
                     assigned_player = player_id
 
         return assigned_player
+
+
+    def assign_ball_to_players_bulk(
+        self, ball_centers, player_frames, player_bboxes, player_teams, last_team_with_ball=0
+    ):
+        """
+        Ball possession for a whole clip (or one chunk of it) in one pass.
+
+        ``ball_centers`` is (F, 2) with NaN where there is no ball. Players are
+        given as parallel arrays, one entry per detection: ``player_frames``
+        (index into ``ball_centers``), ``player_bboxes`` (N, 4) and
+        ``player_teams`` (0 when unknown).
+
+        Returns ``(assigned, team_ball_control)``: for each frame the index of
+        the player detection that has the ball (-1 if none), and the team in
+        control, carried over from the previous frame (or
+        ``last_team_with_ball``) when nobody is close enough.
+        """
+        ball_centers = np.asarray(ball_centers, dtype=np.float32).reshape(-1, 2)
+        player_frames = np.asarray(player_frames, dtype=np.int64)
+        player_bboxes = np.asarray(player_bboxes, dtype=np.float32).reshape(-1, 4)
+        player_teams = np.asarray(player_teams, dtype=np.int64)
+        num_frames = len(ball_centers)
+
+        ball_position = ball_centers[player_frames]
+        distance = np.minimum(
+            measure_distances(player_bboxes[:, [0, 3]], ball_position),
+            measure_distances(player_bboxes[:, [2, 3]], ball_position),
+        )
+        with np.errstate(invalid='ignore'):
+            eligible = valid_bbox_mask(player_bboxes) & (distance < self.max_player_ball_distance - distance)
+
+        # Closest eligible player per frame; ties go to the earlier detection,
+        # like the strict ``<`` in assign_ball_to_player.
+        candidates = np.flatnonzero(eligible)
+        candidate_frames = player_frames[candidates]
+        order = np.lexsort((candidates, distance[candidates], candidate_frames))
+        candidates = candidates[order]
+        candidate_frames = candidate_frames[order]
+        first = np.ones(len(candidates), dtype=bool)
+        first[1:] = candidate_frames[1:] != candidate_frames[:-1]
+
+        assigned = np.full(num_frames, -1, dtype=np.int64)
+        assigned[candidate_frames[first]] = candidates[first]
+
+        has_player = assigned >= 0
+        control = np.where(has_player, player_teams[np.maximum(assigned, 0)] if len(player_teams) else 0, 0)
+        source = np.maximum.accumulate(np.where(has_player, np.arange(num_frames), -1))
+        team_ball_control = np.where(source >= 0, control[np.maximum(source, 0)], last_team_with_ball)
+        return assigned, team_ball_control
+
+    def assign_ball_possession(self, tracks, start_frame=0, end_frame=None, last_team_with_ball=0):
+        """
+        Mark ``has_ball`` on the closest player in each frame and return the
+        team in control of the ball for frames ``start_frame:end_frame``.
+
+        Frames where nobody is close enough keep the previous team, starting
+        from ``last_team_with_ball`` so that consecutive chunks can be chained.
+        """
+        if end_frame is None:
+            end_frame = len(tracks['players'])
+        num_frames = end_frame - start_frame
+
+        if not isinstance(tracks, TrackStore):
+            ball_centers = np.full((num_frames, 2), np.nan, dtype=np.float32)
+            player_infos, player_frames, player_bboxes, player_teams = [], [], [], []
+            for frame_num in range(start_frame, end_frame):
+                ball_bbox = tracks['ball'][frame_num].get(1, {}).get('bbox')
+                if is_valid_bbox(ball_bbox):
+                    ball_centers[frame_num - start_frame] = get_center_of_bbox(ball_bbox)
+                for player in tracks['players'][frame_num].values():
+                    player_infos.append(player)
+                    player_frames.append(frame_num - start_frame)
+                    player_bboxes.append(player['bbox'] if is_valid_bbox(player['bbox']) else [np.nan] * 4)
+                    player_teams.append(player.get('team', 0) or 0)
+
+            assigned, team_ball_control = self.assign_ball_to_players_bulk(
+                ball_centers, player_frames, player_bboxes, player_teams, last_team_with_ball
+            )
+            for index in assigned[assigned >= 0].tolist():
+                player_infos[index]['has_ball'] = True
+            return team_ball_control
+
+        rows = tracks.frame_range_slice(start_frame, end_frame)
+        rows = np.arange(rows.start, rows.stop)
+        classes = tracks.object_class[rows]
+
+        ball_rows = rows[classes == OBJECT_CLASSES.index('ball')]
+        ball_centers = np.full((num_frames, 2), np.nan, dtype=np.float32)
+        ball_centers[tracks.frame[ball_rows] - start_frame] = get_centers_of_bboxes(tracks.bbox[ball_rows])
+
+        player_rows = rows[classes == OBJECT_CLASSES.index('players')]
+        assigned, team_ball_control = self.assign_ball_to_players_bulk(
+            ball_centers,
+            tracks.frame[player_rows] - start_frame,
+            tracks.bbox[player_rows],
+            tracks.team[player_rows],
+            last_team_with_ball,
+        )
+        tracks.has_ball[player_rows[assigned[assigned >= 0]]] = True
+        return team_ball_control
@@ -0,0 +1,168 @@
+import numpy as np
+
+from utils.track_store import TrackStore, OBJECT_CLASSES
+
+
+def get_ball_holders(tracks, start_frame=0, end_frame=None):
+    """Track id of the player marked ``has_ball`` in each frame, -1 if none."""
+    if end_frame is None:
+        end_frame = len(tracks['players'])
+    holders = np.full(end_frame - start_frame, -1, dtype=np.int64)
+
+    if not isinstance(tracks, TrackStore):
+        for frame_num in range(start_frame, end_frame):
+            for player_id, player in tracks['players'][frame_num].items():
+                if player.get('has_ball', False):
+                    holders[frame_num - start_frame] = player_id
+                    break
+        return holders
+
+    rows = tracks.frame_range_slice(start_frame, end_frame)
+    rows = np.arange(rows.start, rows.stop)
+    rows = rows[tracks.has_ball[rows] & (tracks.object_class[rows] == OBJECT_CLASSES.index('players'))]
+    # Reversed so that the first holder of a frame wins, as in the dict branch.
+    rows = rows[::-1]
+    holders[tracks.frame[rows] - start_frame] = tracks.track_id[rows]
+    return holders
+
+
+class PossessionStats:
+    """
+    Possession analytics built from the per-frame team in control.
+
+    Everything is precomputed while frames are added, so per-frame lookups
+    are O(1): cumulative frame counts per team (a prefix sum over
+    ``team_ball_control``) give the running percentages, and possession
+    streaks, turnovers and per-player possession frames are extended as
+    each chunk arrives. Call ``update`` once for a whole clip or once per
+    chunk when streaming.
+    """
+
+    def __init__(self, teams=(1, 2)):
+        self.teams = tuple(teams)
+        self.num_frames = 0
+        self._capacity = 0
+        self._team_ball_control = np.zeros(0, dtype=np.int64)
+        # _counts[f, i]: frames up to and including f controlled by teams[i].
+        self._counts = np.zeros((0, len(self.teams)), dtype=np.int64)
+
+        # [team, start_frame, end_frame) of every run of consecutive control.
+        self.streaks = []
+        # (frame_num, from_team, to_team) whenever control changes hands.
+        self.turnovers = []
+        self.player_frames = {}
+
+    @classmethod
+    def from_team_ball_control(cls, team_ball_control, holders=None):
+        stats = cls()
+        stats.update(team_ball_control, holders)
+        return stats
+
+    @property
+    def team_ball_control(self):
+        return self._team_ball_control[:self.num_frames]
+
+    @property
+    def last_team(self):
+        return int(self._team_ball_control[self.num_frames - 1]) if self.num_frames else 0
+
+    def _reserve(self, num_frames):
+        if num_frames <= self._capacity:
+            return
+        capacity = max(num_frames, 2 * self._capacity, 1024)
+        team_ball_control = np.zeros(capacity, dtype=np.int64)
+        team_ball_control[:self.num_frames] = self.team_ball_control
+        counts = np.zeros((capacity, len(self.teams)), dtype=np.int64)
+        counts[:self.num_frames] = self._counts[:self.num_frames]
+        self._team_ball_control = team_ball_control
+        self._counts = counts
+        self._capacity = capacity
+
+    def update(self, team_ball_control, holders=None):
+        """
+        Append the team in control for the next frames, and optionally the
+        track id of the player holding the ball in each of them (-1 if none).
+        """
+        control = np.asarray(team_ball_control, dtype=np.int64).reshape(-1)
+        n = len(control)
+        if n == 0:
+            return
+        start = self.num_frames
+        previous_team = self.last_team
+        self._reserve(start + n)
+
+        self._team_ball_control[start:start + n] = control
+        previous_counts = self._counts[start - 1] if start else 0
+        self._counts[start:start + n] = previous_counts + np.cumsum(
+            control[:, None] == np.array(self.teams)[None, :], axis=0
+        )
+        self.num_frames = start + n
+
+        # Runs of equal control within the chunk, joined to the last streak
+        # when the chunk starts with the team that ended it (nobody in
+        # control is not a streak, so there is nothing to join then).
+        extended = np.r_[previous_team, control]
+        change = np.flatnonzero(extended[1:] != extended[:-1])
+        run_starts = np.union1d([0], change)
+        run_ends = np.r_[run_starts[1:], n]
+        for run_start, run_end in zip(run_starts.tolist(), run_ends.tolist()):
+            team = int(control[run_start])
+            if run_start == 0 and team and team == previous_team and self.streaks:
+                self.streaks[-1][2] = start + run_end
+            elif team:
+                self.streaks.append([team, start + run_start, start + run_end])
+
+        for index in change.tolist():
+            from_team, to_team = int(extended[index]), int(extended[index + 1])
+            if from_team and to_team:
+                self.turnovers.append((start + index, from_team, to_team))
+
+        if holders is not None:
+            holders = np.asarray(holders, dtype=np.int64).reshape(-1)
+            player_ids, frame_counts = np.unique(holders[holders >= 0], return_counts=True)
+            for player_id, frame_count in zip(player_ids.tolist(), frame_counts.tolist()):
+                self.player_frames[player_id] = self.player_frames.get(player_id, 0) + frame_count
+
+    def team_frames(self, frame_num):
+        """Frames each team controlled up to and including ``frame_num``."""
+        return dict(zip(self.teams, self._counts[frame_num].tolist()))
+
+    def team_percentages(self, frame_num):
+        """Share of controlled frames per team up to ``frame_num`` (0 when nobody had it yet)."""
+        counts = self._counts[frame_num]
+        total = int(counts.sum())
+        if total == 0:
+            return {team: 0.0 for team in self.teams}
+        return {team: int(count) / total for team, count in zip(self.teams, counts)}
+
+    @property
+    def percentages(self):
+        """(F, len(teams)) running percentages for every frame, e.g. for export."""
+        counts = self._counts[:self.num_frames]
+        total = counts.sum(axis=1, keepdims=True)
+        return np.where(total > 0, counts / np.maximum(total, 1), 0.0)
+
+    def player_possession_seconds(self, fps):
+        return {player_id: frames / fps for player_id, frames in self.player_frames.items()}
+
+    def longest_streaks(self):
+        """Longest possession streak per team, in frames."""
+        longest = {team: 0 for team in self.teams}
+        for team, start, end in self.streaks:
+            if team in longest:
+                longest[team] = max(longest[team], end - start)
+        return longest
+
+    def summary(self, fps=None):
+        summary = {
+            "frames": self.num_frames,
+            "team_frames": self.team_frames(self.num_frames - 1) if self.num_frames else {},
+            "team_percentages": self.team_percentages(self.num_frames - 1) if self.num_frames else {},
+            "streaks": len(self.streaks),
+            "longest_streaks": self.longest_streaks(),
+            "turnovers": len(self.turnovers),
+            "player_frames": dict(self.player_frames),
+        }
+        if fps:
+            summary["player_seconds"] = self.player_possession_seconds(fps)
+        return summary
@@ -1,13 +1,10 @@
+import importlib.util
 from pathlib import Path
 from typing import Optional
 
 import numpy as np
 
-try:
-    # Use ultralytics YOLO for keypoint detection
-    from ultralytics import YOLO  # type: ignore
-except ImportError as e:  # pragma: no cover - handled at runtime
-    YOLO = None  # type: ignore
+from inference import get_model
 
 
 class PitchKeypointDetector:
@@ -21,18 +18,22 @@ class PitchKeypointDetector:
         perspective transform.
     """
 
-    def __init__(self, model_path: str = "pos_model/best.pt"):
+    def __init__(self, model_path: str = "pos_model/best.pt", inference_backend: str = "pytorch",
+                 int8: bool = False):
         model_file = Path(model_path)
         if not model_file.exists():
             raise FileNotFoundError(f"Pitch keypoint model not found at {model_file}")
 
-        if YOLO is None:
+        # ultralytics (and torch) is only imported once a model is loaded.
+        if importlib.util.find_spec("ultralytics") is None:
             raise ImportError(
                 "ultralytics is required for the pitch keypoint model. "
                 "Install it with `pip install ultralytics`."
             )
 
-        self.model = YOLO(str(model_file))
+        # ``inference_backend`` picks PyTorch, ONNX Runtime or OpenVINO, see
+        # ``inference.load_model``. The model is loaded once per process.
+        self.model = get_model(str(model_file), inference_backend, int8=int8, task="pose")
 
     def detect_pitch_vertices(self, frame: np.ndarray) -> Optional[np.ndarray]:
         """
@@ -0,0 +1,57 @@
+import sys
+
+import numpy as np
+
+from player_ball_assigner import PossessionStats
+
+RUNS = 200
+MAX_FRAMES = 300
+
+
+def compare(team_ball_control, holders, chunk_sizes):
+    """Differences between one ``update`` for the clip and one per chunk."""
+    whole = PossessionStats.from_team_ball_control(team_ball_control, holders)
+    chunked = PossessionStats()
+    start = 0
+    for size in chunk_sizes:
+        chunked.update(team_ball_control[start:start + size], holders[start:start + size])
+        start += size
+
+    problems = []
+    if whole.streaks != chunked.streaks:
+        problems.append(f"streaks {whole.streaks} != {chunked.streaks}")
+    if whole.turnovers != chunked.turnovers:
+        problems.append(f"turnovers {whole.turnovers} != {chunked.turnovers}")
+    if not np.array_equal(whole.percentages, chunked.percentages):
+        problems.append("running percentages differ")
+    if whole.player_frames != chunked.player_frames:
+        problems.append(f"player frames {whole.player_frames} != {chunked.player_frames}")
+    return problems
+
+
+def main():
+    """Check that chunked possession statistics match single-call ones."""
+    rng = np.random.default_rng(0)
+    cases = [([1, 1, 0, 0, 0, 0], [4, 2]), ([0, 2, 2, 0, 1, 1], [1, 3, 2])]
+    for _ in range(RUNS):
+        n = int(rng.integers(1, MAX_FRAMES))
+        # Long runs of the same team, like real possession.
+        control = np.repeat(rng.integers(0, 3, n), rng.integers(1, 20, n))[:n]
+        cuts = np.sort(rng.choice(np.arange(1, n), size=min(n - 1, int(rng.integers(0, 10))), replace=False))
+        cases.append((control, np.diff(np.r_[0, cuts, n]).tolist()))
+
+    failures = 0
+    for control, chunk_sizes in cases:
+        control = np.asarray(control, dtype=np.int64)
+        holders = np.where(control > 0, control * 10, -1)
+        problems = compare(control, holders, chunk_sizes)
+        if problems:
+            failures += 1
+            print(f"chunks {chunk_sizes}: " + "; ".join(problems))
+
+    print(f"{len(cases) - failures}/{len(cases)} chunkings match the single-call statistics")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
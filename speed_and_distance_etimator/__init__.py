@@ -1 +1,4 @@
-from speed_and_distance_etimator.speed_dist_est import Speed_and_Distance_Estimator
\ No newline at end of file
+from utils.lazy_import import lazy_exports
+
+__all__ = ["Speed_and_Distance_Estimator"]
+__getattr__, __dir__ = lazy_exports(__name__, {"Speed_and_Distance_Estimator": "speed_and_distance_etimator.speed_dist_est"})
@@ -1,149 +1,174 @@
 import cv2
-from utils import measure_distance, get_foot_position
+import numpy as np
+from utils import get_foot_position, TrackStore
 
 class Speed_and_Distance_Estimator:
-    def __init__(self):
-        self.frame_window = 5
-        self.frame_rate = 24
+    def __init__(self, frame_rate=24, frame_window=5):
+        # Speed is measured over ``frame_window`` detections of the same track,
+        # which smooths out per-frame box jitter.
+        self.frame_window = frame_window
+        self.frame_rate = frame_rate
+
+        # Basic physical plausibility filter: ignore unrealistically low or
+        # high speeds caused by noisy detections. Typical sprinting speeds are
+        # < 36 km/h; we allow a bit of margin.
+        self.min_speed_kmh = 0.5
+        self.max_speed_kmh = 40
 
     def add_speed_and_distance_to_tracks(self,tracks):
-
-        total_distance = {}
-        last_speed = {}  # Track last known speed for each player
-        last_distance = {}  # Track last known distance for each player
+        if isinstance(tracks, TrackStore):
+            rows = np.flatnonzero(tracks.class_mask('players'))
+            speed, distance = self.compute_speed_and_distance(
+                tracks.track_id[rows], tracks.frame[rows], tracks.position_transformed[rows]
+            )
+            tracks.speed[rows] = speed
+            tracks.distance[rows] = distance
+            return
 
         for object, object_tracks in tracks.items():
             if object =='ball' or object == 'referees':
                 continue
-            number_of_frames = len(object_tracks)
-            
-            # Initialize tracking dictionaries
-            if object not in total_distance:
-                total_distance[object] = {}
-            if object not in last_speed:
-                last_speed[object] = {}
-            if object not in last_distance:
-                last_distance[object] = {}
-            
-            # Calculate speed using consecutive frames for smoother results
-            for frame_num in range(number_of_frames - 1):
-                next_frame = frame_num + 1
-                
-                # Get all track IDs present in current frame
-                track_ids = set(object_tracks[frame_num].keys())
-                # Also check next frame
-                if next_frame < number_of_frames:
-                    track_ids.update(object_tracks[next_frame].keys())
-                
-                for track_id in track_ids:
-                    if track_id not in object_tracks[frame_num]:
-                        continue
-                    if track_id not in object_tracks[next_frame]:
-                        continue
 
+            track_infos, track_ids, frame_nums, positions = [], [], [], []
+            for frame_num, track in enumerate(object_tracks):
+                for track_id, track_info in track.items():
                     # Use transformed positions (in meters) for accurate speed calculation.
-                    start_position = object_tracks[frame_num][track_id].get('position_transformed')
-                    end_position = object_tracks[next_frame][track_id].get('position_transformed')
-
-                    # Skip if we don't have both positions for this step
-                    if start_position is None or end_position is None:
+                    position = track_info.get('position_transformed')
+                    track_infos.append(track_info)
+                    track_ids.append(track_id)
+                    frame_nums.append(frame_num)
+                    positions.append((np.nan, np.nan) if position is None else position)
+
+            speed, distance = self.compute_speed_and_distance(
+                np.array(track_ids, dtype=np.int64),
+                np.array(frame_nums, dtype=np.int64),
+                np.array(positions, dtype=np.float64).reshape(-1, 2),
+            )
+            for track_info, track_speed, track_distance in zip(track_infos, speed.tolist(), distance.tolist()):
+                if track_speed == track_speed:  # not NaN
+                    track_info['speed'] = track_speed
+                    track_info['distance'] = track_distance
+
+    def compute_speed_and_distance(self, track_ids, frame_nums, positions):
+        """
+        Speed (km/h) and distance covered so far (m) for each detection.
+
+        Inputs are parallel arrays, one entry per detection; positions are in
+        meters and NaN where unknown. Detections are sorted by (track, frame)
+        so each track is a contiguous block, and everything below is a
+        whole-array operation:
+
+          - speed compares each detection with the one ``frame_window``
+            detections later in the same track (earlier near the end of a
+            track) and divides by the real time between them;
+          - distance is a per-track cumulative sum of plausible steps between
+            consecutive detections;
+          - detections without a plausible speed take the last value of the
+            same track.
+
+        Returns two float32 arrays in input order, NaN where no value exists.
+        """
+        n = len(track_ids)
+        speed = np.full(n, np.nan, dtype=np.float32)
+        distance = np.full(n, np.nan, dtype=np.float32)
+        if n == 0:
+            return speed, distance
+
+        order = np.lexsort((frame_nums, track_ids))
+        ids = np.asarray(track_ids)[order]
+        frames = np.asarray(frame_nums, dtype=np.int64)[order]
+        points = np.asarray(positions, dtype=np.float64).reshape(-1, 2)[order]
+        index = np.arange(n)
+        window = max(1, int(self.frame_window))
+        frame_time = 1.0 / self.frame_rate
+
+        track_start = np.r_[True, ids[1:] != ids[:-1]]
+        track_end = np.r_[ids[1:] != ids[:-1], True]
+        first = np.maximum.accumulate(np.where(track_start, index, 0))
+        last = np.minimum.accumulate(np.where(track_end, index, n - 1)[::-1])[::-1]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Distance: plausible steps between consecutive detections,
+            # credited to the later one and summed per track.
+            gap = frames[1:] - frames[:-1]
+            step = np.hypot(*(points[1:] - points[:-1]).T)
+            step_speed = step / (gap * frame_time) * 3.6
+            step_ok = (
+                ~track_start[1:]
+                & (gap <= window)
+                & (step_speed >= self.min_speed_kmh)
+                & (step_speed <= self.max_speed_kmh)
+            )
+            accepted = np.zeros(n)
+            accepted[1:] = np.where(step_ok, step, 0.0)
+            covered = np.cumsum(accepted)
+            covered -= covered[first]
+
+            # Speed over the window.
+            partner = np.minimum(index + window, last)
+            partner = np.where(partner > index, partner, np.maximum(index - window, first))
+            frame_gap = np.abs(frames[partner] - frames)
+            window_speed = np.hypot(*(points[partner] - points).T) / (frame_gap * frame_time) * 3.6
+            valid = (
+                (partner != index)
+                & (frame_gap <= 2 * window)
+                & (window_speed >= self.min_speed_kmh)
+                & (window_speed <= self.max_speed_kmh)
+            )
+
+        # Forward-fill within each track.
+        source = np.maximum.accumulate(np.where(valid | track_start, index, 0))
+        filled = valid[source]
+        speed[order] = np.where(filled, window_speed[source], np.nan)
+        distance[order] = np.where(filled, covered, np.nan)
+        return speed, distance
+
+    def draw_frame_speed_and_distance(self, frame, frame_num, tracks):
+        """Draw speed and distance under every player of ``frame_num`` on ``frame`` in place."""
+        height, width = frame.shape[:2]
+        for object, object_tracks in tracks.items():
+            if object == "ball" or object == "referees":
+                continue
+            if frame_num >= len(object_tracks):
+                continue
+            for track_id, track_info in object_tracks[frame_num].items():
+                if "speed" in track_info:
+                    speed = track_info.get('speed', None)
+                    distance = track_info.get('distance', None)
+                    if speed is None or distance is None:
                         continue
 
-                    distance_covered = measure_distance(start_position, end_position)
-                    time_elapsed = 1.0 / self.frame_rate  # One frame difference
-                    
-                    if time_elapsed == 0:
+                    bbox = track_info.get('bbox')
+                    if bbox is None:
                         continue
-                    
-                    speed_meters_per_second = distance_covered / time_elapsed
-                    speed_km_per_hour = speed_meters_per_second * 3.6
-
-                    # Basic physical plausibility filter:
-                    # Ignore unrealistically low or high speeds caused by noisy detections.
-                    # Typical sprinting speeds are < 36 km/h; we allow a bit of margin.
-                    if speed_km_per_hour < 0.5 or speed_km_per_hour > 40:
-                        continue
-
-                    if track_id not in total_distance[object]:
-                        total_distance[object][track_id] = 0
 
-                    total_distance[object][track_id] += distance_covered
-
-                    # Store last known values
-                    last_speed[object][track_id] = speed_km_per_hour
-                    last_distance[object][track_id] = total_distance[object][track_id]
+                    position = get_foot_position(bbox)
+                    if position is None:
+                        continue
 
-                    # Assign to current frame
-                    object_tracks[frame_num][track_id]['speed'] = speed_km_per_hour
-                    object_tracks[frame_num][track_id]['distance'] = total_distance[object][track_id]
+                    position = list(position)
+                    position[1] += 40
 
-            # Propagate last known speed/distance forward so players keep labels
-            # even when a frame is missing a new measurement.
-            for frame_num in range(1, number_of_frames):
-                prev_tracks = object_tracks[frame_num - 1]
-                curr_tracks = object_tracks[frame_num]
-                for track_id, track_info in curr_tracks.items():
-                    if 'speed' in track_info and 'distance' in track_info:
-                        continue
-                    prev_info = prev_tracks.get(track_id)
-                    if prev_info is None:
-                        continue
-                    prev_speed = prev_info.get('speed')
-                    prev_distance = prev_info.get('distance')
-                    if prev_speed is None or prev_distance is None:
+                    # Make sure position is within frame bounds
+                    if position[0] < 0 or position[0] >= width or position[1] < 0 or position[1] >= height:
                         continue
-                    track_info['speed'] = prev_speed
-                    track_info['distance'] = prev_distance
 
+                    position = tuple(map(int, position))
+                    # Draw white text with black outline for better visibility
+                    text = f"{speed:.2f} km/h"
+                    cv2.putText(frame, text, position, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 3)
+                    cv2.putText(frame, text, position, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
 
-    def draw_speed_and_distance(self,tracks,frames):
-        output_frames = []
-        total_drawn = 0
-        for frame_num, frame in enumerate(frames):
-            frame_drawn_count = 0
-            for object, object_tracks in tracks.items():
-                if object == "ball" or object == "referees":
-                    continue
-                if frame_num >= len(object_tracks):
-                    continue
-                for track_id, track_info in object_tracks[frame_num].items():
-                    if "speed" in track_info:
-                        speed = track_info.get('speed', None)
-                        distance = track_info.get('distance', None)
-                        if speed is None or distance is None:
-                            continue
-
-                        bbox = track_info.get('bbox')
-                        if bbox is None:
-                            continue
-                        
-                        position = get_foot_position(bbox)
-                        if position is None:
-                            continue
-                            
-                        position = list(position)
-                        position[1] += 40
-
-                        # Make sure position is within frame bounds
-                        height, width = frame.shape[:2]
-                        if position[0] < 0 or position[0] >= width or position[1] < 0 or position[1] >= height:
-                            continue
-
-                        position = tuple(map(int, position))
-                        # Draw white text with black outline for better visibility
-                        text = f"{speed:.2f} km/h"
-                        cv2.putText(frame, text, position, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 3)
-                        cv2.putText(frame, text, position, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-                        
-                        text2 = f"{distance:.2f} m"
-                        pos2 = (position[0], position[1] + 25)
-                        if pos2[1] < height:  # Make sure second line is also in bounds
-                            cv2.putText(frame, text2, pos2, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 3)
-                            cv2.putText(frame, text2, pos2, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-                        frame_drawn_count += 1
-            total_drawn += frame_drawn_count
-            output_frames.append(frame)
-        
-        return output_frames
+                    text2 = f"{distance:.2f} m"
+                    pos2 = (position[0], position[1] + 25)
+                    if pos2[1] < height:  # Make sure second line is also in bounds
+                        cv2.putText(frame, text2, pos2, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 3)
+                        cv2.putText(frame, text2, pos2, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+        return frame
 
+    def draw_speed_and_distance(self,tracks,frames,start_frame=0):
+        output_frames = []
+        for frame_num, frame in enumerate(frames, start=start_frame):
+            output_frames.append(self.draw_frame_speed_and_distance(frame, frame_num, tracks))
 
+        return output_frames
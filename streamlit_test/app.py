@@ -1,78 +1,8 @@
 import os
 import sys
-import tempfile
-import subprocess
+import time
 from pathlib import Path
 
-# CRITICAL FIX for Streamlit Cloud: Ensure opencv-python-headless is used
-# This must happen BEFORE any cv2 imports to prevent libGL.so.1 errors
-
-# Remove cv2 from sys.modules if it exists
-if 'cv2' in sys.modules:
-    del sys.modules['cv2']
-
-# Aggressively remove opencv-python and ensure headless is available
-try:
-    # Uninstall opencv-python (this is the problematic package)
-    result = subprocess.run(
-        [sys.executable, '-m', 'pip', 'uninstall', '-y', 'opencv-python', '--quiet'],
-        capture_output=True,
-        timeout=20,
-        check=False
-    )
-    
-    # Ensure opencv-python-headless is installed
-    subprocess.run(
-        [sys.executable, '-m', 'pip', 'install', '--upgrade', '--force-reinstall', 
-         'opencv-python-headless>=4.8.0', '--quiet'],
-        capture_output=True,
-        timeout=90,
-        check=False
-    )
-    
-    # Clear import caches
-    if 'cv2' in sys.modules:
-        del sys.modules['cv2']
-    import importlib
-    importlib.invalidate_caches()
-    
-    # Remove opencv-python from site-packages if it still exists
-    import site
-    for site_packages in site.getsitepackages():
-        opencv_python_path = os.path.join(site_packages, 'opencv_python-')
-        if os.path.exists(opencv_python_path):
-            # Try to remove the directory
-            try:
-                import shutil
-                for item in os.listdir(site_packages):
-                    if item.startswith('opencv_python-') and not item.startswith('opencv_python_headless-'):
-                        item_path = os.path.join(site_packages, item)
-                        if os.path.isdir(item_path):
-                            shutil.rmtree(item_path, ignore_errors=True)
-            except Exception:
-                pass
-except Exception:
-    pass  # Continue even if cleanup fails
-
-# Create import hook to intercept cv2 imports
-class OpenCVHeadlessHook:
-    """Force use of opencv-python-headless."""
-    
-    def find_spec(self, name, path, target=None):
-        if name == 'cv2':
-            # Clear cv2 from cache
-            if 'cv2' in sys.modules:
-                del sys.modules['cv2']
-            # Return None to let Python find the module normally
-            # (but we've ensured only headless is available)
-        return None
-
-# Register hook
-sys.meta_path.insert(0, OpenCVHeadlessHook())
-
-# Note: cv2 will be imported when we import main below
-# The import hook and cleanup above should ensure headless version is used
-
 import streamlit as st
 
 
@@ -80,9 +10,10 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-# Import main with error handling
+# Import the pipeline modules with error handling
 try:
-    from main import run_pipeline
+    from job_queue import JobQueue
+    from utils import check_environment
 except Exception as e:
     import traceback
     import streamlit as st
@@ -93,6 +24,82 @@ except Exception as e:
     st.stop()
 
 
+@st.cache_resource
+def environment_problems():
+    # Checked once per server process. Fixing the environment (for example
+    # removing opencv-python next to opencv-python-headless) belongs in the
+    # image build, not in every cold start.
+    return check_environment(warn=False)
+
+
+@st.cache_resource
+def job_queue():
+    # One queue per server process, shared by every session. Its workers
+    # preload the models and run at most PIPELINE_WORKERS pipelines at once.
+    return JobQueue(max_workers=int(os.environ.get("PIPELINE_WORKERS", "1")))
+
+
+STAGE_LABELS = {
+    "starting": "Starting",
+    "tracking": "Decoding, detecting and tracking",
+    "camera_movement": "Estimating camera movement",
+    "analysis": "Teams, speed and possession",
+    "rendering": "Rendering output video",
+}
+
+
+def show_job(queue, job_id):
+    """Show the job's progress; reruns the page every second until it finishes."""
+    status = queue.status(job_id)
+    if status is None:
+        del st.session_state.job_id
+        return
+
+    state = status["state"]
+    if state in ("queued", "running"):
+        if status["cancelling"]:
+            st.info("Cancelling...")
+        elif state == "queued":
+            st.info("Waiting for a free worker...")
+        else:
+            label = STAGE_LABELS.get(status["stage"], status["stage"])
+            if status["total"]:
+                st.progress(
+                    min(1.0, status["done"] / status["total"]),
+                    text=f"{label}: {status['done']} / {status['total']} frames",
+                )
+            else:
+                st.progress(0.0, text=label)
+        if st.button("Cancel"):
+            queue.cancel(job_id)
+        time.sleep(1)
+        st.rerun()
+
+    elif state == "cancelled":
+        st.warning("The analysis was cancelled.")
+
+    elif state == "failed":
+        st.error(f"❌ Error while running pipeline: {status['error']}")
+        if status["error"].startswith("FileNotFoundError"):
+            st.info("💡 This usually means a model file or required resource is missing. Please check that all model files are in the repository.")
+
+    elif os.path.exists(status["output"]):
+        st.success("Processing complete!" + (" (same clip as an earlier run)" if status["cached"] else ""))
+        st.subheader("Annotated output video")
+        with open(status["output"], "rb") as f:
+            video_bytes = f.read()
+        st.video(video_bytes)
+
+        st.download_button(
+            label="Download output video",
+            data=video_bytes,
+            file_name="output_video.mp4",
+            mime="video/mp4",
+        )
+    else:
+        st.warning("Output video was not found. Please check the logs.")
+
+
 def run_streamlit_app():
     st.set_page_config(page_title="Football Analytics", layout="wide")
 
@@ -102,26 +109,14 @@ def run_streamlit_app():
         "pipeline and generate an annotated output video."
     )
 
-    # Initialize session state for tracking temp files
-    if 'temp_files' not in st.session_state:
-        st.session_state.temp_files = []
-
-    # Clean up old temp files from previous runs
-    for temp_file in st.session_state.temp_files:
-        if os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-            except Exception:
-                pass  # Ignore errors if file is already deleted
-    st.session_state.temp_files = []
-
     st.sidebar.header("Settings")
-    use_stubs = st.sidebar.checkbox(
-        "Use precomputed stubs (fast, only works for sample video)",
-        value=False,
+    use_cache = st.sidebar.checkbox(
+        "Cache results (instant re-runs of the same clip)",
+        value=True,
         help=(
-            "When enabled, the app will use precomputed tracking/camera-movement data. "
-            "This is only valid for the bundled sample video; disable it for your own videos."
+            "Tracking and camera-movement results are cached by a hash of the "
+            "uploaded video and the model weights, so uploading the same clip "
+            "again skips those stages. Different videos never share results."
         ),
     )
 
@@ -129,92 +124,25 @@ def run_streamlit_app():
         "Upload a video file", type=["mp4", "avi", "mov", "mkv"]
     )
 
+    for problem in environment_problems():
+        st.sidebar.warning(problem)
+
+    queue = job_queue()
+
     if uploaded_file is not None:
         st.video(uploaded_file)
 
         if st.button("Run analysis"):
-            with st.spinner("Processing video, this may take a while..."):
-                # Use a temporary file in system temp directory (not project directory)
-                with tempfile.NamedTemporaryFile(
-                    suffix=".mp4", delete=False
-                ) as tmp_in:
-                    tmp_in.write(uploaded_file.read())
-                    input_path = tmp_in.name
-                    st.session_state.temp_files.append(input_path)
-
-                # Use a temporary file for output as well
-                with tempfile.NamedTemporaryFile(
-                    suffix=".mp4", delete=False
-                ) as tmp_out:
-                    output_path = tmp_out.name
-                    st.session_state.temp_files.append(output_path)
-
-                try:
-                    final_path = run_pipeline(
-                        input_video_path=input_path,
-                        output_video_path=output_path,
-                        use_stubs=use_stubs,
-                    )
-                    
-                    # Clean up the temporary input file immediately after processing
-                    if os.path.exists(input_path):
-                        try:
-                            os.remove(input_path)
-                            if input_path in st.session_state.temp_files:
-                                st.session_state.temp_files.remove(input_path)
-                        except Exception:
-                            pass
-                            
-                except FileNotFoundError as e:
-                    # Clean up temp files
-                    for temp_file in [input_path, output_path]:
-                        if os.path.exists(temp_file):
-                            try:
-                                os.remove(temp_file)
-                                if temp_file in st.session_state.temp_files:
-                                    st.session_state.temp_files.remove(temp_file)
-                            except Exception:
-                                pass
-                    st.error(f"❌ File not found: {e}")
-                    st.info("💡 This usually means a model file or required resource is missing. Please check that all model files are in the repository.")
-                    return
-                except Exception as e:
-                    # Clean up temp files even if there's an error
-                    for temp_file in [input_path, output_path]:
-                        if os.path.exists(temp_file):
-                            try:
-                                os.remove(temp_file)
-                                if temp_file in st.session_state.temp_files:
-                                    st.session_state.temp_files.remove(temp_file)
-                            except Exception:
-                                pass
-                    
-                    # Show detailed error information
-                    import traceback
-                    error_details = traceback.format_exc()
-                    st.error(f"❌ Error while running pipeline: {str(e)}")
-                    st.info("💡 Expand the error details below to see the full traceback for debugging.")
-                    with st.expander("🔍 Error details (click to expand)", expanded=False):
-                        st.code(error_details, language="python")
-                    return
-
-                st.success("Processing complete!")
-                
-                if os.path.exists(final_path):
-                    st.subheader("Annotated output video")
-                    with open(final_path, "rb") as f:
-                        video_bytes = f.read()
-                    st.video(video_bytes)
-
-                    st.download_button(
-                        label="Download output video",
-                        data=video_bytes,
-                        file_name="output_video.mp4",
-                        mime="video/mp4",
-                    )
-                    # Output file will be cleaned up on next run or session end
-                else:
-                    st.warning("Output video was not found. Please check the logs.")
+            # Runs in the background; an identical clip with the same
+            # settings returns the earlier job or result straight away.
+            st.session_state.job_id = queue.submit_upload(
+                uploaded_file.getvalue(),
+                suffix=Path(uploaded_file.name).suffix or ".mp4",
+                use_cache=use_cache,
+            )
+
+    if "job_id" in st.session_state:
+        show_job(queue, st.session_state.job_id)
 
 
 # Always run the app (Streamlit calls this automatically)
@@ -1 +1,4 @@
-from team_assignment.team_assigner import TeamAssigner
\ No newline at end of file
+from utils.lazy_import import lazy_exports
+
+__all__ = ["TeamAssigner"]
+__getattr__, __dir__ = lazy_exports(__name__, {"TeamAssigner": "team_assignment.team_assigner"})
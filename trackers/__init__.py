@@ -1 +1,22 @@
-from trackers.tracker import Tracker
\ No newline at end of file
+from utils.lazy_import import lazy_exports
+
+_EXPORTS = {
+    "Tracker": "trackers.tracker",
+    "DetectionPipeline": "trackers.detection_pipeline",
+    "StageStats": "trackers.detection_pipeline",
+    "KeyframeDetector": "trackers.keyframe_detection",
+    "compare_tracks": "trackers.keyframe_detection",
+    "evaluate_detection_stride": "trackers.keyframe_detection",
+    "BatchPredictor": "trackers.batch_predictor",
+    "BatchSizeTuner": "trackers.batch_predictor",
+    "BallDetector": "trackers.ball_detector",
+    "BallTrajectorySmoother": "trackers.ball_interpolation",
+    "ConstantVelocityKalman": "trackers.ball_interpolation",
+    "interpolate_ball_boxes": "trackers.ball_interpolation",
+    "plan_shards": "trackers.sharded_tracking",
+    "stitch_tracks": "trackers.sharded_tracking",
+    "track_in_shards": "trackers.sharded_tracking",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
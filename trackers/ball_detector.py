@@ -0,0 +1,147 @@
+import numpy as np
+
+
+class BallDetector:
+    """
+    High-resolution ball search in a small region of interest.
+
+    The main detection pass can run at low resolution for players and
+    referees; the ball is then looked for at full resolution in a
+    ``crop_size`` square around where it is expected: the low-resolution
+    ball box when the main pass found one, otherwise the last position moved
+    on at constant velocity. After ``max_misses`` frames without a ball the
+    whole frame is searched in overlapping ``tile_size`` tiles (one batched
+    call) until it is found again. A tiled search costs more pixels than
+    the full frame, and the ball is often out of play or hidden for long
+    stretches, so while it stays lost the searches back off exponentially
+    to one every ``max_tile_interval`` frames; a ball box from the main
+    pass is still searched around on every frame.
+    """
+
+    def __init__(self, model=None, crop_size=384, tile_size=640, tile_overlap=0.2, conf=0.1,
+                 max_misses=5, max_tile_interval=16):
+        self.model = model
+        self.crop_size = crop_size
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.conf = conf
+        self.max_misses = max_misses
+        self.max_tile_interval = max_tile_interval
+        self.reset()
+
+    def reset(self):
+        self.last_center = None
+        self.velocity = np.zeros(2, dtype=np.float32)
+        self.misses = 0
+        self._reset_tile_backoff()
+        self.stats = {"frames": 0, "roi_searches": 0, "tiled_searches": 0, "skipped_searches": 0,
+                      "found": 0, "pixels": 0, "full_frame_pixels": 0}
+
+    def _reset_tile_backoff(self):
+        self._tile_interval = 1
+        self._tile_wait = 0
+
+    def tiled_search_due(self):
+        """Whether to search a lost ball in tiles on this frame (gaps double while it stays lost)."""
+        if self._tile_wait > 0:
+            self._tile_wait -= 1
+            return False
+        self._tile_wait = self._tile_interval
+        self._tile_interval = min(self._tile_interval * 2, self.max_tile_interval)
+        return True
+
+    def predicted_center(self, hint_bbox=None):
+        if hint_bbox is not None:
+            return np.array([(hint_bbox[0] + hint_bbox[2]) / 2, (hint_bbox[1] + hint_bbox[3]) / 2])
+        if self.last_center is None or self.misses >= self.max_misses:
+            return None
+        return self.last_center + self.velocity * (self.misses + 1)
+
+    def _ball_boxes(self, results, offsets):
+        """Ball boxes with confidences from ``results``, shifted by each image's offset."""
+        boxes, confidences = [], []
+        for result, (x_offset, y_offset) in zip(results, offsets):
+            if result.boxes is None or len(result.boxes) == 0:
+                continue
+            names = result.names
+            data = result.boxes.data
+            data = data.cpu().numpy() if hasattr(data, "cpu") else np.asarray(data)
+            for x1, y1, x2, y2, confidence, cls_id in data[:, :6].tolist():
+                if names[int(cls_id)] != "ball":
+                    continue
+                boxes.append([x1 + x_offset, y1 + y_offset, x2 + x_offset, y2 + y_offset])
+                confidences.append(confidence)
+        return boxes, confidences
+
+    def search_roi(self, frame, center):
+        height, width = frame.shape[:2]
+        size = min(self.crop_size, width, height)
+        x1 = int(np.clip(center[0] - size / 2, 0, width - size))
+        y1 = int(np.clip(center[1] - size / 2, 0, height - size))
+        crop = frame[y1:y1 + size, x1:x1 + size]
+        results = self.model.predict([crop], conf=self.conf, imgsz=self.crop_size, verbose=False)
+        self.stats["roi_searches"] += 1
+        self.stats["pixels"] += size * size
+        return self._ball_boxes(results, [(x1, y1)])
+
+    def tile_offsets(self, width, height):
+        size = self.tile_size
+        step = max(1, int(size * (1 - self.tile_overlap)))
+        xs = list(range(0, max(1, width - size + 1), step))
+        ys = list(range(0, max(1, height - size + 1), step))
+        # Make sure the right and bottom edges are covered.
+        if xs[-1] + size < width:
+            xs.append(width - size)
+        if ys[-1] + size < height:
+            ys.append(height - size)
+        return [(x, y) for y in ys for x in xs]
+
+    def search_tiles(self, frame):
+        height, width = frame.shape[:2]
+        offsets = self.tile_offsets(width, height)
+        tiles = [frame[y:y + self.tile_size, x:x + self.tile_size] for x, y in offsets]
+        results = self.model.predict(tiles, conf=self.conf, imgsz=self.tile_size, verbose=False)
+        self.stats["tiled_searches"] += 1
+        self.stats["pixels"] += sum(tile.shape[0] * tile.shape[1] for tile in tiles)
+        return self._ball_boxes(results, offsets)
+
+    def detect(self, frame, hint_bbox=None):
+        """Ball box in ``frame`` (or None), given the low-resolution ball box if any."""
+        self.stats["frames"] += 1
+        self.stats["full_frame_pixels"] += frame.shape[0] * frame.shape[1]
+
+        center = self.predicted_center(hint_bbox)
+        if center is not None:
+            boxes, confidences = self.search_roi(frame, center)
+        elif self.tiled_search_due():
+            boxes, confidences = self.search_tiles(frame)
+        else:
+            boxes, confidences = [], []
+            self.stats["skipped_searches"] += 1
+
+        if not boxes and hint_bbox is not None:
+            # Keep the low-resolution box rather than losing the ball.
+            boxes, confidences = [list(hint_bbox)], [0.0]
+        if not boxes:
+            self.misses += 1
+            return None
+
+        bbox = boxes[int(np.argmax(confidences))]
+        new_center = np.array([(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2])
+        if self.last_center is not None and self.misses < self.max_misses:
+            self.velocity = (new_center - self.last_center) / (self.misses + 1)
+        else:
+            self.velocity = np.zeros(2)
+        self.last_center = new_center
+        self.misses = 0
+        self._reset_tile_backoff()
+        self.stats["found"] += 1
+        return bbox
+
+    def update_tracks(self, tracks, frames, start_frame):
+        """Replace ``tracks["ball"]`` for ``frames`` (starting at ``start_frame``) with ROI detections."""
+        for frame_num, frame in enumerate(frames, start=start_frame):
+            hint = tracks["ball"][frame_num].get(1, {}).get("bbox")
+            bbox = self.detect(frame, hint)
+            tracks["ball"][frame_num] = {1: {"bbox": [float(v) for v in bbox]}} if bbox is not None else {}
+        return tracks
@@ -0,0 +1,197 @@
+import numpy as np
+
+
+METHODS = ("linear", "kalman")
+
+
+class ConstantVelocityKalman:
+    """
+    Kalman filter on a 2D point with state (x, y, vx, vy).
+
+    With isotropic noise the x and y axes are independent and share one
+    2x2 covariance, so the filter is written out in scalars; that keeps a
+    whole match of detections cheap to run in a Python loop.
+    """
+
+    def __init__(self, process_noise=1.0, measurement_noise=4.0, initial_velocity_variance=100.0):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.initial_velocity_variance = initial_velocity_variance
+        self.position = None
+        self.velocity = np.zeros(2)
+
+    def update(self, point, dt=1):
+        x, y = float(point[0]), float(point[1])
+        if self.position is None:
+            self.position = (x, y)
+            self.velocity = np.zeros(2)
+            # Covariance of one axis: [[p00, p01], [p01, p11]].
+            self._p00, self._p01, self._p11 = self.measurement_noise, 0.0, self.initial_velocity_variance
+            return
+
+        # Predict dt frames ahead.
+        q = self.process_noise * dt
+        p00 = self._p00 + 2 * dt * self._p01 + dt * dt * self._p11 + q
+        p01 = self._p01 + dt * self._p11
+        p11 = self._p11 + q
+        vx, vy = self.velocity
+        px, py = self.position[0] + dt * vx, self.position[1] + dt * vy
+
+        # Update with the measured position.
+        k0 = p00 / (p00 + self.measurement_noise)
+        k1 = p01 / (p00 + self.measurement_noise)
+        ex, ey = x - px, y - py
+        self.position = (px + k0 * ex, py + k0 * ey)
+        self.velocity = np.array([vx + k1 * ex, vy + k1 * ey])
+        self._p00, self._p01, self._p11 = (1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01
+
+
+def _fill_gap(box_before, velocity, box_after, length):
+    """
+    Boxes for the ``length`` frames between two detections: moved on at
+    ``velocity`` (zero for linear interpolation), with the error at the
+    closing detection spread linearly over the gap.
+    """
+    steps = np.arange(1, length + 1, dtype=np.float64)[:, None]
+    shift = np.tile(velocity, 2)
+    predicted = box_before + shift * steps
+    residual = box_after - (box_before + shift * (length + 1))
+    return predicted + residual * steps / (length + 1)
+
+
+def interpolate_ball_boxes(boxes, max_gap=None, method="linear"):
+    """
+    Fill missing ball boxes of a whole clip.
+
+    ``boxes`` is (F, 4) with NaN rows where the ball was not detected.
+    Interior gaps are filled linearly, or with ``method="kalman"`` along the
+    constant-velocity Kalman estimate at the last detection. Frames before
+    the first detection take the first box; frames after the last one keep
+    the last box (linear) or carry on at constant velocity (kalman). Gaps
+    longer than ``max_gap`` frames are left empty.
+
+    Returns the filled (F, 4) boxes and a boolean mask of filled frames.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown interpolation method {method!r}, expected one of {METHODS}")
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    num_frames = len(boxes)
+    valid = ~np.isnan(boxes).any(axis=1)
+    valid_index = np.flatnonzero(valid)
+    if len(valid_index) == 0:
+        return boxes.copy(), np.zeros(num_frames, dtype=bool)
+
+    frame_index = np.arange(num_frames)
+    # Nearest detection before (or at) and after (or at) every frame.
+    before = np.maximum.accumulate(np.where(valid, frame_index, -1))
+    after = np.minimum.accumulate(np.where(valid, frame_index, num_frames)[::-1])[::-1]
+
+    if method == "linear":
+        filled = np.stack(
+            [np.interp(frame_index, valid_index, boxes[valid_index, c]) for c in range(4)], axis=1
+        )
+    else:
+        kalman = ConstantVelocityKalman()
+        velocities = np.zeros((num_frames, 2))
+        previous = None
+        for index in valid_index.tolist():
+            box = boxes[index]
+            kalman.update(((box[0] + box[2]) / 2, (box[1] + box[3]) / 2), index - previous if previous is not None else 1)
+            velocities[index] = kalman.velocity
+            previous = index
+
+        filled = boxes.copy()
+        first, last = valid_index[0], valid_index[-1]
+        filled[:first] = boxes[first]
+        trailing = frame_index > last
+        filled[trailing] = boxes[last] + np.tile(velocities[last], 2) * (frame_index[trailing] - last)[:, None]
+
+        interior = ~valid & (before >= 0) & (after < num_frames)
+        if interior.any():
+            a, b = before[interior], after[interior]
+            shift = np.tile(velocities[a], 2)
+            steps = (frame_index[interior] - a)[:, None]
+            gap = (b - a)[:, None]
+            residual = boxes[b] - (boxes[a] + shift * gap)
+            filled[interior] = boxes[a] + shift * steps + residual * steps / gap
+
+    # Length of the gap each missing frame belongs to.
+    gap_start = np.where(before >= 0, before + 1, 0)
+    gap_end = np.where(after < num_frames, after, num_frames)
+    gap_length = gap_end - gap_start
+    interpolated = ~valid
+    if max_gap is not None:
+        interpolated &= gap_length <= max_gap
+    filled[~valid & ~interpolated] = np.nan
+    return filled, interpolated
+
+
+class BallTrajectorySmoother:
+    """
+    Online version of ``interpolate_ball_boxes`` for streaming.
+
+    Feed one frame at a time with ``push`` (the ball box or None); it
+    returns the frames that are final so far, in order, as ``(bbox,
+    interpolated)`` with ``bbox`` None when the ball stays missing. Frames
+    of an open gap are held until the ball shows up again, or until the gap
+    gets longer than ``max_gap`` and can no longer be filled, so at most
+    ``max_gap`` frames are ever held back. Call ``flush`` at the end of the
+    stream. With the same settings the result equals the batch function.
+    """
+
+    def __init__(self, max_gap=30, method="linear"):
+        if method not in METHODS:
+            raise ValueError(f"Unknown interpolation method {method!r}, expected one of {METHODS}")
+        self.max_gap = max_gap
+        self.method = method
+        self.kalman = ConstantVelocityKalman()
+        self.last_box = None
+        self.last_velocity = np.zeros(2)
+        self.pending = 0
+        self.frames_since_detection = 0
+        self.overflowed = False
+
+    def push(self, bbox):
+        self.frames_since_detection += 1
+        if bbox is None or np.isnan(np.asarray(bbox, dtype=np.float64)).any():
+            if self.overflowed:
+                return [(None, False)]
+            self.pending += 1
+            if self.max_gap is not None and self.pending > self.max_gap:
+                # Too long to fill; release what was held as missing.
+                output = [(None, False)] * self.pending
+                self.pending = 0
+                self.overflowed = True
+                return output
+            return []
+
+        box = np.asarray(bbox, dtype=np.float64)
+        output = []
+        if self.pending:
+            if self.last_box is None:
+                filled = np.tile(box, (self.pending, 1))
+            else:
+                filled = _fill_gap(self.last_box, self.last_velocity, box, self.pending)
+            output += [(row.tolist(), True) for row in filled]
+
+        if self.method == "kalman":
+            self.kalman.update(((box[0] + box[2]) / 2, (box[1] + box[3]) / 2), self.frames_since_detection)
+            self.last_velocity = self.kalman.velocity.copy()
+        self.last_box = box
+        self.pending = 0
+        self.frames_since_detection = 0
+        self.overflowed = False
+        output.append((box.tolist(), False))
+        return output
+
+    def flush(self):
+        if not self.pending:
+            return []
+        if self.last_box is None:
+            output = [(None, False)] * self.pending
+        else:
+            steps = np.arange(1, self.pending + 1, dtype=np.float64)[:, None]
+            filled = self.last_box + np.tile(self.last_velocity, 2) * steps
+            output = [(row.tolist(), True) for row in filled]
+        self.pending = 0
+        return output
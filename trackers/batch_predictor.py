@@ -0,0 +1,200 @@
+import itertools
+import time
+
+import cv2
+import numpy as np
+
+
+LETTERBOX_COLOR = 114
+
+
+class BatchSizeTuner:
+    """
+    Picks the inference batch size from measured latency.
+
+    Starts at ``initial`` and doubles while the time per frame keeps
+    dropping by more than ``min_gain``, then settles on the fastest size
+    seen. If the settled size later stays much slower for ``patience``
+    batches in a row (memory pressure, throttling), it halves. ``max_size``
+    is the memory ceiling. The first batch is not measured since it
+    includes model warm-up.
+    """
+
+    def __init__(self, initial=4, max_size=64, min_gain=0.05, slowdown=1.5, patience=3):
+        self.max_size = max(1, max_size)
+        self.size = max(1, min(initial, self.max_size))
+        self.min_gain = min_gain
+        self.slowdown = slowdown
+        self.patience = patience
+        self._slow_batches = 0
+        self.growing = True
+        self.best_size = self.size
+        self.best_latency = None
+        self.history = []
+        self._warmed_up = False
+
+    def next_batch_size(self):
+        return self.size
+
+    def record(self, batch_size, seconds):
+        if not self._warmed_up:
+            self._warmed_up = True
+            return
+        latency = seconds / max(1, batch_size)
+        self.history.append((batch_size, latency))
+        if batch_size != self.size:
+            # Short last batch of a chunk; says little about this size.
+            return
+
+        if self.best_latency is None or latency < self.best_latency * (1 - self.min_gain):
+            self.best_size, self.best_latency = batch_size, latency
+            if self.growing and self.size < self.max_size:
+                self.size = min(self.size * 2, self.max_size)
+                return
+        elif self.growing:
+            self.size = self.best_size
+        elif latency > self.best_latency * self.slowdown and self.size > 1:
+            self._slow_batches += 1
+            if self._slow_batches >= self.patience:
+                self.size = max(1, self.size // 2)
+                self.best_size, self.best_latency = self.size, None
+                self._slow_batches = 0
+            return
+        self._slow_batches = 0
+        self.growing = False
+
+
+class BatchPredictor:
+    """
+    Batched detector inference with adaptive batch size and a fixed input
+    resolution.
+
+    ``batch_size`` is an int or ``"auto"`` (``BatchSizeTuner``), capped so
+    that a batch stays within ``memory_budget_mb``. With ``imgsz`` set,
+    every batch is letterboxed once into a preallocated
+    ``(batch, imgsz, imgsz, 3)`` buffer before ``model.predict`` (so the
+    model does no resizing of its own), and the boxes are mapped back to
+    source pixels. ``imgsz=None`` leaves resizing to the model.
+    """
+
+    def __init__(self, model=None, batch_size="auto", imgsz=None, memory_budget_mb=2048,
+                 activation_mb=150, max_batch_size=64):
+        self.model = model
+        self.imgsz = imgsz
+        self.memory_budget_mb = memory_budget_mb
+        # Rough peak activation memory per 640x640 image of the detector.
+        self.activation_mb = activation_mb
+        self.max_batch_size = max_batch_size
+        self.fixed_batch_size = None if batch_size == "auto" else max(1, int(batch_size))
+        self.tuner = None
+        self._buffer = None
+        self.frames = 0
+        self.seconds = 0.0
+
+    def memory_batch_limit(self, frame):
+        """Largest batch that fits ``memory_budget_mb`` for frames like ``frame``."""
+        side = self.imgsz or 640
+        per_frame = (
+            frame.nbytes                         # source frame
+            + side * side * 3                    # letterbox buffer (uint8)
+            + side * side * 3 * 4                # float32 input tensor
+            + self.activation_mb * 1024 * 1024 * (side / 640) ** 2
+        )
+        return max(1, int(self.memory_budget_mb * 1024 * 1024 // per_frame))
+
+    def _setup(self, frame):
+        limit = min(self.max_batch_size, self.memory_batch_limit(frame))
+        if self.fixed_batch_size is not None:
+            self.fixed_batch_size = min(self.fixed_batch_size, limit)
+        elif self.tuner is None:
+            self.tuner = BatchSizeTuner(initial=min(4, limit), max_size=limit)
+
+    def next_batch_size(self):
+        if self.fixed_batch_size is not None:
+            return self.fixed_batch_size
+        if self.tuner is None:
+            return 1
+        return self.tuner.next_batch_size()
+
+    def batches(self, frames):
+        """Group ``frames`` into batches of the current (adaptive) size."""
+        frame_iter = iter(frames)
+        while True:
+            batch = list(itertools.islice(frame_iter, self.next_batch_size()))
+            if not batch:
+                return
+            yield batch
+
+    def letterbox(self, frames):
+        """
+        Letterbox ``frames`` into the shared buffer. Returns the buffer views
+        and, per frame, ``(scale, left, top)`` to map boxes back.
+        """
+        n = len(frames)
+        if self._buffer is None or len(self._buffer) < n:
+            self._buffer = np.empty((max(n, self.next_batch_size()), self.imgsz, self.imgsz, 3), dtype=np.uint8)
+
+        images, geometry = [], []
+        for index, frame in enumerate(frames):
+            height, width = frame.shape[:2]
+            scale = min(self.imgsz / height, self.imgsz / width)
+            new_width, new_height = round(width * scale), round(height * scale)
+            left, top = (self.imgsz - new_width) // 2, (self.imgsz - new_height) // 2
+
+            image = self._buffer[index]
+            image.fill(LETTERBOX_COLOR)
+            image[top:top + new_height, left:left + new_width] = cv2.resize(
+                frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR
+            )
+            images.append(image)
+            geometry.append((scale, left, top))
+        return images, geometry
+
+    def predict(self, frames, conf=0.1):
+        if not frames:
+            return []
+        self._setup(frames[0])
+        start = time.perf_counter()
+        if self.imgsz is None:
+            results = self.model.predict(frames, conf=conf, verbose=False)
+        else:
+            images, geometry = self.letterbox(frames)
+            results = self.model.predict(images, conf=conf, imgsz=self.imgsz, verbose=False)
+            for result, frame, (scale, left, top) in zip(results, frames, geometry):
+                _unletterbox(result, frame, scale, left, top)
+        seconds = time.perf_counter() - start
+
+        self.frames += len(frames)
+        self.seconds += seconds
+        if self.tuner is not None:
+            self.tuner.record(len(frames), seconds)
+        return results
+
+    def metadata(self):
+        return {
+            "imgsz": self.imgsz,
+            "letterbox": self.imgsz is not None,
+            "batch_size": "auto" if self.fixed_batch_size is None else self.fixed_batch_size,
+            "final_batch_size": self.next_batch_size(),
+            "max_batch_size": self.tuner.max_size if self.tuner is not None else self.fixed_batch_size,
+            "memory_budget_mb": self.memory_budget_mb,
+            "batch_latencies": self.tuner.history if self.tuner is not None else [],
+            "frames": self.frames,
+            "seconds": self.seconds,
+            "frames_per_second": self.frames / self.seconds if self.seconds else 0.0,
+        }
+
+
+def _unletterbox(result, frame, scale, left, top):
+    """Map a result's boxes from letterboxed to source-frame pixels, in place."""
+    height, width = frame.shape[:2]
+    result.orig_img = frame
+    result.orig_shape = (height, width)
+    if result.boxes is None:
+        return
+    data = result.boxes.data
+    data[:, 0] = ((data[:, 0] - left) / scale).clip(0, width)
+    data[:, 1] = ((data[:, 1] - top) / scale).clip(0, height)
+    data[:, 2] = ((data[:, 2] - left) / scale).clip(0, width)
+    data[:, 3] = ((data[:, 3] - top) / scale).clip(0, height)
+    result.boxes.orig_shape = (height, width)
@@ -0,0 +1,155 @@
+import itertools
+import queue
+import threading
+import time
+
+
+# Marks the end of a stage's output.
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    def add(self, items, seconds):
+        self.items += items
+        self.batches += 1
+        self.seconds += seconds
+
+    @property
+    def items_per_second(self):
+        if self.seconds == 0:
+            return 0.0
+        return self.items / self.seconds
+
+    def as_dict(self):
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "seconds": self.seconds,
+            "items_per_second": self.items_per_second,
+        }
+
+    def __repr__(self):
+        return (
+            f"StageStats({self.name!r}, items={self.items}, "
+            f"seconds={self.seconds:.3f}, items/s={self.items_per_second:.1f})"
+        )
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+class DetectionPipeline:
+    """
+    Runs decode, inference and tracking as three overlapping stages.
+
+    While batch ``n`` is in ``model.predict``, a decode thread is already
+    pulling batch ``n + 1`` from the frame iterable and a tracking thread is
+    handing the results of batch ``n - 1`` to ``on_detection``, one frame at a
+    time and in frame order. Stages are connected by queues holding at most
+    ``queue_size`` batches, which bounds the number of frames in flight.
+
+    ``batch_size`` may be a callable returning the size of the next batch,
+    for batch sizes tuned while running. ``run``'s ``on_batch(frames)`` is
+    called from the tracking thread after each batch has been handed to
+    ``on_detection``; raising from it aborts the run. Per-stage counters
+    from the last run are kept in ``self.stats``.
+    """
+
+    def __init__(self, model, batch_size=20, conf=0.1, queue_size=2):
+        self.model = model
+        self.batch_size = batch_size
+        self.conf = conf
+        self.queue_size = queue_size
+        self.stats = {}
+
+    def run(self, frames, on_detection, on_batch=None):
+        stats = {name: StageStats(name) for name in ("decode", "inference", "tracking")}
+        self.stats = stats
+
+        batches = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors = []
+
+        def decode():
+            try:
+                frame_iter = iter(frames)
+                while True:
+                    start = time.perf_counter()
+                    batch_size = self.batch_size() if callable(self.batch_size) else self.batch_size
+                    batch = list(itertools.islice(frame_iter, batch_size))
+                    if not batch:
+                        break
+                    stats["decode"].add(len(batch), time.perf_counter() - start)
+                    if not _put(batches, batch, stop):
+                        return
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                _put(batches, _DONE, stop)
+
+        def track():
+            try:
+                while True:
+                    detections = _get(results, stop)
+                    if detections is _DONE:
+                        break
+                    start = time.perf_counter()
+                    for detection in detections:
+                        on_detection(detection)
+                    stats["tracking"].add(len(detections), time.perf_counter() - start)
+                    if on_batch is not None:
+                        on_batch(len(detections))
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+
+        decode_thread = threading.Thread(target=decode, name="DetectionPipeline-decode", daemon=True)
+        track_thread = threading.Thread(target=track, name="DetectionPipeline-track", daemon=True)
+        decode_thread.start()
+        track_thread.start()
+
+        try:
+            while True:
+                batch = _get(batches, stop)
+                if batch is _DONE:
+                    break
+                start = time.perf_counter()
+                detections = self.model.predict(batch, conf=self.conf)
+                stats["inference"].add(len(batch), time.perf_counter() - start)
+                if not _put(results, detections, stop):
+                    break
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(results, _DONE, stop)
+            decode_thread.join()
+            track_thread.join()
+
+        if errors:
+            raise errors[0]
+        return stats
@@ -0,0 +1,282 @@
+import collections
+import time
+
+import numpy as np
+import supervision as sv
+
+from camera_movement import CameraMovementEstimator
+from utils import match_boxes
+
+
+class KeyframeDetector:
+    """
+    Runs the detector on keyframes only and propagates boxes in between.
+
+    A keyframe is taken every ``stride`` frames. With ``adaptive`` set,
+    ``stride`` is only the longest gap allowed and a keyframe is also taken
+    as soon as the expected drift of the propagated boxes (object speed times
+    frames since the keyframe plus the camera movement in that time) exceeds
+    ``max_drift`` pixels.
+
+    Between keyframes every detected box moves by its own velocity, measured
+    between the last two keyframes with the camera movement taken out, plus
+    the camera movement of the frame (from a downscaled
+    ``CameraMovementEstimator``). The propagated boxes are fed to ByteTrack
+    like real detections, so its state advances every frame and track ids
+    stay stable across the gaps.
+
+    Fixed-stride keyframes are detected in batches, adaptive ones one at
+    a time as they are triggered.
+    """
+
+    def __init__(self, tracker, stride=3, adaptive=False, max_drift=20.0,
+                 use_camera_motion=True, motion_downscale=0.5, match_iou=0.3):
+        self.tracker = tracker
+        self.stride = max(1, int(stride))
+        self.adaptive = adaptive
+        self.max_drift = max_drift
+        self.use_camera_motion = use_camera_motion
+        self.motion_downscale = motion_downscale
+        self.match_iou = match_iou
+        self.reset()
+
+    def reset(self):
+        self.motion_estimator = None
+        self.cls_names_inv = None
+        # Current (propagated) boxes and what is needed to move them on.
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.class_id = np.zeros(0, dtype=np.int64)
+        self.confidence = np.zeros(0, dtype=np.float32)
+        self.velocities = np.zeros((0, 2), dtype=np.float32)
+        # Boxes as detected on the last keyframe, row for row.
+        self.keyframe_boxes = np.zeros((0, 4), dtype=np.float32)
+        self.frames_since_keyframe = None
+        self.camera_motion_since_keyframe = np.zeros(2, dtype=np.float32)
+        self.camera_drift = 0.0
+        self.stats = {"frames": 0, "keyframes": 0, "seconds": 0.0}
+
+    def camera_motion(self, frame):
+        if not self.use_camera_motion:
+            return np.zeros(2, dtype=np.float32)
+        if self.motion_estimator is None:
+            self.motion_estimator = CameraMovementEstimator(frame, downscale=self.motion_downscale)
+        return np.asarray(self.motion_estimator.update_camera_movement(frame), dtype=np.float32)
+
+    def is_keyframe(self):
+        if self.frames_since_keyframe is None:
+            return True
+        gap = self.frames_since_keyframe + 1
+        if gap >= self.stride:
+            return True
+        if not self.adaptive:
+            return False
+        object_speed = float(np.hypot(*self.velocities.T).max()) if len(self.velocities) else 0.0
+        return object_speed * gap + self.camera_drift > self.max_drift
+
+    def extend(self, tracks, frames, on_frame=None):
+        start = time.perf_counter()
+        if self.adaptive:
+            # Whether a frame is a keyframe depends on the last detection.
+            for frame in frames:
+                self.add_frame(tracks, self.camera_motion(frame), frame=frame)
+                if on_frame is not None:
+                    on_frame()
+        else:
+            self._extend_fixed_stride(tracks, frames, on_frame)
+        self.stats["seconds"] += time.perf_counter() - start
+        return tracks
+
+    def _extend_fixed_stride(self, tracks, frames, on_frame):
+        """
+        With a fixed stride the keyframes are known up front, so they are
+        detected in batches like full detection (on the tracker's
+        ``DetectionPipeline`` when pipelined). Camera motion is measured as
+        frames are read; the frames before each keyframe are propagated
+        once its detection arrives.
+        """
+        pending = collections.deque()  # (camera_motion, is_keyframe) in frame order
+        since_keyframe = [self.frames_since_keyframe]
+
+        def keyframes():
+            for frame in frames:
+                gap = since_keyframe[0]
+                keyframe = gap is None or gap + 1 >= self.stride
+                since_keyframe[0] = 0 if keyframe else gap + 1
+                pending.append((self.camera_motion(frame), keyframe))
+                if keyframe:
+                    yield frame
+
+        def add_frames(detection=None):
+            while pending:
+                camera_motion, keyframe = pending.popleft()
+                self.add_frame(tracks, camera_motion, keyframe, detection=detection if keyframe else None)
+                if on_frame is not None:
+                    on_frame()
+                if keyframe:
+                    return
+
+        predictor = self.tracker.predictor
+        if self.tracker.pipelined:
+            self.tracker.detection_pipeline.model = predictor
+            self.tracker.detection_pipeline.run(keyframes(), add_frames)
+        else:
+            for batch in predictor.batches(keyframes()):
+                for detection in predictor.predict(batch, conf=self.tracker.detection_pipeline.conf):
+                    add_frames(detection)
+        # Frames after the last keyframe.
+        add_frames()
+
+    def add_frame(self, tracks, camera_motion, keyframe=None, frame=None, detection=None):
+        """
+        Track one frame: detect it if it is a keyframe (``keyframe=None``
+        decides now), else propagate. A keyframe's ``detection`` is
+        predicted from ``frame`` when not given.
+        """
+        if self.frames_since_keyframe is not None:
+            self.camera_motion_since_keyframe += camera_motion
+            self.camera_drift += float(np.hypot(*camera_motion))
+
+        if keyframe is None:
+            keyframe = self.is_keyframe()
+        if keyframe:
+            self.detect(tracks, frame, camera_motion, detection)
+        else:
+            self.propagate(tracks, camera_motion)
+        self.stats["frames"] += 1
+
+    def detect(self, tracks, frame, camera_motion=(0, 0), detection=None):
+        if detection is None:
+            detection = self.tracker.predictor.predict([frame], conf=self.tracker.detection_pipeline.conf)[0]
+        detection_supervision, self.cls_names_inv = self.tracker.to_supervision(detection)
+        self.tracker.add_supervision_to_tracks(tracks, detection_supervision, self.cls_names_inv)
+
+        boxes = np.asarray(detection_supervision.xyxy, dtype=np.float32).reshape(-1, 4)
+        class_id = np.asarray(detection_supervision.class_id, dtype=np.int64)
+
+        # Velocity since the previous keyframe, without the camera's share.
+        # Each box is paired with the previous box whose propagation to this
+        # frame overlaps it most; a class with a single box on both sides
+        # (the ball) is paired directly, as small fast boxes rarely overlap.
+        velocities = np.zeros((len(boxes), 2), dtype=np.float32)
+        if self.frames_since_keyframe is not None:
+            gap = self.frames_since_keyframe + 1
+            predicted = self.boxes + np.tile(self.velocities + camera_motion, 2)
+            pairs = [
+                (previous, current)
+                for previous, current, _ in match_boxes(predicted, boxes, self.match_iou)
+                if self.class_id[previous] == class_id[current]
+            ]
+            for cls_id in np.intersect1d(self.class_id, class_id):
+                previous = np.flatnonzero(self.class_id == cls_id)
+                current = np.flatnonzero(class_id == cls_id)
+                if len(previous) == 1 and len(current) == 1:
+                    pairs.append((int(previous[0]), int(current[0])))
+            for previous, current in pairs:
+                shift = _center(boxes[current]) - _center(self.keyframe_boxes[previous])
+                velocities[current] = (shift - self.camera_motion_since_keyframe) / gap
+
+        self.boxes = boxes
+        self.keyframe_boxes = boxes.copy()
+        self.class_id = class_id
+        self.confidence = _confidence(detection_supervision).astype(np.float32)
+        self.velocities = velocities
+        self.frames_since_keyframe = 0
+        self.camera_motion_since_keyframe = np.zeros(2, dtype=np.float32)
+        self.camera_drift = 0.0
+        self.stats["keyframes"] += 1
+
+    def propagate(self, tracks, camera_motion):
+        shift = self.velocities + camera_motion
+        self.boxes = self.boxes + np.tile(shift, 2)
+        self.frames_since_keyframe += 1
+
+        detection_supervision = sv.Detections(
+            xyxy=self.boxes.copy(),
+            confidence=self.confidence.copy(),
+            class_id=self.class_id.copy(),
+        )
+        self.tracker.add_supervision_to_tracks(tracks, detection_supervision, self.cls_names_inv)
+
+
+def _center(box):
+    return (box[:2] + box[2:]) / 2
+
+
+def _confidence(detections):
+    if detections.confidence is None:
+        return np.ones(len(detections), dtype=np.float32)
+    return detections.confidence
+
+
+def compare_tracks(reference_tracks, tracks, iou_threshold=0.5):
+    """
+    Box-level agreement of ``tracks`` with ``reference_tracks`` (full
+    detection), per object class: recall, precision and mean IoU of the
+    boxes matched one-to-one with IoU >= ``iou_threshold``.
+    """
+    report = {}
+    for object_name in ("players", "referees", "ball"):
+        matched = reference_count = count = 0
+        iou_sum = 0.0
+        num_frames = min(len(reference_tracks[object_name]), len(tracks[object_name]))
+        for frame_num in range(num_frames):
+            reference = [d["bbox"] for d in reference_tracks[object_name][frame_num].values()]
+            boxes = [d["bbox"] for d in tracks[object_name][frame_num].values()]
+            matches = match_boxes(reference, boxes, iou_threshold)
+            matched += len(matches)
+            iou_sum += sum(iou for _, _, iou in matches)
+            reference_count += len(reference)
+            count += len(boxes)
+        report[object_name] = {
+            "recall": matched / reference_count if reference_count else 1.0,
+            "precision": matched / count if count else 1.0,
+            "mean_iou": iou_sum / matched if matched else None,
+        }
+    return report
+
+
+def evaluate_detection_stride(model_path, frames, strides=(2, 3, 5), adaptive=False,
+                              iou_threshold=0.5, adaptive_strides=()):
+    """
+    Accuracy-vs-speed report for keyframe detection on ``frames``.
+
+    Runs full detection once as the reference, then each stride (adaptive
+    when ``adaptive`` is set) and each of ``adaptive_strides`` as the
+    longest gap of an adaptive stride, and returns one row per run with
+    the seconds taken, frames per second, speed-up, number of keyframes
+    and the ``compare_tracks`` scores.
+    """
+    from trackers.tracker import Tracker
+
+    reference_tracker = Tracker(model_path, pipelined=False)
+    reference_tracker.model.predict([frames[0]], conf=0.1)  # warm up
+    start = time.perf_counter()
+    reference_tracks = reference_tracker.get_object_tracks(frames)
+    reference_seconds = time.perf_counter() - start
+
+    rows = [{
+        "stride": 1,
+        "adaptive": False,
+        "seconds": reference_seconds,
+        "fps": len(frames) / reference_seconds if reference_seconds else 0.0,
+        "speedup": 1.0,
+        "keyframes": len(frames),
+        "accuracy": compare_tracks(reference_tracks, reference_tracks, iou_threshold),
+    }]
+    runs = [(stride, adaptive) for stride in strides] + [(stride, True) for stride in adaptive_strides]
+    for stride, adaptive in runs:
+        tracker = Tracker(model_path, pipelined=False, detection_stride=stride, adaptive_stride=adaptive)
+        tracker._model = reference_tracker.model
+        start = time.perf_counter()
+        tracks = tracker.get_object_tracks(frames)
+        seconds = time.perf_counter() - start
+        rows.append({
+            "stride": stride,
+            "adaptive": adaptive,
+            "seconds": seconds,
+            "fps": len(frames) / seconds if seconds else 0.0,
+            "speedup": reference_seconds / seconds if seconds else 0.0,
+            "keyframes": tracker.keyframe_detector.stats["keyframes"],
+            "accuracy": compare_tracks(reference_tracks, tracks, iou_threshold),
+        })
+    return rows
@@ -0,0 +1,229 @@
+import itertools
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils import FrameSource, get_chunk_size, get_video_properties, iter_video, match_boxes
+
+# Objects whose ByteTrack ids are reconciled across shards; the ball is
+# always id 1.
+STITCHED_OBJECTS = ("players", "referees")
+
+
+def plan_shards(frame_count, n_shards, overlap=30, min_shard_frames=None):
+    """
+    Split ``frame_count`` frames into up to ``n_shards`` consecutive
+    ``(warm_up_start, start, end)`` ranges. A shard reports frames
+    ``start:end`` and is run from ``warm_up_start``, ``overlap`` frames
+    earlier, so its tracker and optical flow have settled by ``start`` and
+    its first frames can be matched against the previous shard. The last
+    shard's ``end`` is None (to the end of the video, whatever the
+    container's frame count said). Shards are at least
+    ``min_shard_frames`` long (default ``4 * overlap``).
+    """
+    if min_shard_frames is None:
+        min_shard_frames = 4 * overlap
+    n_shards = max(1, min(n_shards, frame_count // max(1, min_shard_frames)))
+    bounds = [frame_count * index // n_shards for index in range(n_shards + 1)]
+    shards = []
+    for index, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        shards.append((max(0, start - overlap), start, end if index < n_shards - 1 else None))
+    return shards
+
+
+def _init_worker(threads):
+    if threads:
+        from utils import limit_threads
+        limit_threads(threads)
+
+
+def track_shard(shard):
+    """
+    Detection, tracking and camera movement for one shard, warm-up frames
+    included, chunk by chunk within ``memory_budget_mb``. Runs in a
+    worker process; the models load through the process's registry.
+    """
+    from camera_movement import CameraMovementEstimator
+    from trackers.tracker import Tracker
+
+    video_path, (warm_up_start, start, end) = shard["video_path"], shard["range"]
+    tracker = Tracker(shard["model_path"], **shard["tracker_kwargs"])
+    tracks = {"players": [], "referees": [], "ball": []}
+    camera_movement = []
+    timings = {name: [0.0, 0.0] for name in ("read", "detect", "track", "camera_movement")}
+
+    def timed(name, function, *args):
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = function(*args)
+        timings[name][0] += time.perf_counter() - wall
+        timings[name][1] += time.process_time() - cpu
+        return result
+
+    source = FrameSource(iter_video(video_path, warm_up_start, end, backend=shard["decoder_backend"]))
+    first_frame = source.peek()
+    if first_frame is not None:
+        estimator = CameraMovementEstimator(first_frame, downscale=shard["camera_movement_downscale"])
+        chunk_size = get_chunk_size(first_frame, shard["memory_budget_mb"])
+        while True:
+            # Decoded on the detection pipeline's thread as it consumes the chunk.
+            chunk = source.keep = []
+            timed("detect", tracker.extend_object_tracks, tracks, itertools.islice(source, chunk_size))
+            if not chunk:
+                break
+            camera_movement += timed(
+                "camera_movement", lambda: [estimator.update_camera_movement(frame) for frame in chunk]
+            )
+    # Decoding overlapped detection's wall time; its CPU time is moved from
+    # detect (process-wide) to read, and ByteTrack's time to track.
+    timings["read"] = [source.seconds, source.cpu_seconds]
+    timings["track"] = [tracker.tracking_seconds, tracker.tracking_cpu_seconds]
+    timings["detect"][0] -= 0.0 if tracker.tracking_overlaps else tracker.tracking_seconds
+    timings["detect"][1] -= source.cpu_seconds + tracker.tracking_cpu_seconds
+
+    return {
+        "range": shard["range"],
+        "tracks": tracks,
+        # Warm-up frames only serve to settle the optical flow.
+        "camera_movement": camera_movement[start - warm_up_start:],
+        "timings": {name: tuple(values) for name, values in timings.items()},
+        "pid": os.getpid(),
+    }
+
+
+def stitch_tracks(shard_results, iou_threshold=0.5, min_votes=1):
+    """
+    Join per-shard ``tracks`` into one, with track ids consistent across
+    shards.
+
+    Each shard's ByteTrack numbered its tracks on its own. In the overlap
+    frames both the previous shard (already stitched) and the shard's
+    warm-up saw the same players, so their boxes are matched one-to-one by
+    IoU there; every match is a vote that the shard's id is the previous
+    shard's id. Ids are then paired greedily by votes (at least
+    ``min_votes``), one-to-one, and the shard continues those tracks; ids
+    without a pair get new ids, numbered on from the highest id so far.
+    The warm-up frames are dropped in favour of the previous shard's. The
+    first shard keeps ByteTrack's ids, so up to the second shard the ids
+    are those of a single pass; tracks first seen later can be numbered
+    differently.
+    """
+    merged = {"players": [], "referees": [], "ball": []}
+    # One id space for all classes, as in ByteTrack.
+    next_id = 1
+    for result in shard_results:
+        warm_up_start, start, _ = result["range"]
+        tracks = result["tracks"]
+        warm_up = min(start - warm_up_start, len(tracks["ball"]))
+        for object_name in merged:
+            if object_name not in STITCHED_OBJECTS:
+                merged[object_name] += tracks[object_name][warm_up:]
+                continue
+
+            mapping = {}
+            if not merged[object_name]:
+                # First shard: a single pass from frame 0, ids as they are.
+                mapping = {
+                    track_id: track_id for frame in tracks[object_name] for track_id in frame
+                }
+            else:
+                votes = Counter()
+                for offset in range(warm_up):
+                    frame_num = warm_up_start + offset
+                    if frame_num >= len(merged[object_name]):
+                        break
+                    previous = merged[object_name][frame_num]
+                    current = tracks[object_name][offset]
+                    previous_ids, current_ids = list(previous), list(current)
+                    for i, j, _ in match_boxes(
+                        [previous[track_id]["bbox"] for track_id in previous_ids],
+                        [current[track_id]["bbox"] for track_id in current_ids],
+                        iou_threshold,
+                    ):
+                        votes[(current_ids[j], previous_ids[i])] += 1
+                continued = set()
+                for (current_id, previous_id), count in votes.most_common():
+                    if count < min_votes:
+                        break
+                    if current_id in mapping or previous_id in continued:
+                        continue
+                    mapping[current_id] = previous_id
+                    continued.add(previous_id)
+
+            for frame in tracks[object_name][warm_up:]:
+                stitched = {}
+                for track_id, track in frame.items():
+                    if track_id not in mapping:
+                        mapping[track_id] = next_id
+                        next_id += 1
+                    stitched[mapping[track_id]] = track
+                merged[object_name].append(stitched)
+            if mapping:
+                next_id = max(next_id, max(mapping.values()) + 1)
+    return merged
+
+
+def track_in_shards(video_path, model_path, n_shards, overlap=30, n_workers=None, memory_budget_mb=512,
+                    camera_movement_downscale=1.0, iou_threshold=0.5, mp_context=None,
+                    on_shard_done=None, tracker_kwargs=None, decoder_backend=None):
+    """
+    Detection, tracking and camera movement of a whole video, run as
+    ``n_shards`` time shards in parallel processes (see ``plan_shards``),
+    then stitched back together (``stitch_tracks``).
+
+    Returns ``(tracks, camera_movement, shard_results)``: the tracks in the
+    ``get_object_tracks`` structure, the per-frame camera movement (each
+    shard warms its optical flow up on the overlap frames, so the first
+    movement it reports is measured against the real previous frame, as
+    in a single pass), and per shard its range, timings and worker pid.
+    ``tracker_kwargs`` (a dict) go to every shard's ``Tracker``. Processes are
+    started with ``mp_context`` (spawn by default); ``n_workers=1`` runs
+    the shards one after another in this process. ``on_shard_done(frames)``
+    is called with the frames done so far as shards finish. Each shard
+    seeks to its first frame with ``decoder_backend`` (see
+    ``utils.open_decoder``).
+    """
+    frame_count = get_video_properties(video_path, decoder_backend)["frame_count"]
+    ranges = plan_shards(frame_count, n_shards, overlap)
+    if n_workers is None:
+        n_workers = min(len(ranges), os.cpu_count() or 1)
+    shards = [
+        {
+            "video_path": video_path,
+            "range": shard_range,
+            "model_path": model_path,
+            "tracker_kwargs": tracker_kwargs or {},
+            "memory_budget_mb": memory_budget_mb / max(1, n_workers),
+            "camera_movement_downscale": camera_movement_downscale,
+            "decoder_backend": decoder_backend,
+        }
+        for shard_range in ranges
+    ]
+
+    results = [None] * len(shards)
+    frames_done = 0
+
+    def done(index, result):
+        nonlocal frames_done
+        results[index] = result
+        frames_done += len(result["camera_movement"])
+        if on_shard_done is not None:
+            on_shard_done(frames_done)
+
+    if n_workers <= 1 or len(shards) <= 1:
+        for index, shard in enumerate(shards):
+            done(index, track_shard(shard))
+    else:
+        threads = max(1, (os.cpu_count() or 1) // n_workers)
+        with ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=mp_context or multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(threads,),
+        ) as executor:
+            futures = {executor.submit(track_shard, shard): index for index, shard in enumerate(shards)}
+            for future in as_completed(futures):
+                done(futures[future], future.result())
+
+    tracks = stitch_tracks(results, iou_threshold)
+    camera_movement = [movement for result in results for movement in result["camera_movement"]]
+    return tracks, camera_movement, results
@@ -1,26 +1,130 @@
-from ultralytics import YOLO
 import supervision as sv
 import pickle
 import os
 import numpy as np
-import pandas as pd
 import cv2
 import sys
-
+import time
+
+from inference import get_model, registry
+from trackers.ball_detector import BallDetector
+from trackers.ball_interpolation import interpolate_ball_boxes
+from trackers.batch_predictor import BatchPredictor
+from trackers.detection_pipeline import DetectionPipeline
+from trackers.keyframe_detection import KeyframeDetector
+from player_ball_assigner.possession_stats import PossessionStats
 from utils import (
     get_center_of_bbox,
     get_bbox_width,
     get_foot_position,
     is_valid_bbox,
+    get_centers_of_bboxes,
+    get_foot_positions,
+    TrackStore,
+    blend_rectangle,
 )
 
 
+def _keep_frames(frames, kept_frames):
+    for frame in frames:
+        kept_frames.append(frame)
+        yield frame
+
+
 class Tracker:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path, pipelined=True, detection_stride=1, adaptive_stride=False,
+                 inference_backend="pytorch", int8=False, batch_size="auto", imgsz=None,
+                 memory_budget_mb=2048, ball_detection="full"):
+        """
+        With ``detection_stride > 1`` (or ``adaptive_stride``) the detector
+        only runs on keyframes and boxes are propagated in between, see
+        ``KeyframeDetector``. ``inference_backend`` is one of
+        ``inference.BACKENDS``; ``int8`` quantizes the ONNX export.
+        ``batch_size``, ``imgsz`` and ``memory_budget_mb`` configure the
+        ``BatchPredictor`` running the detector. ``ball_detection="roi"``
+        re-detects the ball at full resolution around its expected position
+        (``BallDetector``) instead of taking it from the main pass.
+        """
+        self.model_path = model_path
+        # Constructor arguments, to build the same tracker in another process.
+        self.settings = dict(
+            pipelined=pipelined, detection_stride=detection_stride, adaptive_stride=adaptive_stride,
+            inference_backend=inference_backend, int8=int8, batch_size=batch_size, imgsz=imgsz,
+            memory_budget_mb=memory_budget_mb, ball_detection=ball_detection,
+        )
+        self.inference_backend = inference_backend
+        self.int8 = int8
+        self.imgsz = imgsz
+        self._model = None
         self.tracker = sv.ByteTrack()
+        # Time spent updating ByteTrack and appending to the tracks, as
+        # opposed to detecting; wall and (tracking) thread CPU seconds.
+        self.tracking_seconds = 0.0
+        self.tracking_cpu_seconds = 0.0
+        self.pipelined = pipelined
+        self._predictor = BatchPredictor(
+            batch_size=batch_size, imgsz=imgsz, memory_budget_mb=memory_budget_mb
+        )
+        self.detection_pipeline = DetectionPipeline(
+            None, batch_size=self._predictor.next_batch_size, conf=0.1
+        )
+        self.ball_detector = BallDetector(conf=0.1) if ball_detection == "roi" else None
+        self.keyframe_detector = None
+        if detection_stride > 1 or adaptive_stride:
+            self.keyframe_detector = KeyframeDetector(
+                self, stride=detection_stride, adaptive=adaptive_stride
+            )
+
+    @property
+    def model(self):
+        # Loaded on first use so cached runs never pay for it, and shared
+        # with every other Tracker of the process through the registry.
+        if self._model is None:
+            self._model = get_model(
+                self.model_path, self.inference_backend, self.int8, imgsz=self.imgsz or 640
+            )
+        return self._model
+
+    @property
+    def tracking_overlaps(self):
+        """Whether tracking runs alongside detection (on its own thread)."""
+        return self.pipelined and (self.keyframe_detector is None or not self.keyframe_detector.adaptive)
+
+    @property
+    def predictor(self):
+        if self._predictor.model is None:
+            self._predictor.model = self.model
+        return self._predictor
+
+    def inference_metadata(self):
+        """Inference settings chosen for the last run (backend, resolution, batch size)."""
+        metadata = {
+            "inference_backend": getattr(self._model, "inference_backend", self.inference_backend),
+            "int8": self.int8,
+        }
+        metadata.update(self._predictor.metadata())
+        if self.keyframe_detector is not None:
+            metadata["detection_stride"] = self.keyframe_detector.stride
+            metadata["adaptive_stride"] = self.keyframe_detector.adaptive
+            metadata["keyframes"] = self.keyframe_detector.stats["keyframes"]
+        if self.ball_detector is not None:
+            metadata["ball_detection"] = dict(self.ball_detector.stats)
+        timing = registry.timings.get(registry.key(
+            self.model_path, self.inference_backend, self.int8, imgsz=self.imgsz or 640
+        ))
+        if self._model is not None and timing is not None:
+            metadata["model_load_seconds"] = timing["load_seconds"]
+            metadata["model_warmup_seconds"] = timing["warmup_seconds"]
+        return metadata
 
     def add_position_to_tracks(self, tracks):
+        if isinstance(tracks, TrackStore):
+            is_ball = tracks.class_mask('ball')[:, None]
+            tracks.position[:] = np.where(
+                is_ball, get_centers_of_bboxes(tracks.bbox), get_foot_positions(tracks.bbox)
+            )
+            return
+
         for object, object_tracks in tracks.items():
             for frame_num, track in enumerate(object_tracks):
                 for track_id, track_info in track.items():
@@ -31,83 +135,151 @@ class Tracker:
                         position = get_foot_position(bbox)
                     tracks[object][frame_num][track_id]['position'] = position
 
-    def interpolate_ball_positions(self, ball_positions):
-        ball_positions = [x.get(1, {}).get('bbox', []) for x in ball_positions]
-        df_ball_positions = pd.DataFrame(ball_positions, columns=['x1', 'y1', 'x2', 'y2'])
-
-        # Interpolate missing values
-        df_ball_positions = df_ball_positions.interpolate()
-        df_ball_positions = df_ball_positions.bfill()
-
-        ball_positions = [{1: {"bbox": x}} for x in df_ball_positions.to_numpy().tolist()]
+    def interpolate_ball_positions(self, ball_positions, max_gap=None, method="linear"):
+        """
+        Fill frames without a ball box, see ``interpolate_ball_boxes``.
+        Filled frames are marked ``"interpolated": True``; gaps longer than
+        ``max_gap`` stay empty.
+        """
+        boxes = np.full((len(ball_positions), 4), np.nan)
+        for frame_num, ball in enumerate(ball_positions):
+            bbox = ball.get(1, {}).get('bbox')
+            if bbox is not None and len(bbox) == 4:
+                boxes[frame_num] = [np.nan if v is None else v for v in bbox]
+
+        boxes, interpolated = interpolate_ball_boxes(boxes, max_gap=max_gap, method=method)
+
+        ball_positions = []
+        for bbox, is_interpolated in zip(boxes.tolist(), interpolated.tolist()):
+            if is_interpolated:
+                ball_positions.append({1: {"bbox": bbox, "interpolated": True}})
+            elif bbox[0] == bbox[0]:
+                ball_positions.append({1: {"bbox": bbox}})
+            else:
+                ball_positions.append({})
 
         return ball_positions
 
     def detect_frames(self, frames):
-        batch_size = 20
         detections = []
-        for i in range(0, len(frames), batch_size):
-            detections_batch = self.model.predict(frames[i:i + batch_size], conf=0.1)
+        for batch in self.predictor.batches(frames):
+            detections_batch = self.predictor.predict(batch, conf=0.1)
             detections += detections_batch
         return detections
 
-    def get_object_tracks(self, frames, read_from_stub=False, stub_path=None):
+    def get_object_tracks(self, frames, read_from_stub=False, stub_path=None, on_frames=None):
 
         if read_from_stub and stub_path is not None and os.path.exists(stub_path):
             with open(stub_path, 'rb') as f:
                 tracks = pickle.load(f)
             return tracks
 
-        detections = self.detect_frames(frames)
-
         tracks = {
             "players": [],
             "referees": [],
             "ball": []
         }
+        self.extend_object_tracks(tracks, frames, on_frames)
 
-        for frame_num, detection in enumerate(detections):
-            cls_names = detection.names
-            cls_names_inv = {v: k for k, v in cls_names.items()}
+        if stub_path is not None:
+            with open(stub_path, 'wb') as f:
+                pickle.dump(tracks, f)
 
-            # Covert to supervision Detection format
-            detection_supervision = sv.Detections.from_ultralytics(detection)
+        return tracks
 
-            # Convert GoalKeeper to player object
-            for object_ind, class_id in enumerate(detection_supervision.class_id):
-                if cls_names[class_id] == "goalkeeper":
-                    detection_supervision.class_id[object_ind] = cls_names_inv["player"]
+    def extend_object_tracks(self, tracks, frames, on_frames=None):
+        """
+        Detect and track ``frames`` and append one entry per frame to ``tracks``.
+
+        ByteTrack state lives on the tracker, so calling this repeatedly with
+        consecutive chunks of a video gives the same tracks as a single call.
+        When ``pipelined`` is set, decoding, inference and tracking overlap;
+        per-stage throughput is available in ``self.detection_pipeline.stats``.
+        ``tracking_seconds`` and ``tracking_cpu_seconds`` add up the part
+        spent tracking rather than detecting (see ``tracking_overlaps``).
+        ``on_frames(frames_done)`` is called as batches are tracked, with the
+        number of ``frames`` tracked so far; raising from it aborts.
+        """
+        start_frame = len(tracks["ball"])
+        if self.ball_detector is not None:
+            # Kept as they are decoded rather than decoded up front, so
+            # decoding still overlaps inference.
+            kept_frames = []
+            frames = _keep_frames(frames, kept_frames)
+
+        report = None
+        if on_frames is not None:
+            report = lambda *_: on_frames(len(tracks["ball"]) - start_frame)
+
+        if self.keyframe_detector is not None:
+            self.keyframe_detector.extend(tracks, frames, report)
+        elif self.pipelined:
+            self.detection_pipeline.model = self.predictor
+            self.detection_pipeline.run(
+                frames, lambda detection: self.add_detection_to_tracks(tracks, detection), report
+            )
+        else:
+            for batch in self.predictor.batches(frames):
+                for detection in self.predictor.predict(batch, conf=0.1):
+                    self.add_detection_to_tracks(tracks, detection)
+                if report is not None:
+                    report()
+
+        if self.ball_detector is not None:
+            self.ball_detector.model = self.model
+            self.ball_detector.update_tracks(tracks, kept_frames, start_frame)
+        return tracks
 
-            # Track Objects
-            detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
+    def to_supervision(self, detection):
+        """Ultralytics result -> (``sv.Detections``, class name -> id) with goalkeepers as players."""
+        cls_names = detection.names
+        cls_names_inv = {v: k for k, v in cls_names.items()}
 
-            tracks["players"].append({})
-            tracks["referees"].append({})
-            tracks["ball"].append({})
+        # Covert to supervision Detection format
+        detection_supervision = sv.Detections.from_ultralytics(detection)
 
-            for frame_detection in detection_with_tracks:
-                bbox = frame_detection[0].tolist()
-                cls_id = frame_detection[3]
-                track_id = frame_detection[4]
+        # Convert GoalKeeper to player object
+        for object_ind, class_id in enumerate(detection_supervision.class_id):
+            if cls_names[class_id] == "goalkeeper":
+                detection_supervision.class_id[object_ind] = cls_names_inv["player"]
 
-                if cls_id == cls_names_inv['player']:
-                    tracks["players"][frame_num][track_id] = {"bbox": bbox}
+        return detection_supervision, cls_names_inv
 
-                if cls_id == cls_names_inv['referee']:
-                    tracks["referees"][frame_num][track_id] = {"bbox": bbox}
+    def add_detection_to_tracks(self, tracks, detection):
+        detection_supervision, cls_names_inv = self.to_supervision(detection)
+        self.add_supervision_to_tracks(tracks, detection_supervision, cls_names_inv)
 
-            for frame_detection in detection_supervision:
-                bbox = frame_detection[0].tolist()
-                cls_id = frame_detection[3]
+    def add_supervision_to_tracks(self, tracks, detection_supervision, cls_names_inv):
+        """Update ByteTrack with one frame's detections and append the frame to ``tracks``."""
+        start, start_cpu = time.perf_counter(), time.thread_time()
+        # Track Objects
+        detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
 
-                if cls_id == cls_names_inv['ball']:
-                    tracks["ball"][frame_num][1] = {"bbox": bbox}
+        tracks["players"].append({})
+        tracks["referees"].append({})
+        tracks["ball"].append({})
 
-        if stub_path is not None:
-            with open(stub_path, 'wb') as f:
-                pickle.dump(tracks, f)
+        for frame_detection in detection_with_tracks:
+            bbox = frame_detection[0].tolist()
+            cls_id = frame_detection[3]
+            track_id = frame_detection[4]
 
-        return tracks
+            if cls_id == cls_names_inv['player']:
+                tracks["players"][-1][track_id] = {"bbox": bbox}
+
+            if cls_id == cls_names_inv['referee']:
+                tracks["referees"][-1][track_id] = {"bbox": bbox}
+
+        for frame_detection in detection_supervision:
+            bbox = frame_detection[0].tolist()
+            cls_id = frame_detection[3]
+
+            if cls_id == cls_names_inv['ball']:
+                tracks["ball"][-1][1] = {"bbox": bbox}
+
+        self.tracking_seconds += time.perf_counter() - start
+        self.tracking_cpu_seconds += time.thread_time() - start_cpu
+        return detection_with_tracks
 
     def draw_ellipse(self, frame, bbox, color, track_id=None):
         y2 = int(bbox[3])
@@ -179,21 +351,14 @@ class Tracker:
 
     def draw_team_ball_control(self, frame, frame_num, team_ball_control):
         # Draw a semi-transparent rectaggle
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (1350, 850), (1900, 970), (255, 255, 255), -1)
-        alpha = 0.4
-        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-
-        team_ball_control_till_frame = team_ball_control[:frame_num + 1]
-        # Get the number of time each team had ball control
-        team_1_num_frames = team_ball_control_till_frame[team_ball_control_till_frame == 1].shape[0]
-        team_2_num_frames = team_ball_control_till_frame[team_ball_control_till_frame == 2].shape[0]
-        total_frames_with_control = team_1_num_frames + team_2_num_frames
-        if total_frames_with_control == 0:
-            team_1 = team_2 = 0.0
-        else:
-            team_1 = team_1_num_frames / total_frames_with_control
-            team_2 = team_2_num_frames / total_frames_with_control
+        blend_rectangle(frame, (1350, 850), (1900, 970), (255, 255, 255), 0.4)
+
+        # ``team_ball_control`` is either PossessionStats (O(1) lookup) or the
+        # raw per-frame array.
+        if not isinstance(team_ball_control, PossessionStats):
+            team_ball_control = PossessionStats.from_team_ball_control(team_ball_control[:frame_num + 1])
+        percentages = team_ball_control.team_percentages(frame_num)
+        team_1, team_2 = percentages[1], percentages[2]
 
         cv2.putText(frame, f"Team 1 Ball Control: {team_1 * 100:.2f}%", (1400, 900), cv2.FONT_HERSHEY_SIMPLEX, 1,
                     (0, 0, 0), 3)
@@ -202,34 +367,39 @@ class Tracker:
 
         return frame
 
-    def draw_annotations(self, video_frames, tracks, team_ball_control):
-        output_video_frames = []
-        for frame_num, frame in enumerate(video_frames):
-            frame = frame.copy()
+    def draw_frame_annotations(self, frame, frame_num, tracks, team_ball_control):
+        """Draw players, referees, ball and the ball control box on ``frame`` in place."""
+        player_dict = tracks["players"][frame_num]
+        ball_dict = tracks["ball"][frame_num]
+        referee_dict = tracks["referees"][frame_num]
 
-            player_dict = tracks["players"][frame_num]
-            ball_dict = tracks["ball"][frame_num]
-            referee_dict = tracks["referees"][frame_num]
+        # Draw Players
+        for track_id, player in player_dict.items():
+            color = player.get("team_color", (0, 0, 255))
+            frame = self.draw_ellipse(frame, player["bbox"], color, track_id)
 
-            # Draw Players
-            for track_id, player in player_dict.items():
-                color = player.get("team_color", (0, 0, 255))
-                frame = self.draw_ellipse(frame, player["bbox"], color, track_id)
+            if player.get('has_ball', False):
+                frame = self.draw_triangle(frame, player["bbox"], (0, 0, 255))
 
-                if player.get('has_ball', False):
-                    frame = self.draw_triangle(frame, player["bbox"], (0, 0, 255))
+        # Draw Referee
+        for _, referee in referee_dict.items():
+            frame = self.draw_ellipse(frame, referee["bbox"], (0, 255, 255))
 
-            # Draw Referee
-            for _, referee in referee_dict.items():
-                frame = self.draw_ellipse(frame, referee["bbox"], (0, 255, 255))
+        # Draw ball
+        for track_id, ball in ball_dict.items():
+            frame = self.draw_triangle(frame, ball["bbox"], (0, 255, 0))
 
-            # Draw ball
-            for track_id, ball in ball_dict.items():
-                frame = self.draw_triangle(frame, ball["bbox"], (0, 255, 0))
+        # Draw Team Ball Control
+        frame = self.draw_team_ball_control(frame, frame_num, team_ball_control)
 
-            # Draw Team Ball Control
-            frame = self.draw_team_ball_control(frame, frame_num, team_ball_control)
+        return frame
 
+    def draw_annotations(self, video_frames, tracks, team_ball_control, start_frame=0):
+        if not isinstance(team_ball_control, PossessionStats):
+            team_ball_control = PossessionStats.from_team_ball_control(team_ball_control)
+        output_video_frames = []
+        for frame_num, frame in enumerate(video_frames, start=start_frame):
+            frame = self.draw_frame_annotations(frame.copy(), frame_num, tracks, team_ball_control)
             output_video_frames.append(frame)
 
-        return output_video_frames
\ No newline at end of file
+        return output_video_frames
@@ -1,9 +1,51 @@
-from .video_utils import read_video, save_video
-from .bbox_utils import (
-    get_center_of_bbox,
-    get_bbox_width,
-    measure_distance,
-    measure_xy_distance,
-    get_foot_position,
-    is_valid_bbox,
-)
\ No newline at end of file
+# Names are imported on first access (see ``lazy_exports``), so importing
+# one helper does not pull in OpenCV and every other module.
+from .lazy_import import lazy_exports
+
+_EXPORTS = {
+    **dict.fromkeys([
+        "read_video",
+        "save_video",
+        "iter_video",
+        "iter_chunks",
+        "get_chunk_size",
+        "open_video_writer",
+        "get_video_properties",
+        "VideoWriter",
+        "FrameSource",
+    ], "utils.video_utils"),
+    **dict.fromkeys([
+        "VideoDecoder",
+        "open_decoder",
+        "probe_video",
+        "available_decoders",
+        "resolve_decoder",
+        "DECODER_BACKENDS",
+    ], "utils.video_decoder"),
+    **dict.fromkeys([
+        "get_center_of_bbox",
+        "get_bbox_width",
+        "measure_distance",
+        "measure_xy_distance",
+        "get_foot_position",
+        "is_valid_bbox",
+        "valid_bbox_mask",
+        "get_centers_of_bboxes",
+        "get_bbox_widths",
+        "get_foot_positions",
+        "measure_distances",
+        "box_ious",
+        "match_boxes",
+    ], "utils.bbox_utils"),
+    **dict.fromkeys(["TrackStore", "OBJECT_CLASSES"], "utils.track_store"),
+    **dict.fromkeys(["ResultCache", "hash_file", "run_key"], "utils.result_cache"),
+    "blend_rectangle": "utils.draw_utils",
+    **dict.fromkeys(["check_environment", "limit_threads"], "utils.environment"),
+    **dict.fromkeys(
+        ["RunProfiler", "RssSampler", "StackSampler", "current_rss_bytes", "peak_rss_bytes"],
+        "utils.instrumentation",
+    ),
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
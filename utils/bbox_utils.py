@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 
 def _is_invalid_coordinate(value):
     return value is None or (isinstance(value, float) and math.isnan(value))
@@ -29,4 +31,65 @@ def measure_xy_distance(p1,p2):
 
 def get_foot_position(bbox):
     x1,y1,x2,y2 = bbox
-    return int((x1+x2)/2),int(y2)
\ No newline at end of file
+    return int((x1+x2)/2),int(y2)
+
+# Batch versions of the helpers above, operating on (N, 4) bbox arrays and
+# (N, 2) point arrays. Rounding matches the scalar helpers (truncation).
+
+def valid_bbox_mask(bboxes):
+    bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+    return ~np.isnan(bboxes).any(axis=1)
+
+def get_centers_of_bboxes(bboxes):
+    bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+    x = np.trunc((bboxes[:, 0] + bboxes[:, 2]) / 2)
+    y = np.trunc((bboxes[:, 1] + bboxes[:, 3]) / 2)
+    return np.stack([x, y], axis=1)
+
+def get_bbox_widths(bboxes):
+    bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+    return bboxes[:, 2] - bboxes[:, 0]
+
+def get_foot_positions(bboxes):
+    bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+    x = np.trunc((bboxes[:, 0] + bboxes[:, 2]) / 2)
+    y = np.trunc(bboxes[:, 3])
+    return np.stack([x, y], axis=1)
+
+def measure_distances(p1, p2):
+    p1 = np.asarray(p1, dtype=np.float32)
+    p2 = np.asarray(p2, dtype=np.float32)
+    return np.hypot(p1[..., 0] - p2[..., 0], p1[..., 1] - p2[..., 1])
+
+def box_ious(boxes1, boxes2):
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes, as an (N, M) array."""
+    boxes1 = np.asarray(boxes1, dtype=np.float32).reshape(-1, 4)
+    boxes2 = np.asarray(boxes2, dtype=np.float32).reshape(-1, 4)
+    top_left = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    bottom_right = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    union = area1[:, None] + area2[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+def match_boxes(boxes1, boxes2, iou_threshold=0.5):
+    """
+    Greedy one-to-one matching by descending IoU. Returns the matched
+    ``(index1, index2, iou)`` triples with IoU of at least ``iou_threshold``.
+    """
+    ious = box_ious(boxes1, boxes2)
+    matches = []
+    if ious.size == 0:
+        return matches
+    used1, used2 = set(), set()
+    for flat_index in np.argsort(-ious, axis=None):
+        i, j = np.unravel_index(flat_index, ious.shape)
+        if ious[i, j] < iou_threshold:
+            break
+        if i in used1 or j in used2:
+            continue
+        used1.add(i)
+        used2.add(j)
+        matches.append((int(i), int(j), float(ious[i, j])))
+    return matches
@@ -0,0 +1,23 @@
+import cv2
+import numpy as np
+
+
+def blend_rectangle(frame, top_left, bottom_right, color, alpha):
+    """
+    Draw a filled, semi-transparent rectangle in place.
+
+    Same result as drawing on a full-frame copy and ``cv2.addWeighted``-ing
+    it back, but only the rectangle's region of interest is touched.
+    """
+    height, width = frame.shape[:2]
+    x1, y1 = max(0, top_left[0]), max(0, top_left[1])
+    # cv2.rectangle includes the bottom-right corner.
+    x2, y2 = min(width, bottom_right[0] + 1), min(height, bottom_right[1] + 1)
+    if x1 >= x2 or y1 >= y2:
+        return frame
+
+    roi = frame[y1:y2, x1:x2]
+    overlay = np.empty_like(roi)
+    overlay[:] = color
+    cv2.addWeighted(overlay, alpha, roi, 1 - alpha, 0, dst=roi)
+    return frame
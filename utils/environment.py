@@ -0,0 +1,70 @@
+import importlib.metadata
+import importlib.util
+import os
+import warnings
+
+
+_problems = None
+
+
+def _installed(distribution):
+    try:
+        return importlib.metadata.version(distribution)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def check_environment(warn=True):
+    """
+    Check the installed packages once per process and return the problems
+    found, as a list of messages with the fix (also issued as warnings the
+    first time with ``warn``). Nothing is installed or removed here; that
+    belongs in the image build (``requirements.txt``, ``packages.txt``).
+
+    The main one: ``opencv-python`` pulled in next to
+    ``opencv-python-headless`` (ultralytics and supervision depend on it)
+    shadows the headless build and needs ``libGL.so.1``, which slim
+    containers lack.
+    """
+    global _problems
+    if _problems is None:
+        problems = []
+        gui_opencv = _installed("opencv-python")
+        headless_opencv = _installed("opencv-python-headless")
+        if gui_opencv and headless_opencv:
+            problems.append(
+                f"opencv-python {gui_opencv} is installed next to opencv-python-headless "
+                f"{headless_opencv} and may shadow it. Run `pip uninstall -y opencv-python && "
+                f"pip install --force-reinstall opencv-python-headless` in the image build."
+            )
+        if importlib.util.find_spec("cv2") is None:
+            problems.append("OpenCV is not installed. Install opencv-python-headless (see requirements.txt).")
+        else:
+            try:
+                import cv2  # noqa: F401
+            except ImportError as e:
+                problems.append(
+                    f"OpenCV cannot be imported ({e}). Use opencv-python-headless, or install the "
+                    f"system libraries from packages.txt."
+                )
+        for module, distribution in (("ultralytics", "ultralytics"), ("supervision", "supervision"),
+                                     ("sklearn", "scikit-learn")):
+            if importlib.util.find_spec(module) is None:
+                problems.append(f"{distribution} is not installed (see requirements.txt).")
+        _problems = problems
+        if warn:
+            for problem in problems:
+                warnings.warn(problem)
+    return list(_problems)
+
+
+def limit_threads(threads):
+    """
+    Cap the thread pools of OpenCV, and of torch and the BLAS libraries
+    when they are imported later, to ``threads`` in this process. For
+    worker processes sharing the machine; call it before any model loads.
+    """
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(variable, str(threads))
+    import cv2
+    cv2.setNumThreads(threads)
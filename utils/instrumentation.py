@@ -0,0 +1,388 @@
+import collections
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes():
+    """Resident set size of this process right now, or None (Linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class RssSampler:
+    """
+    Peak resident memory over stretches of a run.
+
+    A background thread reads the current RSS every ``interval`` seconds
+    while anything is being watched; ``watch()`` returns a token and
+    ``unwatch(token)`` the peak seen since, so stages can overlap or nest.
+    The RSS is also read at both ends, which catches stages shorter than
+    ``interval``. Needs ``/proc`` (``available``).
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.available = current_rss_bytes() is not None
+        self._peaks = {}
+        self._lock = threading.Lock()
+        self._watching = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self._watching.wait()
+            if self._stop.wait(self.interval):
+                return
+            self.sample()
+
+    def sample(self):
+        rss = current_rss_bytes()
+        if rss is None:
+            return
+        with self._lock:
+            for token, peak in self._peaks.items():
+                if rss > peak:
+                    self._peaks[token] = rss
+
+    def watch(self):
+        token = object()
+        with self._lock:
+            self._peaks[token] = current_rss_bytes() or 0
+            self._watching.set()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample, name="RssSampler", daemon=True)
+            self._thread.start()
+        return token
+
+    def unwatch(self, token):
+        self.sample()
+        with self._lock:
+            peak = self._peaks.pop(token)
+            if not self._peaks:
+                self._watching.clear()
+        return peak
+
+    def stop(self):
+        self._stop.set()
+        self._watching.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class StackSampler:
+    """
+    Minimal sampling profiler for one thread (the calling one by default).
+
+    While active, a background thread looks at the target thread's stack
+    every ``interval`` seconds and counts the function on top (``self``)
+    and every function on the stack (``total``). Cheap enough to leave on
+    for a whole stage; ``summary`` lists the hottest functions.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = 0
+        self.self_counts = collections.Counter()
+        self.total_counts = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            seen = set()
+            top = True
+            while frame is not None:
+                code = frame.f_code
+                location = f"{code.co_filename}:{code.co_firstlineno} {code.co_name}"
+                if top:
+                    self.self_counts[location] += 1
+                    top = False
+                if location not in seen:
+                    self.total_counts[location] += 1
+                    seen.add(location)
+                frame = frame.f_back
+
+    def start(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="StackSampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def summary(self, top=15):
+        def rows(counts):
+            return [
+                {"function": location, "samples": count, "share": count / self.samples}
+                for location, count in counts.most_common(top)
+            ]
+        return {
+            "samples": self.samples,
+            "interval": self.interval,
+            "self": rows(self.self_counts) if self.samples else [],
+            "total": rows(self.total_counts) if self.samples else [],
+        }
+
+
+class StageRecord:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.items = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_bytes = None
+        self.peak_traced_bytes = None
+        self.profiler = None
+
+    def add(self, wall_seconds, cpu_seconds, items=0):
+        self.calls += 1
+        self.items += items
+        self.wall_seconds += wall_seconds
+        self.cpu_seconds += cpu_seconds
+
+    def as_dict(self):
+        record = {
+            "calls": self.calls,
+            "items": self.items,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "items_per_second": self.items / self.wall_seconds if self.wall_seconds else 0.0,
+            "peak_rss_bytes": self.peak_rss_bytes,
+        }
+        if self.peak_traced_bytes is not None:
+            record["peak_traced_bytes"] = self.peak_traced_bytes
+        if self.profiler is not None and hasattr(self.profiler, "summary"):
+            record["profile"] = self.profiler.summary()
+        return record
+
+
+class RunProfiler:
+    """
+    Per-stage instrumentation of a pipeline run.
+
+    Wrap each stage in ``with profiler.stage(name, items)`` (the yielded
+    record's ``items`` can also be set inside); entering the same stage again
+    (one chunk at a time) accumulates. Per stage it keeps the wall time,
+    the process CPU time (all threads, so worker pools count), items
+    processed and their rate, and the peak RSS while the stage ran
+    (sampled by ``RssSampler``; where ``/proc`` is missing, the process
+    peak so far at the end of the stage). Time measured elsewhere (e.g. on
+    a background thread) is added with ``record``; the record's
+    ``exclude(wall_seconds, cpu_seconds)`` takes time that belongs to
+    another stage out of this one.
+
+    ``trace_memory`` also records the peak of memory allocated during each
+    stage with ``tracemalloc`` (Python and NumPy allocations; slower).
+    ``profile_stages`` names stages to run a sampling profiler on, made by
+    ``profiler_factory(stage_name)``: any context manager, with an optional
+    ``summary()`` that goes into the report (``StackSampler`` by default).
+
+    ``close()`` (or leaving a ``with RunProfiler() as profiler`` block)
+    stops the RSS sampler thread and the tracemalloc started here.
+    """
+
+    def __init__(self, profile_stages=(), profiler_factory=None, trace_memory=False):
+        self.profile_stages = set(profile_stages or ())
+        self.profiler_factory = profiler_factory or (lambda name: StackSampler())
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._rss = RssSampler()
+        self._started_tracemalloc = trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start()
+
+    def _record(self, name):
+        if name not in self.stages:
+            self.stages[name] = StageRecord(name)
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name, items=0):
+        record = self._record(name)
+        profiler = None
+        if name in self.profile_stages:
+            profiler = record.profiler or self.profiler_factory(name)
+            record.profiler = profiler
+            profiler.__enter__()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        counter = _ItemCounter(items)
+        rss_token = self._rss.watch() if self._rss.available else None
+        start, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield counter
+        finally:
+            record.add(
+                time.perf_counter() - start - counter.excluded_wall_seconds,
+                time.process_time() - start_cpu - counter.excluded_cpu_seconds,
+                counter.items,
+            )
+            if profiler is not None:
+                profiler.__exit__(None, None, None)
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                record.peak_traced_bytes = max(record.peak_traced_bytes or 0, peak)
+            rss = self._rss.unwatch(rss_token) if rss_token is not None else peak_rss_bytes()
+            if rss is not None:
+                record.peak_rss_bytes = max(record.peak_rss_bytes or 0, rss)
+
+    def timed_iter(self, name, iterable, count=None):
+        """
+        Yield from ``iterable``, timing each ``next`` as stage ``name``
+        (decoding, reading). ``count(item)`` gives the items per element.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as counter:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                counter.items = count(item) if count is not None else 1
+            yield item
+
+    def close(self):
+        self._rss.stop()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def record(self, name, wall_seconds, cpu_seconds=0.0, items=0):
+        self._record(name).add(wall_seconds, cpu_seconds, items)
+
+    def report(self):
+        wall_seconds = time.perf_counter() - self._start
+        return {
+            "started_at": self.started_at,
+            "wall_seconds": wall_seconds,
+            "cpu_seconds": time.process_time() - self._start_cpu,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "stages": {name: record.as_dict() for name, record in self.stages.items()},
+        }
+
+    def write_json(self, path, extra=None):
+        report = dict(extra or {}, **self.report())
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def write_prometheus(self, path, labels=None, prefix="football_pipeline"):
+        """
+        Write the report in the Prometheus text exposition format (for the
+        node exporter's textfile collector or a push gateway).
+        """
+        report = self.report()
+        labels = dict(labels or {})
+
+        def label_text(extra=None):
+            items = dict(labels, **(extra or {}))
+            if not items:
+                return ""
+            escaped = (
+                f'{key}="{_escape_label(value)}"' for key, value in sorted(items.items())
+            )
+            return "{" + ",".join(escaped) + "}"
+
+        lines = []
+
+        def metric(name, help_text, samples):
+            samples = [(extra, value) for extra, value in samples if value is not None]
+            if not samples:
+                return
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            for extra, value in samples:
+                lines.append(f"{prefix}_{name}{label_text(extra)} {float(value)!r}")
+
+        stages = report["stages"]
+        metric("run_wall_seconds", "Wall-clock seconds of the whole run.",
+               [(None, report["wall_seconds"])])
+        metric("run_cpu_seconds", "Process CPU seconds of the whole run.",
+               [(None, report["cpu_seconds"])])
+        metric("run_peak_rss_bytes", "Peak resident memory of the process.",
+               [(None, report["peak_rss_bytes"])])
+        for key, help_text in (
+            ("wall_seconds", "Wall-clock seconds spent in the stage."),
+            ("cpu_seconds", "Process CPU seconds spent in the stage (all threads)."),
+            ("items", "Items (frames) processed by the stage."),
+            ("items_per_second", "Stage throughput in items per wall-clock second."),
+            ("peak_rss_bytes", "Peak resident memory of the process while the stage ran."),
+            ("peak_traced_bytes", "Peak memory allocated during the stage (tracemalloc)."),
+        ):
+            metric(f"stage_{key}", help_text,
+                   [({"stage": name}, stage.get(key)) for name, stage in stages.items()])
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+
+class _ItemCounter:
+    def __init__(self, items=0):
+        self.items = items
+        self.excluded_wall_seconds = 0.0
+        self.excluded_cpu_seconds = 0.0
+
+    def exclude(self, wall_seconds, cpu_seconds=0.0):
+        self.excluded_wall_seconds += wall_seconds
+        self.excluded_cpu_seconds += cpu_seconds
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
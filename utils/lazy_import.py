@@ -0,0 +1,27 @@
+import importlib
+import sys
+
+
+def lazy_exports(package, exports):
+    """
+    Module ``__getattr__`` and ``__dir__`` (PEP 562) for a package whose
+    names are imported on first access.
+
+    ``exports`` maps each public name to the module defining it, so
+    ``import trackers`` stays cheap and ``trackers.Tracker`` (or
+    ``from trackers import Tracker``) imports ``trackers.tracker`` and its
+    heavy dependencies only then. The value is cached on the package, so
+    later lookups are plain attribute reads.
+    """
+    def __getattr__(name):
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__
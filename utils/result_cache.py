@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .track_store import TrackStore
+
+
+# Bump when the layout of cached arrays changes.
+CACHE_FORMAT_VERSION = 1
+# Bump when a pipeline run's outputs change for the same inputs.
+RUN_KEY_VERSION = 1
+
+_file_hashes = {}
+
+
+def hash_file(path, block_size=1 << 20):
+    """SHA-256 of a file's content, memoized per (path, size, mtime)."""
+    stat = os.stat(path)
+    memo_key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        _file_hashes[memo_key] = digest.hexdigest()
+    return _file_hashes[memo_key]
+
+
+def run_key(video_hash, model_path=None, params=None):
+    """
+    Hash of everything a whole pipeline run's output depends on: the
+    video's content hash, the detector weights (when the file exists) and
+    the run's settings. Batch results and queued jobs are keyed by it.
+    """
+    description = {
+        "version": RUN_KEY_VERSION,
+        "video": video_hash,
+        "model": hash_file(model_path) if model_path and os.path.exists(model_path) else None,
+        "params": params or {},
+    }
+    encoded = json.dumps(description, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of stage results, keyed by content rather than by path.
+
+    Keys are built from the stage name, the SHA-256 of the input video and
+    of any model weights, and the stage parameters, so a different upload
+    or a retrained model can never hit another run's entry. Entries are
+    ``.npz`` files written atomically (temp file + ``os.replace``) and read
+    with ``allow_pickle=False``. Reads bump the file's mtime, and writes
+    evict the least recently used entries once the cache exceeds
+    ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, stage, video_path, model_paths=(), params=None):
+        description = {
+            "format": CACHE_FORMAT_VERSION,
+            "stage": stage,
+            "video": hash_file(video_path),
+            "models": [hash_file(path) for path in model_paths],
+            "params": params or {},
+        }
+        encoded = json.dumps(description, sort_keys=True, default=str).encode()
+        return f"{stage}-{hashlib.sha256(encoded).hexdigest()}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get_arrays(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+        except Exception:
+            # Truncated or corrupt entry: drop it and recompute.
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return arrays
+
+    def put_arrays(self, key, arrays):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def get_tracks(self, key):
+        arrays = self.get_arrays(key)
+        if arrays is None:
+            return None
+        store = TrackStore(
+            arrays["frame"],
+            arrays["object_class"],
+            arrays["track_id"],
+            arrays["bbox"],
+            int(arrays["num_frames"]),
+        )
+        return store.to_tracks()
+
+    def put_tracks(self, key, tracks):
+        store = TrackStore.from_tracks(tracks)
+        self.put_arrays(key, {
+            "frame": store.frame,
+            "object_class": store.object_class,
+            "track_id": store.track_id,
+            "bbox": store.bbox,
+            "num_frames": np.array(store.num_frames),
+        })
+
+    def get_camera_movement(self, key):
+        arrays = self.get_arrays(key)
+        if arrays is None:
+            return None
+        return arrays["camera_movement"].tolist()
+
+    def put_camera_movement(self, key, camera_movement):
+        self.put_arrays(key, {
+            "camera_movement": np.asarray(camera_movement, dtype=np.float32).reshape(-1, 2),
+        })
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
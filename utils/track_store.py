@@ -0,0 +1,270 @@
+from collections.abc import Mapping, MutableMapping, Sequence
+
+import numpy as np
+
+
+OBJECT_CLASSES = ("players", "referees", "ball")
+
+# Float columns: name -> width (1 for scalars). Missing values are NaN.
+FLOAT_COLUMNS = {
+    "position": 2,
+    "position_adjusted": 2,
+    "position_transformed": 2,
+    "speed": 1,
+    "distance": 1,
+}
+
+
+class TrackStore(Mapping):
+    """
+    Columnar storage for object tracks.
+
+    Every detection is one row. Rows are sorted by frame, and
+    ``frame_offsets[f]:frame_offsets[f + 1]`` is the slice of rows belonging to
+    frame ``f``. Columns:
+
+      - ``frame`` (int32), ``object_class`` (int8, index into
+        ``OBJECT_CLASSES``), ``track_id`` (int32), ``bbox`` (N, 4 float32)
+      - ``position``, ``position_adjusted``, ``position_transformed``
+        (N, 2 float32) and ``speed``, ``distance`` (N float32), NaN when unset
+      - ``team`` (int8, 0 when unset), ``has_ball`` and ``interpolated``
+        (bool, ball boxes filled in by interpolation)
+
+    The store also behaves like the old ``tracks`` dict, so
+    ``store["players"][frame_num][track_id]["bbox"]`` and friends keep working
+    for code that has not been vectorized.
+    """
+
+    def __init__(self, frame, object_class, track_id, bbox, num_frames=None):
+        frame = np.asarray(frame, dtype=np.int32)
+        order = np.argsort(frame, kind="stable")
+
+        self.frame = frame[order]
+        self.object_class = np.asarray(object_class, dtype=np.int8)[order]
+        self.track_id = np.asarray(track_id, dtype=np.int32)[order]
+        self.bbox = np.asarray(bbox, dtype=np.float32).reshape(-1, 4)[order]
+
+        n = len(self.frame)
+        for name, width in FLOAT_COLUMNS.items():
+            shape = (n,) if width == 1 else (n, width)
+            setattr(self, name, np.full(shape, np.nan, dtype=np.float32))
+        self.team = np.zeros(n, dtype=np.int8)
+        self.has_ball = np.zeros(n, dtype=bool)
+        self.interpolated = np.zeros(n, dtype=bool)
+
+        if num_frames is None:
+            num_frames = int(self.frame[-1]) + 1 if n else 0
+        self.num_frames = num_frames
+        self.frame_offsets = np.searchsorted(
+            self.frame, np.arange(num_frames + 1), side="left"
+        ).astype(np.int64)
+
+        self.team_colors = {}
+        # Non-columnar values set through the dict view: row -> {key: value}.
+        self.extras = {}
+
+    @classmethod
+    def from_tracks(cls, tracks):
+        frames, classes, track_ids, bboxes, infos = [], [], [], [], []
+        num_frames = 0
+        for class_index, object_name in enumerate(OBJECT_CLASSES):
+            object_tracks = tracks.get(object_name, [])
+            num_frames = max(num_frames, len(object_tracks))
+            for frame_num, frame_tracks in enumerate(object_tracks):
+                for track_id, track_info in frame_tracks.items():
+                    bbox = track_info.get("bbox")
+                    if bbox is None or len(bbox) != 4:
+                        bbox = [np.nan] * 4
+                    frames.append(frame_num)
+                    classes.append(class_index)
+                    track_ids.append(track_id)
+                    bboxes.append([np.nan if v is None else v for v in bbox])
+                    infos.append(track_info)
+
+        bboxes = np.array(bboxes, dtype=np.float32).reshape(-1, 4)
+        store = cls(frames, classes, track_ids, bboxes, num_frames)
+
+        # Carry over anything already computed on the dicts, using the same
+        # stable frame order the constructor applied.
+        order = np.argsort(np.asarray(frames, dtype=np.int32), kind="stable")
+        for row, source_index in enumerate(order.tolist()):
+            for key, value in infos[source_index].items():
+                if key != "bbox" and value is not None:
+                    store.set_value(row, key, value)
+        return store
+
+    def to_tracks(self):
+        tracks = {name: [{} for _ in range(self.num_frames)] for name in OBJECT_CLASSES}
+        for object_name in OBJECT_CLASSES:
+            object_view = self[object_name]
+            for frame_num in range(self.num_frames):
+                tracks[object_name][frame_num] = {
+                    track_id: dict(detection.items())
+                    for track_id, detection in object_view[frame_num].items()
+                }
+        return tracks
+
+    def __len__(self):
+        return len(OBJECT_CLASSES)
+
+    def __iter__(self):
+        return iter(OBJECT_CLASSES)
+
+    def __getitem__(self, object_name):
+        if object_name not in OBJECT_CLASSES:
+            raise KeyError(object_name)
+        return _ObjectTracksView(self, OBJECT_CLASSES.index(object_name))
+
+    @property
+    def num_rows(self):
+        return len(self.frame)
+
+    @property
+    def nbytes(self):
+        columns = [self.frame, self.object_class, self.track_id, self.bbox, self.team,
+                   self.has_ball, self.interpolated, self.frame_offsets]
+        columns += [getattr(self, name) for name in FLOAT_COLUMNS]
+        return sum(column.nbytes for column in columns)
+
+    def frame_slice(self, frame_num):
+        return slice(int(self.frame_offsets[frame_num]), int(self.frame_offsets[frame_num + 1]))
+
+    def frame_range_slice(self, start_frame, end_frame):
+        return slice(int(self.frame_offsets[start_frame]), int(self.frame_offsets[end_frame]))
+
+    def class_mask(self, object_name):
+        return self.object_class == OBJECT_CLASSES.index(object_name)
+
+    def get_value(self, row, key):
+        if key == "bbox":
+            return self.bbox[row].tolist()
+        if key in FLOAT_COLUMNS:
+            value = getattr(self, key)[row]
+            if np.isnan(value).any():
+                return None
+            if FLOAT_COLUMNS[key] == 1:
+                return float(value)
+            if key == "position_transformed":
+                return value.tolist()
+            return tuple(value.tolist())
+        if key == "team":
+            return int(self.team[row]) if self.team[row] else None
+        if key == "team_color":
+            team = int(self.team[row])
+            return self.team_colors.get(team) if team else None
+        if key == "has_ball":
+            return True if self.has_ball[row] else None
+        if key == "interpolated":
+            return True if self.interpolated[row] else None
+        return self.extras.get(row, {}).get(key)
+
+    def set_value(self, row, key, value):
+        if key == "bbox":
+            self.bbox[row] = value
+        elif key in FLOAT_COLUMNS:
+            getattr(self, key)[row] = np.nan if value is None else value
+        elif key == "team":
+            self.team[row] = value or 0
+        elif key == "team_color":
+            team = int(self.team[row])
+            if team:
+                self.team_colors.setdefault(team, value)
+            else:
+                self.extras.setdefault(row, {})[key] = value
+        elif key == "has_ball":
+            self.has_ball[row] = bool(value)
+        elif key == "interpolated":
+            self.interpolated[row] = bool(value)
+        else:
+            self.extras.setdefault(row, {})[key] = value
+
+    def row_keys(self, row):
+        keys = ["bbox"]
+        keys += [key for key in FLOAT_COLUMNS if not np.isnan(getattr(self, key)[row]).any()]
+        if self.team[row]:
+            keys.append("team")
+            if int(self.team[row]) in self.team_colors:
+                keys.append("team_color")
+        if self.has_ball[row]:
+            keys.append("has_ball")
+        if self.interpolated[row]:
+            keys.append("interpolated")
+        keys += list(self.extras.get(row, {}))
+        return keys
+
+
+class _ObjectTracksView(Sequence):
+    def __init__(self, store, class_index):
+        self._store = store
+        self._class_index = class_index
+
+    def __len__(self):
+        return self._store.num_frames
+
+    def __getitem__(self, frame_num):
+        if isinstance(frame_num, slice):
+            return [self[i] for i in range(*frame_num.indices(len(self)))]
+        if frame_num < 0:
+            frame_num += len(self)
+        if not 0 <= frame_num < len(self):
+            raise IndexError(frame_num)
+        rows = self._store.frame_slice(frame_num)
+        mask = self._store.object_class[rows] == self._class_index
+        return _FrameView(self._store, np.flatnonzero(mask) + rows.start)
+
+
+class _FrameView(Mapping):
+    def __init__(self, store, rows):
+        self._store = store
+        self._rows = rows
+
+    def _row(self, track_id):
+        matches = self._rows[self._store.track_id[self._rows] == track_id]
+        if len(matches) == 0:
+            raise KeyError(track_id)
+        return int(matches[0])
+
+    def __getitem__(self, track_id):
+        return _DetectionView(self._store, self._row(track_id))
+
+    def __iter__(self):
+        return iter(self._store.track_id[self._rows].tolist())
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __repr__(self):
+        return repr({track_id: dict(detection) for track_id, detection in self.items()})
+
+
+class _DetectionView(MutableMapping):
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key):
+        value = self._store.get_value(self._row, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._store.set_value(self._row, key, value)
+
+    def __delitem__(self, key):
+        extras = self._store.extras.get(self._row, {})
+        if key in extras:
+            del extras[key]
+        elif key == "bbox" or key not in self:
+            raise KeyError(key)
+        else:
+            self._store.set_value(self._row, key, None)
+
+    def __iter__(self):
+        return iter(self._store.row_keys(self._row))
+
+    def __len__(self):
+        return len(self._store.row_keys(self._row))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
@@ -0,0 +1,412 @@
+import json
+import queue
+import shutil
+import subprocess
+import threading
+from fractions import Fraction
+
+import cv2
+import numpy as np
+
+
+DEFAULT_FPS = 24.0
+
+# "opencv" is always available; "pyav" needs the ``av`` package and "ffmpeg"
+# the ffmpeg/ffprobe binaries. "auto" picks PyAV when it is installed.
+DECODER_BACKENDS = ("opencv", "pyav", "ffmpeg")
+
+# Queue sentinel marking the end of prefetched frames.
+_END = object()
+
+
+def _pyav():
+    try:
+        import av  # type: ignore
+    except ImportError:
+        raise ImportError("PyAV is required for the 'pyav' decoder. Install it with `pip install av`.")
+    return av
+
+
+def _ffmpeg_binary(name):
+    path = shutil.which(name)
+    if path is None:
+        raise RuntimeError(f"{name} is required for the 'ffmpeg' decoder but was not found on PATH.")
+    return path
+
+
+def available_decoders():
+    backends = ["opencv"]
+    try:
+        _pyav()
+        backends.append("pyav")
+    except ImportError:
+        pass
+    if shutil.which("ffmpeg") and shutil.which("ffprobe"):
+        backends.append("ffmpeg")
+    return backends
+
+
+def resolve_decoder(backend=None):
+    """The backend ``open_decoder`` uses for ``backend`` (None or ``'auto'`` included)."""
+    if backend in (None, "auto"):
+        return "pyav" if "pyav" in available_decoders() else "opencv"
+    if backend not in DECODER_BACKENDS:
+        raise ValueError(f"Unknown decoder backend {backend!r}; expected one of {DECODER_BACKENDS}")
+    return backend
+
+
+def _clean_properties(fps, width, height, frame_count, duration):
+    # Some containers report 0 or absurd values; fall back to the old default.
+    if not fps or fps != fps or fps <= 0 or fps > 1000:
+        fps = DEFAULT_FPS
+    frame_count = max(0, int(frame_count or 0))
+    if not frame_count and duration:
+        frame_count = int(round(duration * fps))
+    return {
+        "fps": float(fps),
+        "frame_size": (int(width or 0), int(height or 0)),
+        "frame_count": frame_count,
+        "duration": float(duration) if duration else frame_count / fps,
+    }
+
+
+class VideoDecoder:
+    """
+    Frames of a video, one at a time, from one of ``DECODER_BACKENDS``
+    (see ``open_decoder``).
+
+    ``properties`` (fps, frame size, frame count, duration) come from the
+    container when the decoder is opened, before anything is decoded.
+    ``size`` (width, height) resizes and ``grayscale`` converts each frame
+    as it is decoded; ``threads`` sets the codec's decoding threads (None
+    or 0 lets the backend choose). ``read`` returns the next frame (None
+    at the end), ``seek``/``seek_time`` move to a frame index or a time,
+    and ``frames`` iterates over a range.
+    """
+
+    backend = None
+
+    def __init__(self, video_path, size=None, grayscale=False, threads=None):
+        self.video_path = video_path
+        self.size = tuple(size) if size is not None else None
+        self.grayscale = grayscale
+        self.threads = threads
+        # Index of the frame the next ``read`` returns.
+        self.position = 0
+        self.properties = self._open()
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _read(self):
+        raise NotImplementedError
+
+    def _seek(self, frame_index):
+        raise NotImplementedError
+
+    def _release(self):
+        pass
+
+    def _convert(self, frame):
+        # For backends that cannot resize or convert while decoding.
+        if self.grayscale and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.size is not None and (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return frame
+
+    def read(self):
+        frame = self._read()
+        if frame is not None:
+            self.position += 1
+        return frame
+
+    def seek(self, frame_index):
+        frame_index = max(0, int(frame_index))
+        if frame_index != self.position:
+            self._seek(frame_index)
+            self.position = frame_index
+
+    def seek_time(self, seconds):
+        self.seek(round(seconds * self.properties["fps"]))
+
+    def frames(self, start=None, end=None, prefetch=0):
+        """
+        Yield frames ``start:end`` (from the current position to the end of
+        the video by default). With ``prefetch`` > 0 they are decoded on a
+        background thread up to ``prefetch`` frames ahead, so decoding
+        overlaps with whatever the caller does with each frame.
+        """
+        if start is not None:
+            self.seek(start)
+        if prefetch > 0:
+            yield from _prefetch(self._frames_until(end), prefetch)
+        else:
+            yield from self._frames_until(end)
+
+    def _frames_until(self, end):
+        while end is None or self.position < end:
+            frame = self.read()
+            if frame is None:
+                break
+            yield frame
+
+    def __iter__(self):
+        return self.frames()
+
+    def close(self):
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class OpenCVDecoder(VideoDecoder):
+    """``cv2.VideoCapture``; resizing and grayscale are applied after decoding."""
+
+    backend = "opencv"
+
+    def _open(self):
+        self._cap = None
+        if self.threads:
+            self._cap = cv2.VideoCapture(
+                self.video_path, cv2.CAP_ANY, [cv2.CAP_PROP_N_THREADS, int(self.threads)]
+            )
+        # Backends that do not take the thread count refuse to open with it.
+        if self._cap is None or not self._cap.isOpened():
+            self._cap = cv2.VideoCapture(self.video_path)
+        if not self._cap.isOpened():
+            return _clean_properties(0, 0, 0, 0, 0)
+        fps = self._cap.get(cv2.CAP_PROP_FPS)
+        return _clean_properties(
+            fps,
+            self._cap.get(cv2.CAP_PROP_FRAME_WIDTH),
+            self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT),
+            self._cap.get(cv2.CAP_PROP_FRAME_COUNT),
+            0,
+        )
+
+    def _read(self):
+        ret, frame = self._cap.read()
+        return self._convert(frame) if ret else None
+
+    def _seek(self, frame_index):
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+
+    def _release(self):
+        self._cap.release()
+
+
+class PyAVDecoder(VideoDecoder):
+    """
+    PyAV (FFmpeg's libraries in-process). Frame and slice threading are
+    enabled; resizing and the pixel-format conversion happen in swscale
+    as each frame is decoded.
+    """
+
+    backend = "pyav"
+
+    def _open(self):
+        av = _pyav()
+        self._container = None
+        try:
+            self._container = av.open(self.video_path)
+            self._stream = self._container.streams.video[0]
+        except (av.FFmpegError, IndexError):
+            self._release()
+            return _clean_properties(0, 0, 0, 0, 0)
+        self._stream.thread_type = "AUTO"
+        if self.threads:
+            self._stream.thread_count = int(self.threads)
+        self._decoded = None
+        # Frames before this pts are skipped after a seek, which lands on the
+        # keyframe before the target.
+        self._skip_before_pts = None
+
+        stream = self._stream
+        fps = float(stream.average_rate or stream.guessed_rate or 0)
+        duration = None
+        if stream.duration is not None and stream.time_base is not None:
+            duration = float(stream.duration * stream.time_base)
+        elif self._container.duration is not None:
+            duration = self._container.duration / av.time_base
+        return _clean_properties(
+            fps, stream.codec_context.width, stream.codec_context.height, stream.frames, duration
+        )
+
+    def _read(self):
+        if self._container is None:
+            return None
+        if self._decoded is None:
+            self._decoded = self._container.decode(self._stream)
+        for frame in self._decoded:
+            if self._skip_before_pts is not None:
+                if frame.pts is not None and frame.pts < self._skip_before_pts:
+                    continue
+                self._skip_before_pts = None
+            width, height = self.size if self.size is not None else (frame.width, frame.height)
+            return frame.reformat(
+                width=width, height=height, format="gray" if self.grayscale else "bgr24",
+                interpolation="AREA",
+            ).to_ndarray()
+        return None
+
+    def _seek(self, frame_index):
+        if self._container is None:
+            return
+        stream = self._stream
+        frame_pts = 1 / self.properties["fps"] / float(stream.time_base)
+        target_pts = (stream.start_time or 0) + int(round(frame_index * frame_pts))
+        self._container.seek(target_pts, stream=stream, backward=True, any_frame=False)
+        self._decoded = None
+        # Half a frame of slack for timestamps that are not exact multiples.
+        self._skip_before_pts = target_pts - int(frame_pts / 2)
+
+    def _release(self):
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+
+
+class FFmpegDecoder(VideoDecoder):
+    """
+    An ``ffmpeg`` process piping raw frames. Decoding, scaling and the
+    pixel-format conversion run in that process, so they overlap with the
+    caller's work; seeking restarts it at the target time.
+    """
+
+    backend = "ffmpeg"
+
+    def _open(self):
+        self._process = None
+        command = [
+            _ffmpeg_binary("ffprobe"), "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=width,height,avg_frame_rate,r_frame_rate,nb_frames,duration"
+            ":format=duration",
+            "-of", "json", self.video_path,
+        ]
+        try:
+            probe = json.loads(subprocess.run(command, capture_output=True, check=True).stdout)
+            stream = probe["streams"][0]
+        except (subprocess.CalledProcessError, ValueError, KeyError, IndexError):
+            return _clean_properties(0, 0, 0, 0, 0)
+
+        def rate(value):
+            try:
+                return float(Fraction(value)) if value else 0
+            except (ValueError, ZeroDivisionError):
+                return 0
+
+        fps = rate(stream.get("avg_frame_rate")) or rate(stream.get("r_frame_rate"))
+        duration = stream.get("duration") or probe.get("format", {}).get("duration")
+        return _clean_properties(
+            fps, stream.get("width"), stream.get("height"), stream.get("nb_frames"),
+            float(duration) if duration else None,
+        )
+
+    def _output_shape(self):
+        width, height = self.size or self.properties["frame_size"]
+        return (height, width) if self.grayscale else (height, width, 3)
+
+    def _start(self, frame_index):
+        self._release()
+        command = [_ffmpeg_binary("ffmpeg"), "-v", "error", "-nostdin"]
+        if self.threads:
+            command += ["-threads", str(int(self.threads))]
+        if frame_index:
+            command += ["-ss", f"{frame_index / self.properties['fps']:.6f}"]
+        command += ["-i", self.video_path, "-map", "0:v:0", "-vsync", "0"]
+        if self.size is not None:
+            command += ["-vf", f"scale={self.size[0]}:{self.size[1]}:flags=area"]
+        command += ["-f", "rawvideo", "-pix_fmt", "gray" if self.grayscale else "bgr24", "-"]
+        self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def _read(self):
+        if not self.properties["frame_size"][0]:
+            return None
+        if self._process is None:
+            self._start(self.position)
+        shape = self._output_shape()
+        buffer = bytearray(int(np.prod(shape)))
+        if self._process.stdout.readinto(buffer) != len(buffer):
+            return None
+        return np.frombuffer(buffer, dtype=np.uint8).reshape(shape)
+
+    def _seek(self, frame_index):
+        # Started lazily by the next read.
+        self._release()
+
+    def _release(self):
+        if self._process is not None:
+            self._process.stdout.close()
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+
+
+_DECODERS = {decoder.backend: decoder for decoder in (OpenCVDecoder, PyAVDecoder, FFmpegDecoder)}
+
+
+def open_decoder(video_path, backend=None, size=None, grayscale=False, threads=None):
+    """A ``VideoDecoder`` for ``video_path`` on ``backend`` (see ``resolve_decoder``)."""
+    return _DECODERS[resolve_decoder(backend)](video_path, size=size, grayscale=grayscale, threads=threads)
+
+
+def probe_video(video_path, backend=None):
+    """
+    ``fps``, ``frame_size`` (width, height), ``frame_count`` and
+    ``duration`` from the container, without decoding the video.
+    ``has_frames`` tells whether there is anything to decode: it is the
+    frame count, except that a container without one (or one that could
+    not be opened) has its first frame decoded to find out.
+    """
+    with open_decoder(video_path, backend) as decoder:
+        properties = dict(decoder.properties, backend=decoder.backend)
+        properties["has_frames"] = bool(properties["frame_count"]) or decoder.read() is not None
+    return properties
+
+
+def _prefetch(frames, depth):
+    """Run the ``frames`` iterator on a background thread, ``depth`` frames ahead."""
+    frame_queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    error = []
+
+    def decode():
+        try:
+            for frame in frames:
+                while not stop.is_set():
+                    try:
+                        frame_queue.put(frame, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except Exception as e:  # re-raised in the consuming thread
+            error.append(e)
+        finally:
+            frame_queue.put(_END)
+
+    thread = threading.Thread(target=decode, name="VideoDecoder", daemon=True)
+    thread.start()
+    try:
+        while True:
+            frame = frame_queue.get()
+            if frame is _END:
+                break
+            yield frame
+        if error:
+            raise error[0]
+    finally:
+        stop.set()
+        # Unblock the final put() if the queue is full.
+        while thread.is_alive():
+            try:
+                frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        thread.join()
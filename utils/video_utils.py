@@ -1,26 +1,242 @@
+import os
+import queue
+import threading
+import time
+
 import cv2
 
-def read_video(video_path):
-    cap = cv2.VideoCapture(video_path)
-    frames = []
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
-    return frames
-
-def save_video(ouput_video_frames,output_video_path):
+from .video_decoder import DEFAULT_FPS, open_decoder, probe_video
+
+
+# Queue sentinel telling the encoder thread to finish.
+_STOP = object()
+
+
+def iter_video(video_path, start=0, end=None, backend=None, size=None, grayscale=False, threads=None,
+               prefetch=0):
+    """
+    Yield frames ``start:end`` one at a time instead of decoding the whole
+    video up front. ``backend``, ``size``, ``grayscale`` and ``threads`` go
+    to ``open_decoder``; ``prefetch`` to ``VideoDecoder.frames``. The
+    default backend is OpenCV.
+    """
+    with open_decoder(video_path, backend or "opencv", size=size, grayscale=grayscale,
+                      threads=threads) as decoder:
+        yield from decoder.frames(start, end, prefetch=prefetch)
+
+
+def read_video(video_path, backend=None, **decoder_kwargs):
+    return list(iter_video(video_path, backend=backend, **decoder_kwargs))
+
+
+class FrameSource:
+    """
+    Iterator over decoded frames that times its own decoding and can keep
+    what it yields.
+
+    The consumer may be another thread (the ``DetectionPipeline`` decode
+    thread), so ``seconds``/``cpu_seconds`` are the wall and thread CPU
+    time spent in the underlying iterator. Frames are appended to ``keep``
+    when it is a list; ``peek`` decodes the next frame without consuming it.
+    """
+
+    def __init__(self, frames, keep=None):
+        self._frames = iter(frames)
+        self._peeked = []
+        self.keep = keep
+        self.count = 0
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    def _decode(self):
+        start, start_cpu = time.perf_counter(), time.thread_time()
+        frame = next(self._frames, None)
+        self.seconds += time.perf_counter() - start
+        self.cpu_seconds += time.thread_time() - start_cpu
+        return frame
+
+    def peek(self):
+        if not self._peeked:
+            frame = self._decode()
+            if frame is None:
+                return None
+            self._peeked.append(frame)
+        return self._peeked[0]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        frame = self._peeked.pop() if self._peeked else self._decode()
+        if frame is None:
+            raise StopIteration
+        self.count += 1
+        if self.keep is not None:
+            self.keep.append(frame)
+        return frame
+
+
+def iter_chunks(frames, chunk_size):
+    """Group any iterable of frames into lists of at most ``chunk_size`` frames."""
+    chunk_size = max(1, int(chunk_size))
+    chunk = []
+    for frame in frames:
+        chunk.append(frame)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def get_chunk_size(frame, memory_budget_mb, copies_per_frame=4):
+    """
+    Number of frames that fit in ``memory_budget_mb`` given a sample frame.
+
+    Each frame in a chunk is held a few times at once (decoded frame, the
+    copies made while annotating and the writer queue), hence
+    ``copies_per_frame``.
+    """
+    frame_bytes = max(1, frame.nbytes * copies_per_frame)
+    return max(1, int(memory_budget_mb * 1024 * 1024 // frame_bytes))
+
+
+def get_video_properties(video_path, backend=None):
+    """Return ``fps``, ``frame_size`` (width, height) and ``frame_count`` from the container."""
+    return probe_video(video_path, backend or "opencv")
+
+
+def open_video_writer(output_video_path, frame_size, fps=DEFAULT_FPS):
+    width, height = frame_size
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
+    if not out.isOpened():
+        return None
+    return out
+
+
+class VideoWriter:
+    """
+    Frame-by-frame video writer that encodes on a background thread.
+
+    Frames passed to ``write`` go through a bounded queue, so rendering can
+    carry on while the previous frames are being encoded, and memory stays
+    capped at ``queue_size`` frames. Use ``close`` to flush and finish the
+    file, or ``abort`` to drop pending frames and remove the partial output.
+    If ``frame_size`` is not given it is taken from the first frame.
+    """
+
+    def __init__(self, output_video_path, fps=DEFAULT_FPS, frame_size=None, queue_size=32):
+        self.output_video_path = output_video_path
+        self.fps = fps
+        self.frame_size = frame_size
+        self.frames_written = 0
+        # Time the encoder thread spent in the codec (wall and its own CPU).
+        self.encode_seconds = 0.0
+        self.encode_cpu_seconds = 0.0
+
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._writer = None
+        self._thread = None
+        self._error = None
+        self._aborted = False
+        self._closed = False
+
+        if frame_size is not None:
+            self._open(frame_size)
+
+    def _open(self, frame_size):
+        self._writer = open_video_writer(self.output_video_path, frame_size, self.fps)
+        if self._writer is None:
+            raise IOError(f"Could not open video writer for: {self.output_video_path}")
+        self.frame_size = tuple(frame_size)
+        self._thread = threading.Thread(target=self._encode_loop, name="VideoWriter", daemon=True)
+        self._thread.start()
+
+    def _encode_loop(self):
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is _STOP:
+                    break
+                # Keep draining after a failure so writers never block on put().
+                if self._aborted or self._error is not None:
+                    continue
+                start, start_cpu = time.perf_counter(), time.thread_time()
+                try:
+                    self._writer.write(frame)
+                except Exception as e:  # surfaced on the next write/close
+                    self._error = e
+                    continue
+                self.encode_seconds += time.perf_counter() - start
+                self.encode_cpu_seconds += time.thread_time() - start_cpu
+                self.frames_written += 1
+        finally:
+            self._writer.release()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise IOError(f"Error while writing {self.output_video_path}") from self._error
+
+    def write(self, frame):
+        if self._closed:
+            raise ValueError("Cannot write to a closed VideoWriter")
+        self._raise_if_failed()
+        if self._writer is None:
+            height, width = frame.shape[:2]
+            self._open((width, height))
+        self._queue.put(frame)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._raise_if_failed()
+
+    def abort(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._aborted = True
+        if self._thread is not None:
+            # Drop whatever is still queued so the encoder stops promptly.
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._queue.put(_STOP)
+            self._thread.join()
+        if os.path.exists(self.output_video_path):
+            try:
+                os.remove(self.output_video_path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def save_video(ouput_video_frames, output_video_path, fps=DEFAULT_FPS):
     if len(ouput_video_frames) == 0:
         return
-    
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+
     height, width = ouput_video_frames[0].shape[:2]
-    out = cv2.VideoWriter(output_video_path, fourcc, 24.0, (width, height))
-    
-    if not out.isOpened():
+    try:
+        writer = VideoWriter(output_video_path, fps=fps, frame_size=(width, height))
+    except IOError:
         return
-    
-    for frame in ouput_video_frames:
-        out.write(frame)
-    out.release()
\ No newline at end of file
+
+    with writer:
+        for frame in ouput_video_frames:
+            writer.write(frame)
@@ -1 +1,4 @@
-from viewtransformer.view_transformer import ViewTransformer
\ No newline at end of file
+from utils.lazy_import import lazy_exports
+
+__all__ = ["ViewTransformer"]
+__getattr__, __dir__ = lazy_exports(__name__, {"ViewTransformer": "viewtransformer.view_transformer"})
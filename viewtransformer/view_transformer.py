@@ -1,15 +1,20 @@
+import time
+
 import numpy as np
 import cv2
 
 from pos_model import PitchKeypointDetector
+from utils import TrackStore
 
 
 class ViewTransformer:
-    def __init__(self, reference_frame=None, use_keypoint_model: bool = True):
+    def __init__(self, reference_frame=None, use_keypoint_model: bool = True,
+                 inference_backend: str = "pytorch", int8: bool = False):
         """
         If use_keypoint_model is True and a reference_frame is provided, use the
         YOLO keypoint model in `pos_model/best.pt` to automatically estimate the
         pitch corners. Otherwise, fall back to the original hard-coded vertices.
+        ``inference_backend`` and ``int8`` are passed on to the keypoint model.
         """
         # Real-world pitch dimensions in meters (approximate)
         court_width = 68       # width of the pitch
@@ -19,7 +24,7 @@ class ViewTransformer:
 
         if use_keypoint_model and reference_frame is not None:
             try:
-                detector = PitchKeypointDetector()
+                detector = PitchKeypointDetector(inference_backend=inference_backend, int8=int8)
                 detected_vertices = detector.detect_pitch_vertices(reference_frame)
                 if (
                     detected_vertices is not None
@@ -53,8 +58,26 @@ class ViewTransformer:
             dtype=np.float32,
         )
 
-        self.perspective_transformer = cv2.getPerspectiveTransform(
-            self.pixel_vertices, self.target_vertices
+        self.perspective_transformer = self.get_perspective_transform(self.pixel_vertices)
+
+        # Optional per-segment homographies: (start_frame, end_frame, matrix).
+        # Frames outside every segment use ``self.perspective_transformer``.
+        self.segments = []
+        self.last_transform_stats = {}
+
+    def get_perspective_transform(self, pixel_vertices):
+        return cv2.getPerspectiveTransform(
+            np.asarray(pixel_vertices, dtype=np.float32), self.target_vertices
+        )
+
+    def add_segment(self, start_frame, end_frame, pixel_vertices):
+        """
+        Use the homography from ``pixel_vertices`` for frames
+        ``start_frame:end_frame``, e.g. after a camera cut. Later segments win
+        where ranges overlap.
+        """
+        self.segments.append(
+            (start_frame, end_frame, self.get_perspective_transform(pixel_vertices))
         )
 
     def transform_point(self, point):
@@ -70,16 +93,77 @@ class ViewTransformer:
 
         return transform_point.reshape(-1, 2)
 
+    def transform_points(self, points, perspective_transformer=None, chunk_size=None):
+        """
+        Transform an (N, 2) array of image points with one
+        ``cv2.perspectiveTransform`` call, or one call per ``chunk_size``
+        points to bound temporary memory.
+        """
+        if perspective_transformer is None:
+            perspective_transformer = self.perspective_transformer
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        transformed = np.empty_like(points)
+        step = chunk_size or len(points)
+        for start in range(0, len(points), max(1, step)):
+            chunk = points[start:start + step].reshape(-1, 1, 2)
+            transformed[start:start + step] = cv2.perspectiveTransform(
+                chunk, perspective_transformer
+            ).reshape(-1, 2)
+        return transformed
+
+    def transform_points_by_frame(self, points, frame_nums, chunk_size=None):
+        """
+        Transform points that belong to the given frames, applying each
+        segment's homography to its own frame range. Throughput of the call
+        is stored in ``last_transform_stats``.
+        """
+        start_time = time.perf_counter()
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        frame_nums = np.asarray(frame_nums)
+
+        matrix_index = np.full(len(points), -1, dtype=np.int64)
+        for segment_index, (start_frame, end_frame, _) in enumerate(self.segments):
+            matrix_index[(frame_nums >= start_frame) & (frame_nums < end_frame)] = segment_index
+
+        transformed = np.empty_like(points)
+        matrices = [self.perspective_transformer] + [matrix for _, _, matrix in self.segments]
+        for segment_index, matrix in enumerate(matrices, start=-1):
+            mask = matrix_index == segment_index
+            if mask.any():
+                transformed[mask] = self.transform_points(points[mask], matrix, chunk_size)
+
+        seconds = time.perf_counter() - start_time
+        self.last_transform_stats = {
+            "points": len(points),
+            "seconds": seconds,
+            "points_per_second": len(points) / seconds if seconds > 0 else 0.0,
+        }
+        return transformed
 
-    def add_transformed_position_to_tracks(self, tracks):
+    def add_transformed_position_to_tracks(self, tracks, chunk_size=None):
+        """
+        Add ``position_transformed`` for every detection with a
+        ``position_adjusted``. All positions are gathered and transformed in
+        bulk rather than one OpenCV call per detection.
+        """
+        if isinstance(tracks, TrackStore):
+            valid = ~np.isnan(tracks.position_adjusted).any(axis=1)
+            tracks.position_transformed[valid] = self.transform_points_by_frame(
+                tracks.position_adjusted[valid], tracks.frame[valid], chunk_size
+            )
+            return
+
+        track_infos, points, frame_nums = [], [], []
         for obj, object_tracks in tracks.items():
             for frame_num, track in enumerate(object_tracks):
                 for track_id, track_info in track.items():
                     position = track_info.get("position_adjusted")
                     if position is None:
                         continue
-                    position = np.array(position)
-                    position_transformed = self.transform_point(position)
-                    if position_transformed is not None:
-                        position_transformed = position_transformed.squeeze().tolist()
-                    tracks[obj][frame_num][track_id]["position_transformed"] = position_transformed
+                    track_infos.append(track_info)
+                    points.append(position)
+                    frame_nums.append(frame_num)
+
+        transformed = self.transform_points_by_frame(points, frame_nums, chunk_size)
+        for track_info, position_transformed in zip(track_infos, transformed.tolist()):
+            track_info["position_transformed"] = position_transformed